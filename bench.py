@@ -0,0 +1,559 @@
+import random
+import sys
+import time
+import timeit
+import tracemalloc
+from buckshot_roulette.singleplayer.game import BuckshotRoulette
+from buckshot_roulette.shells import ShellSequence
+from buckshot_roulette.singleplayer.game import BuckshotGame
+from buckshot_roulette.singleplayer.ai import Random, Dealer, Expectiminimax
+from buckshot_roulette.multiplayer.game import BuckshotRoulette as MultiplayerBoard, RoundConfig, GameStatus
+
+def bench_board_copy(n = 20000):
+    # copy cost and memory per board, live vs packed
+    random.seed(0)
+    board = BuckshotRoulette(charge_count=4)
+    print(f"copy: {timeit.timeit(board.copy, number=n) / n * 1e6:.2f}us")
+    print(f"pack: {timeit.timeit(board.pack, number=n) / n * 1e6:.2f}us")
+
+    tracemalloc.start()
+    boards = [board.copy() for _ in range(n)]
+    print(f"board: {tracemalloc.get_traced_memory()[0] / n:.0f} bytes")
+    del boards
+    tracemalloc.stop()
+
+    tracemalloc.start()
+    packed = [board.pack() for _ in range(n)]
+    print(f"packed: {tracemalloc.get_traced_memory()[0] / n:.0f} bytes")
+    tracemalloc.stop()
+    assert BuckshotRoulette.unpack(board.pack()) == board
+
+def bench_chamber(n = 100000):
+    # emptying an 8 shell chamber: list slicing + sum() vs the bitmask sequence
+    shells = [True, False, True, True, False, False, True, False]
+    sequence = ShellSequence(shells)
+    def with_list():
+        shotgun = shells[:]
+        while shotgun:
+            shell = shotgun[0]
+            shotgun = shotgun[1:]
+            live = sum(shotgun)
+    def with_sequence():
+        shotgun = sequence.copy()
+        while shotgun:
+            shell = shotgun.pop()
+            live = shotgun.live
+    print(f"list: {timeit.timeit(with_list, number=n) / n * 1e6:.2f}us")
+    print(f"ShellSequence: {timeit.timeit(with_sequence, number=n) / n * 1e6:.2f}us")
+    print(f"list shuffle: {timeit.timeit(lambda: random.shuffle(shells[:]), number=n) / n * 1e6:.2f}us")
+    print(f"ShellSequence.shuffled: {timeit.timeit(lambda: ShellSequence.shuffled(4, 8), number=n) / n * 1e6:.2f}us")
+
+def bench_undo(depth = 4, positions = 50):
+    # exhaustive depth-limited search: copy() per node vs push()/pop()
+    random.seed(0)
+    starts = []
+    for _ in range(positions):
+        board = BuckshotRoulette(charge_count=4, total_rounds=8)
+        starts.append((board, ShellSequence.shuffled(board.live, board.total)))
+
+    def search_copy(board, shotgun, depth):
+        if depth == 0 or board.winner() != None or len(shotgun) == 0:
+            return 1
+        nodes = 1
+        for move in board.moves():
+            child = board.copy()
+            _, child_shotgun = child.make_move(move, shotgun.copy(), load_new=False)
+            nodes += search_copy(child, child_shotgun, depth - 1)
+        return nodes
+
+    def search_push(board, shotgun, depth):
+        if depth == 0 or board.winner() != None or len(shotgun) == 0:
+            return 1
+        nodes = 1
+        for move in board.moves():
+            board.push(move, shotgun, load_new=False)
+            nodes += search_push(board, shotgun, depth - 1)
+            board.pop()
+        return nodes
+
+    for name, search in (('copy', search_copy), ('push/pop', search_push)):
+        elapsed = []
+        for _ in range(3):
+            random.seed(1)
+            start = time.perf_counter()
+            nodes = sum(search(board, shotgun, depth) for board, shotgun in starts)
+            elapsed.append(time.perf_counter() - start)
+        print(f"{name}: {nodes} nodes, {nodes / min(elapsed):.0f} nodes/s")
+    # push() records only what each move changes: the trail's (op, a, b) entries per push, after its 5 header entries
+    board, shotgun = starts[0]
+    changes = pushes = 0
+    for move in board.moves():
+        board.push(move, shotgun, load_new=False)
+        changes += (len(board._undo) - 5) // 3
+        pushes += 1
+        board.pop()
+    print(f"push/pop: {changes / pushes:.1f} changes recorded per push")
+
+def bench_solver(n = 50, max_nodes = 5000):
+    # Expectiminimax vs Random; the engine's table stays warm from one game to the next
+    random.seed(0)
+    engine = Expectiminimax(1, max_nodes=max_nodes)
+    game = BuckshotGame(Random(0), engine)
+    wins = sum(game.play(charges=4, celebrate=False, itemsused=False) for _ in range(n))
+    stats = engine.stats()
+    print(f"win rate: {100 * wins / n:.1f}%")
+    print(f"{stats['nodes_per_decision']:.0f} nodes/decision, {100 * stats['cache_hit_rate']:.1f}% cache hits, {1000 * stats['time_per_decision']:.1f}ms/decision")
+
+def bench_hash(games = 2000):
+    # Zobrist keys over random self-play: every position's key is checked against a full recompute and its
+    # equality against its hash, and distinct keys are counted against distinct positions to catch collisions
+    random.seed(0)
+    positions = {}
+    collisions = 0
+    def record(key, state):
+        nonlocal collisions
+        seen = positions.setdefault(key, state)
+        if seen != state:
+            collisions += 1
+
+    start = time.perf_counter()
+    for _ in range(games):
+        board = BuckshotRoulette(random.randint(0, 1), charge_count=random.randint(2, 4))
+        shotgun = ShellSequence.shuffled(board.live, board.total)
+        while board.winner() == None:
+            assert board.key() == board._compute_key()
+            record(('sp', board.key()), board.pack())
+            # Equal boards hash equal, down to who reloads first
+            twin = BuckshotRoulette.unpack(board.pack())
+            assert twin == board and hash(twin) == hash(board)
+            twin.starter ^= 1
+            twin.rehash()
+            assert twin != board and hash(twin) != hash(board)
+            _, shotgun = board.make_move(random.choice(board.moves()), shotgun)
+            if len(shotgun) == 0:
+                shotgun = ShellSequence.shuffled(board.live, board.total)
+    for _ in range(games):
+        player_count = random.randint(2, 4)
+        board = MultiplayerBoard(RoundConfig(player_count=player_count), player_count)
+        shotgun = ShellSequence.shuffled(board.live, board.total)
+        while board.winner() == None:
+            assert board.key() == board._compute_key()
+            record(('mp', board.key()), (board.player_count, tuple(board.charges), board.current_turn, board.turn_inc,
+                   tuple(tuple(items.counts) for items in board.items), board.statuses,
+                   board.sequence_idx, board.total, board.live))
+            target, move = random.choice(board.moves())
+            board.make_move(move, shotgun, target if board.has_status(GameStatus.ADRENALINE_ACTIVE) else None)
+            if len(shotgun) == 0:
+                shotgun = ShellSequence.shuffled(board.live, board.total)
+    elapsed = time.perf_counter() - start
+    print(f"{len(positions)} distinct keys, {collisions} collisions ({elapsed:.1f}s)")
+
+    board = BuckshotRoulette(charge_count=4)
+    print(f"key: {timeit.timeit(board.key, number=100000) / 100000 * 1e6:.2f}us")
+    print(f"recompute: {timeit.timeit(board._compute_key, number=100000) / 100000 * 1e6:.2f}us")
+
+def bench_dealer(n = 2000):
+    # Random vs Dealer games; the dealer's shell queries go through its ShellBelief
+    random.seed(0)
+    game = BuckshotGame(Random(0), Dealer(1))
+    start = time.perf_counter()
+    wins = sum(game.play(charges=4, celebrate=False, itemsused=False) for _ in range(n))
+    elapsed = time.perf_counter() - start
+    print(f"dealer win rate: {100 * wins / n:.1f}%, {elapsed / n * 1e3:.2f}ms/game")
+
+def bench_batch(scalar_games = 5000, batch_games = 1_000_000, size = 50000):
+    # Win rates and throughput: BuckshotGame one game at a time vs BatchGame, for each pairing of Random and Dealer
+    import numpy as np
+    from buckshot_roulette.singleplayer.batch import BatchGame, BatchRandom, BatchDealer, MOVES
+    random.seed(0)
+    # Parity first: legal_moves() lane by lane against moves(), half of them with an adrenaline that has nothing to take
+    boards = []
+    for _ in range(2000):
+        board = BuckshotRoulette(random.randint(0, 1), charge_count=4)
+        if random.random() < 0.5:
+            board.items[board.opponent()].counts[:] = [0] * len(BuckshotRoulette.POSSIBLE_ITEMS)
+            board.items[board.current_turn].adrenaline = 1
+            board._active_items.adrenaline = 1
+            board.rehash()
+        boards.append(board)
+    parity = BatchGame(BatchRandom(0), BatchRandom(1), len(boards))
+    for lane, board in enumerate(boards):
+        parity.turn[lane] = board.current_turn
+        parity.items[:, :, lane] = [items.counts for items in board.items]
+        parity.active[:, lane] = [int(count * 2) for count in board._active_items.counts]
+    legal = parity.legal_moves()
+    for lane, board in enumerate(boards):
+        assert [MOVES[code] for code in np.flatnonzero(legal[:, lane])] == board.moves()
+        assert parity.active[:, lane].tolist() == [int(count * 2) for count in board._active_items.counts]
+
+    pairings = [
+        ((Random, Dealer), (BatchRandom, BatchDealer)),
+        ((Random, Random), (BatchRandom, BatchRandom)),
+        ((Dealer, Dealer), (BatchDealer, BatchDealer)),
+    ]
+    for (scalar0, scalar1), (batch0, batch1) in pairings:
+        start = time.perf_counter()
+        # Fresh engines per game, since a batch never carries an engine's knowledge into the next game
+        wins = sum(BuckshotGame(scalar0(0), scalar1(1)).play(charges=4, celebrate=False, itemsused=False) for _ in range(scalar_games))
+        scalar_rate = scalar_games / (time.perf_counter() - start)
+
+        game = BatchGame(batch0(0), batch1(1), size, charges=4, seed=0)
+        start = time.perf_counter()
+        batch_wins = game.play(batch_games)
+        batch_rate = batch_games / (time.perf_counter() - start)
+        rate = wins / scalar_games
+        margin = 1.96 * (rate * (1 - rate) / scalar_games) ** 0.5
+        print(f"{scalar0.__name__} vs {scalar1.__name__}: player 1 wins {100 * rate:.1f}% ± {100 * margin:.1f}% scalar, {100 * batch_wins[1] / batch_games:.1f}% batch; "
+              f"{scalar_rate:.0f} vs {batch_rate:.0f} games/s ({batch_rate / scalar_rate:.0f}x)")
+
+def bench_lockstep(n = 2000):
+    # BuckshotGame.play one game at a time vs the same games in lockstep, with the dealer's decisions batched
+    from buckshot_roulette.lockstep import play_lockstep
+    from buckshot_roulette.rng import RandomStreams
+    calls = []
+    class BatchedDealer(Dealer):
+        @classmethod
+        def choice_batch(cls, engines, boards):
+            calls.append(len(boards))
+            return super().choice_batch(engines, boards)
+
+    streams = RandomStreams(0)
+    game = BuckshotGame(Random(0), BatchedDealer(1), seed=streams)
+    start = time.perf_counter()
+    expected = [game.play(celebrate=False, itemsused=False, game=idx) for idx in range(n)]
+    sequential = time.perf_counter() - start
+
+    games = [BuckshotGame(Random(0), BatchedDealer(1), seed=streams) for _ in range(n)]
+    for idx, game in enumerate(games):
+        game.begin(game=idx)
+    start = time.perf_counter()
+    winners = play_lockstep(games, started=True)
+    lockstep = time.perf_counter() - start
+    print(f"same winners: {winners == expected}; {n / sequential:.0f} vs {n / lockstep:.0f} games/s; "
+          f"{len(calls)} dealer batches, {sum(calls) / len(calls):.0f} boards each")
+
+def bench_async(n = 400, delay = 0.002):
+    # A stand-in for a remote engine: the dealer, answering after a sleep. Same seeds played one at a time and interleaved.
+    import asyncio
+    from buckshot_roulette.aio import AsyncDriver
+    from buckshot_roulette.rng import RandomStreams
+    class SlowDealer(Dealer):
+        async def choice(self, board):
+            await asyncio.sleep(delay)
+            return super().choice(board)
+
+        async def post(self, last_move, result):
+            await asyncio.sleep(0)
+            super().post(last_move, result)
+
+    streams = RandomStreams(0)
+    game = BuckshotGame(Random(0), Dealer(1), seed=streams)
+    expected = [game.play(celebrate=False, itemsused=False, game=idx) for idx in range(n)]
+    for concurrency in (1, 400):
+        games = [BuckshotGame(Random(0), SlowDealer(1), seed=streams) for _ in range(n)]
+        for idx, game in enumerate(games):
+            game.begin(game=idx)
+        driver = AsyncDriver(concurrency)
+        start = time.perf_counter()
+        winners = asyncio.run(driver.run(games, started=True))
+        elapsed = time.perf_counter() - start
+        print(f"concurrency {concurrency}: same winners: {winners == expected}; {n / elapsed:.0f} games/s")
+    print(driver.report())
+
+def bench_observation(n = 20000, rows = 1000):
+    # Per-board encoding time and bytes allocated while encoding into a reused buffer, both modes
+    import numpy as np
+    from buckshot_roulette.singleplayer import observation as sp_observation
+    from buckshot_roulette.multiplayer import observation as mp_observation
+    random.seed(0)
+    modes = [
+        ('singleplayer', sp_observation, [BuckshotRoulette(charge_count=4) for _ in range(rows)]),
+        ('multiplayer', mp_observation, [MultiplayerBoard(RoundConfig(player_count=4), player_count=4) for _ in range(rows)]),
+    ]
+    for name, module, boards in modes:
+        row = np.zeros(module.OBSERVATION_SIZE, np.float32)
+        batch = np.zeros((rows, module.OBSERVATION_SIZE), np.float32)
+        single = timeit.timeit(lambda: module.encode_observation(boards[0], 0, row), number=n) / n
+        batched = timeit.timeit(lambda: module.encode_observations(boards, 0, batch), number=n // rows) / (n // rows * rows)
+        tracemalloc.start()
+        module.encode_observations(boards, 0, batch)
+        before = tracemalloc.get_traced_memory()[0]
+        module.encode_observations(boards, 0, batch)
+        allocated = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+        print(f"{name}: {module.OBSERVATION_SIZE} features, {1e6 * single:.2f}us per board, {1e6 * batched:.2f}us per row batched, "
+              f"{allocated} bytes retained per batch")
+
+def bench_env(steps = 20000, num_envs = 256):
+    # Learner steps/s against the dealer: VectorEnv vs the same glue around one BuckshotGame at a time
+    import numpy as np
+    from buckshot_roulette.singleplayer.env import VectorEnv
+    from buckshot_roulette.singleplayer.batch import MOVES
+    picks = np.random.default_rng(0)
+
+    random.seed(0)
+    game = BuckshotGame(Random(0), Dealer(1))
+    start = time.perf_counter()
+    wins = games = 0
+    game.begin()
+    for _ in range(steps):
+        engine, board = game.to_move()
+        json = board.to_json()
+        observation = np.array(json['charges'] + json['items'][0].counts + json['items'][1].counts + json['active_items'].counts + [json['live'], json['total']], dtype=np.float32)
+        mask = np.array([move in board.moves() for move in MOVES])
+        game.apply(MOVES[picks.choice(np.flatnonzero(mask))])
+        while (turn := game.to_move()) is not None and turn[1].current_turn == 1:
+            game.apply(turn[0].choice(turn[1]))
+        if turn is None:
+            wins += game.result() == 0
+            games += 1
+            game.begin()
+    naive = steps / (time.perf_counter() - start)
+    print(f"single game loop: {naive:.0f} steps/s, learner won {wins}/{games}")
+
+    # Dealer is stepped through BatchGame; a subclass has no batch counterpart, so it gets a BuckshotGame per slot
+    class ScalarDealer(Dealer):
+        pass
+    for opponent, size in ((ScalarDealer, num_envs), (Dealer, num_envs), (Dealer, 16 * num_envs)):
+        env = VectorEnv(size, opponent, seed=0)
+        observations, masks = env.reset()
+        wins = games = 0
+        rounds = max(steps // size, 10)
+        start = time.perf_counter()
+        for _ in range(rounds):
+            actions = np.argmax(masks * picks.random(masks.shape), axis=1)
+            observations, masks, rewards, dones = env.step(actions)
+            wins += int((rewards > 0).sum())
+            games += int(dones.sum())
+        rate = rounds * size / (time.perf_counter() - start)
+        path = "batch" if env.batch is not None else "per game"
+        print(f"VectorEnv({size}), {path}: {rate:.0f} steps/s ({rate / naive:.2f}x), learner won {wins}/{games}")
+
+def bench_mp_env(steps = 20000, num_envs = 256):
+    # Learned-seat steps/s in 4-player rounds: random legal actions for seats 0 and 2 against Dealer and Random
+    import numpy as np
+    from buckshot_roulette.multiplayer.env import VectorEnv
+    from buckshot_roulette.multiplayer.ai import Dealer as MultiplayerDealer, Random as MultiplayerRandom
+    picks = np.random.default_rng(0)
+    env = VectorEnv(num_envs, [None, MultiplayerDealer, None, MultiplayerRandom], seed=0)
+    observations, masks, agents = env.reset()
+    totals = np.zeros(4)
+    rounds = 0
+    start = time.perf_counter()
+    for _ in range(steps // num_envs):
+        actions = np.argmax(masks * picks.random(masks.shape), axis=1)
+        observations, masks, agents, rewards, dones = env.step(actions)
+        totals += rewards.sum(axis=0)
+        rounds += int(dones.sum())
+    rate = steps // num_envs * num_envs / (time.perf_counter() - start)
+    print(f"VectorEnv({num_envs}), 4 seats: {rate:.0f} steps/s, {rounds} rounds, mean reward per seat {np.round(totals / max(rounds, 1), 3)}")
+
+def bench_recorder(games = 3000, mp_games = 300, repeats = 3):
+    # Simulation time with and without a TrajectoryRecorder attached, best of a few runs, and a random-access read back
+    import tempfile
+    import numpy as np
+    from buckshot_roulette.recorder import TrajectoryRecorder, TrajectoryDataset
+    from buckshot_roulette.multiplayer.game import BuckshotGame as MultiplayerGame
+    from buckshot_roulette.multiplayer.ai import Dealer as MultiplayerDealer
+
+    def singleplayer(recorder):
+        game = BuckshotGame(Random(0), Dealer(1), seed=0, recorder=recorder)
+        for idx in range(games):
+            game.play(celebrate=False, itemsused=False, game=idx)
+
+    def multiplayer(recorder):
+        for idx in range(mp_games):
+            MultiplayerGame([MultiplayerDealer(seat) for seat in range(4)], seed=idx, recorder=recorder).play()
+
+    for name, play, multi in (('singleplayer Random vs Dealer', singleplayer, False), ('multiplayer 4 Dealers', multiplayer, True)):
+        with tempfile.TemporaryDirectory() as directory:
+            bare = recorded = float('inf')
+            for _ in range(repeats):
+                start = time.perf_counter()
+                play(None)
+                bare = min(bare, time.perf_counter() - start)
+                start = time.perf_counter()
+                with TrajectoryRecorder(directory, multiplayer=multi) as recorder:
+                    play(recorder)
+                recorded = min(recorded, time.perf_counter() - start)
+            data = TrajectoryDataset(directory)
+            start = time.perf_counter()
+            batch = data[data.sample(100000, np.random.default_rng(0))]
+            read = time.perf_counter() - start
+            print(f"{name}: {len(data) // repeats} rows per run, recording overhead {100 * (recorded / bare - 1):.1f}%, "
+                  f"100k random rows read in {1e3 * read:.1f}ms")
+
+def bench_events(games = 3000, repeats = 3):
+    # Self-play with nobody subscribed, with a listener that only counts, and through the events() generator
+    from buckshot_roulette.events import Move
+
+    def unsubscribed():
+        game = BuckshotGame(Random(0), Dealer(1), seed=0)
+        for idx in range(games):
+            game.play(celebrate=False, itemsused=False, game=idx)
+
+    def counted():
+        moves = 0
+        def count(event):
+            nonlocal moves
+            moves += type(event) is Move
+        game = BuckshotGame(Random(0), Dealer(1), seed=0)
+        game.subscribe(count)
+        for idx in range(games):
+            game.play(celebrate=False, itemsused=False, game=idx)
+        return moves
+
+    def generated():
+        game = BuckshotGame(Random(0), Dealer(1), seed=0)
+        return sum(type(event) is Move for idx in range(games) for event in game.events(game=idx))
+
+    for name, play in (('no listeners', unsubscribed), ('counting listener', counted), ('events()', generated)):
+        best = float('inf')
+        for _ in range(repeats):
+            start = time.perf_counter()
+            moves = play()
+            best = min(best, time.perf_counter() - start)
+        print(f"{name}: {games / best:.0f} games/s" + ("" if moves is None else f", {moves} moves"))
+
+def bench_actions(n = 20000):
+    # Multiplayer legal move generation and move application, by name and by action index, over random positions
+    from buckshot_roulette.multiplayer.game import action_table
+    rng = random.Random(0)
+    positions = []
+    while len(positions) < n:
+        board = MultiplayerBoard(RoundConfig(player_count=4, rng=rng), 4, rng=rng)
+        shotgun = ShellSequence.shuffled(board.live, board.total, rng)
+        while board.winner() is None and len(shotgun) > 0:
+            positions.append((board.copy(), shotgun.copy(), rng.choice(board.legal_actions())))
+            board.make_move(positions[-1][2], shotgun, allow_reload=False)
+    positions = positions[:n]
+    table = action_table(4)
+    named = [(board, shotgun, table[action][1], board.offset_to_idx(table[action][0])) for board, shotgun, action in positions]
+    for name, generate in (('moves()', lambda board: board.moves()), ('legal_action_mask()', lambda board: board.legal_action_mask())):
+        elapsed = timeit.timeit(lambda: [generate(board) for board, _, _ in positions], number=1)
+        print(f"{name}: {1e6 * elapsed / n:.2f}us/position")
+    elapsed = timeit.timeit(lambda: [board.copy().make_move(move, shotgun.copy(), target, allow_reload=False) for board, shotgun, move, target in named], number=1)
+    print(f"make_move by name: {1e6 * elapsed / n:.2f}us/move, copies included")
+    elapsed = timeit.timeit(lambda: [board.copy().make_move(action, shotgun.copy(), allow_reload=False) for board, shotgun, action in positions], number=1)
+    print(f"make_move by index: {1e6 * elapsed / n:.2f}us/move, copies included")
+
+def bench_mp_board(n = 20000, repeats = 5):
+    # moves(), switch_turn() and give_items() of the multiplayer board over random positions; the mutating ones run on
+    # copies made outside the timing
+    rng = random.Random(0)
+    positions = []
+    while len(positions) < n:
+        board = MultiplayerBoard(RoundConfig(player_count=4, rng=rng), 4, rng=rng)
+        shotgun = ShellSequence.shuffled(board.live, board.total, rng)
+        while board.winner() is None and len(shotgun) > 0:
+            positions.append(board.copy())
+            target, move = rng.choice(board.moves())
+            board.make_move(move, shotgun, target, allow_reload=False)
+    positions = positions[:n]
+
+    def best(run, prepare = lambda: None):
+        times = []
+        for _ in range(repeats):
+            prepared = prepare()
+            start = time.perf_counter()
+            run(prepared)
+            times.append(time.perf_counter() - start)
+        return 1e6 * min(times) / n
+
+    def copies():
+        boards = [board.copy() for board in positions]
+        for board in boards:
+            board.rng = random.Random(0)
+        return boards
+
+    print(f"moves(): {best(lambda _: [board.moves() for board in positions]):.2f}us")
+    print(f"switch_turn(): {best(lambda boards: [board.switch_turn() for board in boards], copies):.2f}us")
+    print(f"give_items(): {best(lambda boards: [board.give_items(3) for board in boards], copies):.2f}us")
+
+def bench_mp_search(depth = 3, positions = 30):
+    # Multiplayer lookahead over every legal action to a fixed depth, children made by deepcopy, clone() or
+    # push()/pop(); also the cost of each primitive on its own
+    import copy
+    rng = random.Random(0)
+    starts = []
+    for _ in range(positions):
+        board = MultiplayerBoard(RoundConfig(player_count=4, rng=rng), 4, rng=random.Random(0))
+        starts.append((board, ShellSequence.shuffled(board.live, board.total, rng)))
+
+    def by_copy(make):
+        def search(board, shotgun, depth):
+            nodes = 1
+            if depth == 0 or board.winner() is not None or len(shotgun) == 0:
+                return nodes
+            for action in board.legal_actions():
+                child, chamber = make(board), shotgun.copy()
+                child.make_move(action, chamber, allow_reload=False, roll=2)
+                nodes += search(child, chamber, depth - 1)
+            return nodes
+        return search
+
+    def by_undo(board, shotgun, depth):
+        nodes = 1
+        if depth == 0 or board.winner() is not None or len(shotgun) == 0:
+            return nodes
+        for action in board.legal_actions():
+            board.push(action, shotgun, allow_reload=False, roll=2)
+            nodes += by_undo(board, shotgun, depth - 1)
+            board.pop()
+        return nodes
+
+    board = starts[0][0]
+    state = board.snapshot()
+    for name, run in (('deepcopy', lambda: copy.deepcopy(board)), ('clone', board.clone), ('snapshot', board.snapshot),
+                      ('restore', lambda: board.restore(state))):
+        print(f"{name}: {timeit.timeit(run, number=20000) / 20000 * 1e6:.2f}us")
+    for name, search in (('deepcopy', by_copy(copy.deepcopy)), ('clone', by_copy(MultiplayerBoard.clone)), ('push/pop', by_undo)):
+        start = time.perf_counter()
+        nodes = sum(search(board, shotgun.copy(), depth) for board, shotgun in starts)
+        print(f"{name} search: {nodes} nodes, {nodes / (time.perf_counter() - start):.0f} nodes/s")
+
+def bench_configs(games = 200000):
+    # Config interning over a sweep of games with 4 rounds each: configs asked for vs built, for random rounds and for
+    # a grid of 120 rule sets played over and over
+    from buckshot_roulette.multiplayer.game import SequenceConfig, valid_sequences
+    rng = random.Random(0)
+    sweeps = (
+        ('random rounds', lambda game: RoundConfig(player_count=4, rng=rng)),
+        ('rule grid', lambda game: RoundConfig(3 + game % 3, [
+            SequenceConfig(valid_sequences[4][(game // 3 + k) % 10], 2 + (game // 30 + k) % 4) for k in range(4)
+        ])),
+    )
+    for name, make in sweeps:
+        rounds, sequences = RoundConfig.created, SequenceConfig.created
+        start = time.perf_counter()
+        for game in range(games):
+            configs = [make(game) for _ in range(4)]
+        elapsed = time.perf_counter() - start
+        print(f"{name}: {4 * games} rounds, {RoundConfig.created - rounds} RoundConfigs and {SequenceConfig.created - sequences} "
+              f"SequenceConfigs built, {elapsed / (4 * games) * 1e6:.2f}us per round")
+
+BENCHMARKS = {
+    'copy': bench_board_copy,
+    'chamber': bench_chamber,
+    'undo': bench_undo,
+    'solver': bench_solver,
+    'hash': bench_hash,
+    'dealer': bench_dealer,
+    'batch': bench_batch,
+    'lockstep': bench_lockstep,
+    'async': bench_async,
+    'observation': bench_observation,
+    'env': bench_env,
+    'mp_env': bench_mp_env,
+    'recorder': bench_recorder,
+    'events': bench_events,
+    'actions': bench_actions,
+    'mp_board': bench_mp_board,
+    'mp_search': bench_mp_search,
+    'configs': bench_configs,
+}
+
+if __name__ == '__main__':
+    for name in sys.argv[1:] or BENCHMARKS:
+        print(f"--- {name}")
+        BENCHMARKS[name]()
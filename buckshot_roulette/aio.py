@@ -0,0 +1,115 @@
+"""An asyncio driver for engines that are slow to answer, like a policy served by another process.
+
+Any of an engine's `choice`, `post`/`on_own_move`/`on_opponent_move` and `on_reload` may be coroutines. Games are
+stepped through `begin`/`to_move`/`apply`/`result` as in `buckshot_roulette.lockstep`. Callbacks are awaited in the
+order the game made them, before it moves on, so an engine sees the same sequence of calls as under `play`. Up to
+`concurrency` games are in flight at once on one event loop, and every `choice` is timed into a per-engine histogram.
+
+    driver = AsyncDriver(concurrency=500)
+    winners = asyncio.run(driver.run([BuckshotGame(RemotePolicy(0), Dealer(1)) for _ in range(10000)], charges=4))
+    print(driver.report())
+"""
+import asyncio
+import bisect
+import inspect
+import math
+import time
+
+# Histogram bucket upper edges in seconds: four per doubling, from 1us to about 68s
+_BUCKETS_PER_DOUBLING = 4
+_EDGES = [1e-6 * 2 ** (idx / _BUCKETS_PER_DOUBLING) for idx in range(26 * _BUCKETS_PER_DOUBLING + 1)]
+
+class LatencyHistogram:
+    """Counts of latencies in logarithmic buckets, four per doubling from 1us up"""
+    __slots__ = ('counts', 'total', 'count', 'max')
+    EDGES = _EDGES
+
+    def __init__(self):
+        self.counts = [0] * (len(self.EDGES) + 1)
+        self.total = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def record(self, seconds: float):
+        self.counts[bisect.bisect_left(self.EDGES, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+        if seconds > self.max:
+            self.max = seconds
+
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, q: float) -> float:
+        """The upper edge of the bucket holding the `q`-th percentile (0-100), or the largest latency if that is lower"""
+        if self.count == 0:
+            return 0.0
+        rank = math.ceil(q / 100 * self.count)
+        seen = 0
+        for idx, count in enumerate(self.counts):
+            seen += count
+            if seen >= max(rank, 1):
+                return min(self.EDGES[idx], self.max) if idx < len(self.EDGES) else self.max
+        return self.max
+
+    def __str__(self):
+        lines = [f"n={self.count} mean={self.mean() * 1e3:.3f}ms p50={self.percentile(50) * 1e3:.3f}ms "
+                 f"p99={self.percentile(99) * 1e3:.3f}ms max={self.max * 1e3:.3f}ms"]
+        peak = max(self.counts)
+        for idx, count in enumerate(self.counts):
+            if count:
+                edge = f"<{self.EDGES[idx] * 1e3:.3f}ms" if idx < len(self.EDGES) else f">={self.EDGES[-1] * 1e3:.0f}ms"
+                lines.append(f"  {edge:>12} {count:>8} {'#' * max(1, round(40 * count / peak))}")
+        return "\n".join(lines)
+
+async def _resolve(value):
+    return await value if inspect.isawaitable(value) else value
+
+class AsyncDriver:
+    def __init__(self, concurrency: int = 256):
+        """
+        Args:
+            concurrency (int): Most games in flight at once
+        """
+        self.concurrency = concurrency
+        # Keyed by engine class name
+        self.latencies: dict[str, LatencyHistogram] = {}
+
+    async def _drain(self, game):
+        while game.pending:
+            pending = game.pending
+            game.pending = []
+            for awaitable in pending:
+                await awaitable
+
+    async def play(self, game, started: bool = False, **begin):
+        """Plays one game to the end and returns its result; `begin` is passed to `game.begin` unless `started`"""
+        if not started:
+            game.begin(**begin)
+        await self._drain(game)
+        while (turn := game.to_move()) is not None:
+            await self._drain(game)
+            engine, board = turn
+            name = type(engine).__name__
+            histogram = self.latencies.get(name)
+            if histogram is None:
+                histogram = self.latencies[name] = LatencyHistogram()
+            start = time.perf_counter()
+            move = await _resolve(engine.choice(board))
+            histogram.record(time.perf_counter() - start)
+            game.apply(move)
+            await self._drain(game)
+        return game.result()
+
+    async def run(self, games: list, started: bool = False, **begin) -> list:
+        """Plays every game, at most `concurrency` at a time, returning their results in order"""
+        results = [None] * len(games)
+        queue = iter(range(len(games)))
+        async def worker():
+            for idx in queue:
+                results[idx] = await self.play(games[idx], started, **begin)
+        await asyncio.gather(*(worker() for _ in range(min(self.concurrency, len(games)))))
+        return results
+
+    def report(self) -> str:
+        return "\n".join(f"{name}: {histogram}" for name, histogram in self.latencies.items())
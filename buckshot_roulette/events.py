@@ -0,0 +1,74 @@
+"""Typed records of what happens in a game, for either mode's `BuckshotGame`.
+
+Subscribe a callback to see every event as it happens, or iterate a game's `events()` to play it as a generator:
+
+    game.subscribe(print)
+    for event in game.events(charges=4):
+        if isinstance(event, Move) and event.move == 'magnifying_glass':
+            ...
+
+Games only build events while someone is subscribed, so a game nobody listens to pays one truthiness check per
+move. `ConsoleRenderer` is the subscriber that prints a game the way `play(celebrate=True, itemsused=True)` does.
+"""
+from dataclasses import dataclass
+
+@dataclass(slots=True)
+class Turn:
+    """`actor` is about to choose; only sent by `play` and `events`, which ask the engines themselves"""
+    actor: int
+
+@dataclass(slots=True)
+class Move:
+    """`actor` played `move`. `private` is the result the actor saw and `public` the result everyone else saw."""
+    actor: int
+    move: str
+    private: object
+    public: object
+    # Whose item was used, when it was taken with adrenaline (multiplayer only)
+    target: int | None = None
+
+@dataclass(slots=True)
+class Reload:
+    """A new sequence of `live` live shells out of `total` was loaded"""
+    live: int
+    total: int
+
+@dataclass(slots=True)
+class ItemDrop:
+    """`player` was handed `items` by a reload"""
+    player: int
+    items: list[str]
+
+@dataclass(slots=True)
+class Winner:
+    """`player` won the game, or the round `round` of a multiplayer game"""
+    player: int
+    round: int | None = None
+
+class ConsoleRenderer:
+    def __init__(self, moves: bool = True, winner: bool = True):
+        """Prints events as they come.
+
+        Args:
+            moves (bool): Print each turn and move (play's `itemsused`)
+            winner (bool): Print who won (play's `celebrate`)
+        """
+        self.moves = moves
+        self.winner = winner
+
+    def __call__(self, event):
+        match event:
+            case Turn() if self.moves:
+                print("\n\n------------------------------------------------------------")
+                print(f"player {event.actor}")
+            case Move() if self.moves:
+                print(f"{event.move} : {event.private}")
+            case Reload() if self.moves:
+                print(f"reload: {event.live} live, {event.total - event.live} blank")
+            case ItemDrop() if self.moves and event.items:
+                print(f"player {event.player} gets {', '.join(event.items)}")
+            case Winner() if self.winner:
+                if event.round is None:
+                    print("player", event.player, "wins!")
+                else:
+                    print(f"player {event.player} wins round {event.round}")
@@ -0,0 +1,290 @@
+"""A round-robin league that rates many engines against each other, saved to a local JSON file.
+
+    python -m buckshot_roulette.league league.json --add Dealer Random mypkg.engines:Greedy --games 2000
+    python -m buckshot_roulette.league mp_league.json --multiplayer --players 3 --add Dealer Random mypkg.engines:Greedy --games 300
+
+Singleplayer matchups are every pair of engines, played as seat-swapped pairs (see `tournament.run_paired`).
+Multiplayer matchups are every seating of every group of `players` engines; each rotation of a group is its own
+matchup, so every engine sits in every seat. All matchups share the seed's deals: game i of every matchup is dealt
+the same, which is common random numbers across the whole league.
+
+Every matchup is recorded with its games, wins per seat and the time it took. Running the league again tops each
+matchup up to the requested number of games, so an engine that joins only plays its own matchups. Work is split into
+tasks of about `task_seconds` each, from the measured cost per game, and handed to a pool longest first. Each worker
+keeps the engines it has built, so engines stay warm across matchups. A matchup's games are recorded (and saved) only
+once all of its tasks are done, so an interrupted run loses the matchups in flight and the next run replays them
+from where their records end.
+
+Ratings are the maximum-likelihood Plackett-Luce strengths (Bradley-Terry when 2 engines play), as Elo: a game's
+winner is engine i with probability 10^(Elo_i / 400) over the sum across the seated engines. They are refit
+from the previous ratings as each matchup finishes, with one virtual win and loss against a 0 Elo engine
+so an engine that never wins still gets a finite rating.
+"""
+import argparse
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import sys
+import time
+from dataclasses import dataclass, field
+from buckshot_roulette.tournament import resolve_engine, play_games, play_pairs
+
+# Seconds per game assumed for a matchup with nothing measured for its engines yet
+_DEFAULT_COST = 1e-3
+
+@dataclass
+class MatchRecord:
+    # Engines in seat order; a singleplayer matchup covers both seatings of its pair
+    seats: list[str]
+    games: int = 0
+    wins: list[int] = field(default_factory=list)
+    seconds: float = 0.0
+
+    @property
+    def key(self) -> str:
+        return ' | '.join(self.seats)
+
+    def cost(self) -> float | None:
+        """Measured seconds per game"""
+        return self.seconds / self.games if self.games else None
+
+# Per-process engine instances, built the first time a worker seats them and reused for every later task
+_engines: dict = {}
+
+def _engine(spec: str, seat: int, multiplayer: bool):
+    key = (spec, seat, multiplayer)
+    engine = _engines.get(key)
+    if engine is None:
+        engine = _engines[key] = resolve_engine(spec, multiplayer)(seat)
+    return engine
+
+def _play_task(task: tuple) -> tuple[str, int, list[int], float]:
+    key, seats, multiplayer, start, count, settings = task
+    began = time.perf_counter()
+    if multiplayer:
+        engines = [_engine(spec, seat, True) for seat, spec in enumerate(seats)]
+        wins = play_games(engines, start, count, True, settings['seed'], rounds=settings['rounds'])
+        games = count
+    else:
+        first, second = seats
+        lineups = ([_engine(first, 0, False), _engine(second, 1, False)], [_engine(second, 0, False), _engine(first, 1, False)])
+        pair_counts = play_pairs(lineups, start, count, False, settings['seed'], charges=settings['charges'])
+        games = 2 * count
+        first_wins = pair_counts[1] + 2 * pair_counts[2]
+        wins = [first_wins, games - first_wins]
+    return key, games, wins, time.perf_counter() - began
+
+class League:
+    def __init__(self, path: str | None = None, multiplayer: bool = False, players: int = 2, seed: int = 0, charges: int = 4, rounds: int = 3):
+        """A new, empty league; use `League.load` to pick up a saved one.
+
+        Args:
+            path (str | None): Where `save` writes the league, as JSON
+            multiplayer (bool): Rate multiplayer engines instead of singleplayer ones
+            players (int): Seats per multiplayer game, from 2 to 4. Singleplayer always has 2.
+            seed (int): Seed the deals of every matchup come from
+            charges (int): Singleplayer starting charges
+            rounds (int): Multiplayer rounds per game
+        """
+        if not multiplayer:
+            players = 2
+        elif not 2 <= players <= 4:
+            raise ValueError("Multiplayer games take 2 to 4 players.")
+        self.path = path
+        self.multiplayer = multiplayer
+        self.players = players
+        self.seed = seed
+        self.charges = charges
+        self.rounds = rounds
+        self.engines: list[str] = []
+        self.matches: dict[str, MatchRecord] = {}
+        self.ratings: dict[str, float] = {}
+
+    @classmethod
+    def load(cls, path: str):
+        with open(path) as f:
+            data = json.load(f)
+        league = cls(path, data['multiplayer'], data['players'], data['seed'], data['charges'], data['rounds'])
+        league.engines = data['engines']
+        for match in data['matches']:
+            record = MatchRecord(**match)
+            league.matches[record.key] = record
+        league.ratings = data['ratings']
+        return league
+
+    def save(self, path: str | None = None):
+        path = path or self.path
+        data = {
+            'multiplayer': self.multiplayer,
+            'players': self.players,
+            'seed': self.seed,
+            'charges': self.charges,
+            'rounds': self.rounds,
+            'engines': self.engines,
+            'matches': [vars(record) for record in self.matches.values()],
+            'ratings': self.ratings,
+        }
+        # Write beside the file and swap it in, so an interrupted save never loses the league
+        with open(path + '.tmp', 'w') as f:
+            json.dump(data, f, indent=1)
+        os.replace(path + '.tmp', path)
+
+    def add(self, *specs: str):
+        """Adds engines by name or `'module:Class'` path; they are checked to import, but only played by `run`"""
+        for spec in specs:
+            resolve_engine(spec, self.multiplayer)
+            if spec not in self.engines:
+                self.engines.append(spec)
+                self.ratings.setdefault(spec, 0.0)
+
+    def schedule(self) -> list[list[str]]:
+        """Every matchup between the league's engines, as seat orders"""
+        if not self.multiplayer:
+            return [list(pair) for pair in itertools.combinations(self.engines, 2)]
+        seatings = []
+        for group in itertools.combinations(self.engines, self.players):
+            for shift in range(self.players):
+                seatings.append(list(group[shift:] + group[:shift]))
+        return seatings
+
+    def _cost(self, seats: list[str]) -> float:
+        # Measured for the matchup if possible, else the average of what its engines cost elsewhere
+        record = self.matches.get(' | '.join(seats))
+        if record is not None and record.cost() is not None:
+            return record.cost()
+        known = [record.cost() for record in self.matches.values() if record.games and set(seats) & set(record.seats)]
+        if known:
+            return sum(known) / len(known)
+        known = [record.cost() for record in self.matches.values() if record.games]
+        return sum(known) / len(known) if known else _DEFAULT_COST
+
+    def run(self, games: int, workers: int | None = None, task_seconds: float = 2.0, progress = None):
+        """Plays every matchup up to `games` games (rounded up to whole pairs in singleplayer) and refits the ratings.
+
+        Args:
+            games (int): Games per matchup to reach; matchups already there aren't played
+            workers (int | None): Worker processes, defaulting to the CPU count. 1 plays in this process.
+            task_seconds (float): Rough length of each task handed to a worker, from the measured cost per game
+            progress (Callable[[MatchRecord], None] | None): Called with each matchup's record as it finishes
+        """
+        settings = {'seed': self.seed, 'charges': self.charges, 'rounds': self.rounds}
+        # Singleplayer tasks count seat-swapped pairs, 2 games each
+        per_unit = 1 if self.multiplayer else 2
+        target = -(-games // per_unit)
+        tasks = []
+        pending = {}
+        # What each matchup's finished tasks played. It only goes into the matchup's record once every task is in:
+        # tasks come back in any order, and a saved record has to cover the deals from 0 up to its games with no gaps,
+        # or a resumed run would replay some deals and skip others.
+        played = {}
+        for seats in self.schedule():
+            record = self.matches.setdefault(' | '.join(seats), MatchRecord(seats, wins=[0] * len(seats)))
+            done = record.games // per_unit
+            if done >= target:
+                continue
+            cost = self._cost(seats) * per_unit
+            size = max(1, int(task_seconds / cost))
+            for start in range(done, target, size):
+                count = min(size, target - start)
+                tasks.append((cost * count, (record.key, seats, self.multiplayer, start, count, settings)))
+            pending[record.key] = len(range(done, target, size))
+            played[record.key] = MatchRecord(seats, wins=[0] * len(seats))
+        # Longest first, so the pool isn't left waiting on one slow task at the end
+        tasks.sort(key=lambda task: -task[0])
+        tasks = [task for _, task in tasks]
+
+        def finish(key, games, wins, seconds):
+            tally = played[key]
+            tally.games += games
+            tally.wins = [a + b for a, b in zip(tally.wins, wins)]
+            tally.seconds += seconds
+            pending[key] -= 1
+            if pending[key] == 0:
+                record = self.matches[key]
+                record.games += tally.games
+                record.wins = [a + b for a, b in zip(record.wins, tally.wins)]
+                record.seconds += tally.seconds
+                self.fit()
+                if self.path is not None:
+                    self.save()
+                if progress is not None:
+                    progress(record)
+
+        workers = workers or os.cpu_count() or 1
+        if workers == 1:
+            for task in tasks:
+                finish(*_play_task(task))
+        else:
+            with multiprocessing.Pool(workers) as pool:
+                # Totals are sums, so tasks can come back in any order
+                for result in pool.imap_unordered(_play_task, tasks):
+                    finish(*result)
+
+    def fit(self, iterations: int = 10000, tolerance: float = 1e-9) -> dict[str, float]:
+        """Refits `ratings` to every recorded game, starting from the current ratings"""
+        gammas = {name: 10 ** (self.ratings.get(name, 0.0) / 400) for name in self.engines}
+        # One virtual win and one virtual loss against a 0 Elo (strength 1) engine each
+        wins = {name: 1.0 for name in self.engines}
+        records = [record for record in self.matches.values() if record.games]
+        for record in records:
+            for name, count in zip(record.seats, record.wins):
+                wins[name] += count
+        for _ in range(iterations):
+            # Minorization-maximization (Hunter, 2004): strength = wins / sum over games of 1 / (seated strength)
+            denominators = {name: 2 / (gamma + 1) for name, gamma in gammas.items()}
+            for record in records:
+                share = record.games / sum(gammas[name] for name in record.seats)
+                for name in record.seats:
+                    denominators[name] += share
+            updated = {name: wins[name] / denominators[name] for name in gammas}
+            change = max((abs(math.log(updated[name] / gammas[name])) for name in gammas), default=0)
+            gammas = updated
+            if change < tolerance:
+                break
+        self.ratings = {name: 400 * math.log10(gamma) for name, gamma in gammas.items()}
+        return self.ratings
+
+    def table(self) -> str:
+        games = {name: 0 for name in self.engines}
+        wins = {name: 0 for name in self.engines}
+        for record in self.matches.values():
+            for name, count in zip(record.seats, record.wins):
+                games[name] += record.games
+                wins[name] += count
+        lines = [f"{'':>4} {'engine':<40} {'Elo':>8} {'games':>8} {'wins':>7}"]
+        ranked = sorted(self.engines, key=lambda name: -self.ratings.get(name, 0.0))
+        for rank, name in enumerate(ranked, 1):
+            rate = wins[name] / games[name] if games[name] else 0.0
+            lines.append(f"{rank:>4} {name:<40} {self.ratings.get(name, 0.0):>8.1f} {games[name]:>8} {100 * rate:>6.2f}%")
+        return "\n".join(lines)
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(prog="buckshot-league", description="Rate Buckshot Roulette engines in a round-robin league saved to a file.")
+    parser.add_argument('path', help="league file, created if it doesn't exist")
+    parser.add_argument('--add', nargs='+', default=[], metavar='ENGINE', help="engines to add: a name from the mode's ai module or module:Class")
+    parser.add_argument('--games', type=int, default=1000, help="games per matchup to reach")
+    parser.add_argument('--multiplayer', action='store_true', help="new leagues only: rate multiplayer engines")
+    parser.add_argument('--players', type=int, default=4, help="new leagues only: seats per multiplayer game")
+    parser.add_argument('--seed', type=int, default=0, help="new leagues only: seed for the deals")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument('--task-seconds', type=float, default=2.0, help="rough length of each task handed to a worker")
+    parser.add_argument('--quiet', action='store_true', help="don't report matchups as they finish")
+    args = parser.parse_args(argv)
+
+    if os.path.exists(args.path):
+        league = League.load(args.path)
+    else:
+        league = League(args.path, args.multiplayer, args.players, args.seed)
+    league.add(*args.add)
+
+    def report(record: MatchRecord):
+        print(f"{record.key}: {record.wins} in {record.games} games", file=sys.stderr)
+
+    league.run(args.games, workers=args.workers, task_seconds=args.task_seconds, progress=None if args.quiet else report)
+    league.save()
+    print(league.table())
+
+if __name__ == '__main__':
+    main()
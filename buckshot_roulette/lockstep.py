@@ -0,0 +1,50 @@
+"""Plays many `BuckshotGame`s in lockstep, so an engine can choose for all of them at once.
+
+Each step advances every unfinished game to its next decision, groups the pending decisions by engine class, and
+hands each group to that class's `choice_batch(engines, boards)` in a single call before scattering the moves back.
+Engines keep one instance per game, as they do in `BuckshotGame.play`, so per-game knowledge stays where it was.
+Works for singleplayer and multiplayer games alike through their `begin`/`to_move`/`apply`/`result` steps.
+
+    games = [BuckshotGame(Random(0), Dealer(1), seed=streams) for _ in range(256)]
+    for idx, game in enumerate(games):
+        game.begin(charges=4, game=idx)
+    winners = play_lockstep(games, started=True)
+"""
+
+def choice_batch(engines: list, boards: list) -> list:
+    """The moves of `engines` (all of one class) on `boards`, through the class's `choice_batch` if it has one"""
+    batch = getattr(type(engines[0]), 'choice_batch', None)
+    if batch is None:
+        return [engine.choice(board) for engine, board in zip(engines, boards)]
+    return batch(engines, boards)
+
+def play_lockstep(games: list, started: bool = False, **begin) -> list:
+    """Plays every game to the end, returning their results in order.
+
+    Args:
+        games (list[BuckshotGame]): Singleplayer or multiplayer games, each with its own engine instances
+        started (bool): The games have already been begun, e.g. with different arguments each
+        **begin: Passed to each game's `begin` (like `charges=4` for singleplayer) unless `started`
+    """
+    if not started:
+        for game in games:
+            game.begin(**begin)
+    results = [None] * len(games)
+    pending = list(range(len(games)))
+    while pending:
+        groups: dict[type, list] = {}
+        waiting = []
+        for idx in pending:
+            turn = games[idx].to_move()
+            if turn is None:
+                results[idx] = games[idx].result()
+                continue
+            waiting.append(idx)
+            engine, board = turn
+            groups.setdefault(type(engine), []).append((idx, engine, board))
+        for members in groups.values():
+            moves = choice_batch([engine for _, engine, _ in members], [board for _, _, board in members])
+            for (idx, _, _), move in zip(members, moves):
+                games[idx].apply(move)
+        pending = waiting
+    return results
@@ -1,4 +1,5 @@
-from buckshot_roulette.multiplayer.game import BuckshotRoulette, GameStatus
+from buckshot_roulette.multiplayer.game import BuckshotRoulette, GameStatus, MOVE_CODES, SHOOT, JAM
+from buckshot_roulette.shells import ShellBelief
 from typing import Literal, Union, Tuple, List, Optional
 from dataclasses import asdict
 import random
@@ -6,6 +7,9 @@ import abc
 import typing
 
 class AbstractEngine(abc.ABC):
+    # Any random.Random-compatible generator; BuckshotGame replaces it with a per-game stream when seeded
+    rng = random
+
     def __init__(self, playing_as: Literal[0, 1]):
         self.me = playing_as
     
@@ -18,6 +22,19 @@ class AbstractEngine(abc.ABC):
         """
         pass
     
+    @classmethod
+    def choice_batch(cls, engines: list['AbstractEngine'], boards: list[BuckshotRoulette]) -> list:
+        """Chooses moves for many games at once, one per `(engine, board)`; see buckshot_roulette.lockstep
+
+        Each game keeps its own engine instance, so per-game knowledge stays on the instances. The lockstep driver gathers the pending
+        decisions of every instance of a class into one call. Override this to evaluate the boards in bulk; by default it calls `choice` on each.
+
+        Args:
+            engines (list[AbstractEngine]): The instances to choose for, all of this class
+            boards (list[BuckshotRoulette]): The board each instance is choosing on
+        """
+        return [engine.choice(board) for engine, board in zip(engines, boards)]
+    
     @abc.abstractmethod
     def on_own_move(self, last_move, result):
         """Any post-processing steps that the model needs to make after a move has been made. Typically used to store results of the magnifying glass and burner phone.
@@ -47,15 +64,17 @@ class AbstractEngine(abc.ABC):
         """
 
 class Dealer(AbstractEngine):
-    def __init__(self, playing_as: int):
+    def __init__(self, playing_as: int, rng = None):
         """
         Initialize the Dealer.
 
         Args:
             playing_as (int): The index of the player (e.g., 0, 1, 2, 3).
+            rng (random.Random | None): Generator for the dealer's coin flips, the global random module by default.
         """
         self.me = playing_as
-        self.known_shells: List[Optional[bool]] = []
+        self.rng = random if rng is None else rng
+        self.belief = ShellBelief()
         self.last_shell: Optional[bool] = None
 
     def shell_at(self, idx: int, board: 'BuckshotRoulette') -> Optional[bool]:
@@ -69,26 +88,7 @@ class Dealer(AbstractEngine):
         Returns:
             Optional[bool]: True if live, False if blank, None if unknown.
         """
-        if idx < len(self.known_shells) and self.known_shells[idx] is not None:
-            return self.known_shells[idx]
-        else:
-            live = board.live
-            blank = board.total - board.live
-
-            # Recalculate based on known shells
-            for known in self.known_shells:
-                if known is not None:
-                    if known:
-                        live -= 1
-                    else:
-                        blank -= 1
-
-            if live == 0:
-                return False
-            elif blank == 0:
-                return True
-
-            return None
+        return self.belief.certain(idx)
 
     def choice(self, game: BuckshotRoulette) -> Tuple[str, int]:
         """
@@ -101,17 +101,14 @@ class Dealer(AbstractEngine):
             Union[str, Tuple[int, str]]: The chosen move, which can be a string (e.g., 'saw')
             or a tuple representing an action on an opponent's item (e.g., (1, 'jammer')).
         """
-        # Initialize known_shells if empty
-        if not self.known_shells:
-            self.known_shells = [None] * game.total
+        # Start a fresh belief if every known shell has been fired
+        if len(self.belief) == 0:
+            self.belief.reset(game.total, game.live)
             if game.total == 1:
-                self.known_shells[0] = game.live > 0
+                self.belief.set(0, game.live > 0)
 
-        # Adjust known_shells length based on current total shells
-        if len(self.known_shells) > game.total:
-            self.known_shells = self.known_shells[-game.total:]
-        elif len(self.known_shells) < game.total:
-            self.known_shells += [None] * (game.total - len(self.known_shells))
+        # Adjust the belief to the current total shells
+        self.belief.sync(game.total, game.live)
 
         # Retrieve available moves
         moves = game.moves()
@@ -132,7 +129,8 @@ class Dealer(AbstractEngine):
                 wants_to_use = item
                 wants_to_target = target
                 break            
-            if item.startswith('jammer') and game.total > 1 and GameStatus(int(item.split('_')[1])) not in game.statuses:
+            kind, arg = MOVE_CODES[item]
+            if kind == JAM and game.total > 1 and not game.statuses >> arg & 1:
                 wants_to_use = item
                 wants_to_target = target
                 break
@@ -148,7 +146,7 @@ class Dealer(AbstractEngine):
                 wants_to_use = item
                 wants_to_target = target
                 break
-            if item == 'beer' and self.shell_at(0, game) != True and True in self.known_shells and game.total != 1:
+            if item == 'beer' and self.shell_at(0, game) != True and self.belief.known_live > 0 and game.total != 1:
                 wants_to_use = item
                 wants_to_target = target
                 break
@@ -172,7 +170,7 @@ class Dealer(AbstractEngine):
             else:
                 # If shell is unknown, decide randomly
                 target = self.select_opponent_to_shoot(game)
-                return (f'shoot_{target}' if random.random() > 0.5 else 'shoot_0'), None
+                return (f'shoot_{target}' if self.rng.random() > 0.5 else 'shoot_0'), None
         else:
             # Execute the desired move
             if isinstance(wants_to_use, str):
@@ -197,21 +195,21 @@ class Dealer(AbstractEngine):
         opponents = [i for i in range(game.player_count) if i != self.me and game.charges[i] > 0]
         if not opponents:
             return self.me  # If no opponents are alive, target self
-        return random.choice(opponents)
+        return self.rng.choice(opponents)
 
     def on_opponent_move(self, move: Union[str, Tuple[int, str]], move_result):
-        if move.startswith('shoot_') or move in ['beer']:
-            self.known_shells = self.known_shells[1:]
+        if MOVE_CODES[move][0] == SHOOT or move in ['beer']:
+            self.belief.advance()
     
     def on_own_move(self, last_move: str, result):
-        if last_move.startswith('shoot_'):
-            self.known_shells = self.known_shells[1:] if len(self.known_shells) > 0 else []
+        if MOVE_CODES[last_move][0] == SHOOT:
+            self.belief.advance()
         elif last_move == 'magnifying_glass':
-            self.known_shells[0] = result
+            self.belief.set(0, result)
         elif last_move == 'burner_phone' and result != None:
-            self.known_shells[result[0]] = result[1]
-        elif last_move == 'inverter' and self.known_shells[0] != None:
-            self.known_shells[0] = not self.known_shells[0]
+            self.belief.set(result[0], result[1])
+        elif last_move == 'inverter':
+            self.belief.invert(0)
         
 
     def on_reload(self, game: 'BuckshotRoulette'):
@@ -222,16 +220,16 @@ class Dealer(AbstractEngine):
             game (BuckshotRoulette): The new game state.
         """
         self.last_shell = None
-        self.known_shells = [None] * game.total
+        self.belief.reset(game.total, game.live)
         self.last_shell = None  # Reset last shell information
         
 class Random(AbstractEngine):
-    def __init__(self, playing_as):
+    def __init__(self, playing_as, rng = None):
         self.me = playing_as
-        pass
+        self.rng = random if rng is None else rng
     
     def choice(self, board: BuckshotRoulette):
-        ad_target, move = random.choice(board.moves())
+        ad_target, move = self.rng.choice(board.moves())
         return move, None if ad_target == self.me else ad_target
 
     def on_own_move(self, last_move, res):
@@ -0,0 +1,222 @@
+"""A multi-agent vectorized environment: N multiplayer tables of 2 to 4 seats, stepped together.
+
+Requires numpy (`pip install buckshot-roulette[batch]`), but not gym. Each seat is either learned (None) or an
+in-process engine class such as `Dealer` or `Random`. Engine seats are played out inside `step`, so every step is
+one decision of a learned seat at every table; `agents` says whose.
+
+    env = VectorEnv(256, [None, Dealer, None, Random], seed=0)
+    observations, masks, agents = env.reset()
+    while training:
+        observations, masks, agents, rewards, dones = env.step(policy(observations, masks, agents))
+
+An episode is one round: it ends when one player is left, who is rewarded 1 while every other seat is rewarded
+-1 / (players - 1). Rewards are per seat, shape (N, players), and come with the first observation of the next round,
+which is dealt straight away. Observations are the rows of `buckshot_roulette.multiplayer.observation` from the acting
+seat, with the shells it has seen. The returned arrays are reused by every call, so copy them to keep them.
+
+Actions index `buckshot_roulette.multiplayer.game.action_table(players)`, and masks are each board's
+`legal_action_mask()`.
+
+Round configs are drawn for every finished table at once with NumPy and written into one `RoundConfig` per table,
+rather than built as new objects per round. These are the env's own and never interned, so unlike other configs they
+change from round to round; the `SequenceConfig`s they hold are the interned ones.
+"""
+import numpy as np
+from buckshot_roulette.rng import RandomStreams, RELOAD, ENGINE, ROUND
+from buckshot_roulette.shells import ShellBelief, ShellSequence
+from buckshot_roulette.multiplayer.game import BuckshotRoulette, RoundConfig, SequenceConfig, valid_sequences, action_table
+from buckshot_roulette.multiplayer.ai import AbstractEngine
+from buckshot_roulette.multiplayer.observation import OBSERVATION_SIZE, encode_observations
+
+class _Learner(AbstractEngine):
+    # Stands in for a learned seat so it is told about moves and reloads like the engines are; it never chooses
+    def __init__(self, playing_as: int):
+        self.me = playing_as
+        self.belief = ShellBelief()
+
+    def choice(self, board: BuckshotRoulette):
+        raise RuntimeError("Learned seats' moves come from VectorEnv.step")
+
+    def on_own_move(self, last_move, result):
+        if last_move.startswith('shoot_') or last_move == 'beer':
+            self.belief.advance()
+        elif last_move == 'magnifying_glass':
+            self.belief.set(0, result)
+        elif last_move == 'burner_phone' and result != None:
+            self.belief.set(result[0], result[1])
+        elif last_move == 'inverter':
+            self.belief.invert(0)
+
+    def on_opponent_move(self, last_move, result):
+        if last_move.startswith('shoot_') or last_move == 'beer':
+            self.belief.advance()
+
+    def on_reload(self, board: BuckshotRoulette):
+        self.belief.reset(board.total, board.live)
+
+class _TableConfig(RoundConfig):
+    # A table's round rules, rewritten by VectorEnv._deal for every round dealt there. Built without going through
+    # the intern tables, so no other board can be holding it.
+    __slots__ = ()
+
+    def __new__(cls, sequences: tuple[SequenceConfig, ...]):
+        return cls._build((4, sequences, cls.DEFAULT_ITEM_CAPS, cls.DEFAULT_GLOBAL_ITEM_CAPS, cls.DEFAULT_ENABLED_ITEMS))
+
+    def deal(self, start_charges: int, sequences: tuple[SequenceConfig, ...]):
+        # Charges are drawn from 3 up, so the items eligible (`_choices`) stay the ones built with
+        object.__setattr__(self, 'start_charges', start_charges)
+        object.__setattr__(self, 'sequences', sequences)
+
+class VectorEnv:
+    def __init__(self, num_envs: int, seats: list, seed: int | RandomStreams | None = None, dtype = np.float32):
+        """
+        Args:
+            num_envs (int): Tables stepped together
+            seats (list): One entry per seat, 2 to 4 of them: None for a learned seat, or an engine class built once per table as `engine(seat)`
+            seed (int | RandomStreams | None): Draws every table's configs, deals and engine choices from substreams of this seed instead of
+                the global `random` module
+            dtype: Observation dtype; float32 or float64
+        """
+        if not 2 <= len(seats) <= 4:
+            raise ValueError("Multiplayer games take 2 to 4 players.")
+        if all(seat is not None for seat in seats):
+            raise ValueError("At least one seat must be learned.")
+        streams = seed if seed is None or isinstance(seed, RandomStreams) else RandomStreams(seed)
+        self.num_envs = num_envs
+        self.player_count = len(seats)
+        self.learned = [seat is None for seat in seats]
+        self.actions = action_table(self.player_count)
+        self._bits = np.arange(len(self.actions), dtype=np.uint64)
+        # The interned SequenceConfig of every shell count and item count drawn, by [count][items - 2]
+        self._sequences = [[SequenceConfig(counts, items) for items in range(2, 6)] for counts in valid_sequences[self.player_count]]
+        self._config_rng = np.random.default_rng(None if streams is None else streams.derive(ROUND))
+
+        self.players: list[list[AbstractEngine]] = []
+        self.configs: list[RoundConfig] = []
+        self._rngs = []
+        for idx in range(num_envs):
+            players = [_Learner(seat) if engine is None else engine(seat) for seat, engine in enumerate(seats)]
+            if streams is not None:
+                table = streams.child(idx)
+                for seat, player in enumerate(players):
+                    player.rng = table.rng(ENGINE, seat)
+                self._rngs.append(table.rng(RELOAD))
+            else:
+                self._rngs.append(None)
+            self.players.append(players)
+            self.configs.append(_TableConfig(tuple(self._sequences[0][0] for _ in range(4))))
+        self.boards: list[BuckshotRoulette | None] = [None] * num_envs
+        self.shotguns: list[ShellSequence | None] = [None] * num_envs
+
+        self.observations = np.zeros((num_envs, OBSERVATION_SIZE), dtype=dtype)
+        self.masks = np.zeros((num_envs, len(self.actions)), dtype=bool)
+        self.agents = np.zeros(num_envs, dtype=np.int64)
+        self.rewards = np.zeros((num_envs, self.player_count), dtype=np.float32)
+        self.dones = np.zeros(num_envs, dtype=bool)
+        self._payouts = [
+            np.full(self.player_count, -1 / (self.player_count - 1), dtype=np.float32) for _ in range(self.player_count)
+        ]
+        for winner, payout in enumerate(self._payouts):
+            payout[winner] = 1
+
+    def reset(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Deals a new round at every table, returning `(observations, masks, agents)`"""
+        self._deal(list(range(self.num_envs)))
+        self.rewards[:] = 0
+        self.dones[:] = False
+        return self._observe()
+
+    def step(self, actions) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Plays one move of the acting learned seat at every table, then any engine seats up to the next learned one.
+
+        Returns `(observations, masks, agents, rewards, dones)`.
+
+        Args:
+            actions: An action per table, legal under the last returned masks
+        """
+        masks = self.masks
+        rewards = self.rewards
+        dones = self.dones
+        rewards[:] = 0
+        finished = []
+        for idx, action in enumerate(actions.tolist() if isinstance(actions, np.ndarray) else actions):
+            if not masks[idx, action]:
+                raise ValueError(f"Action {action} {self.actions[action]} is not legal at table {idx}")
+            self._apply(idx, action, None)
+            winner = self._advance(idx)
+            dones[idx] = winner is not None
+            if winner is not None:
+                rewards[idx] = self._payouts[winner]
+                finished.append(idx)
+        if finished:
+            self._deal(finished)
+        return (*self._observe(), rewards, dones)
+
+    def _deal(self, tables: list[int]):
+        # Every config for these tables in three draws, written into each table's config
+        count = len(tables)
+        sequences = self._sequences
+        charges = self._config_rng.integers(3, 6, size=count).tolist()
+        picks = self._config_rng.integers(0, len(sequences), size=(count, 4)).tolist()
+        items = self._config_rng.integers(2, 6, size=(count, 4)).tolist()
+        for row, idx in enumerate(tables):
+            self.configs[idx].deal(charges[row], tuple(
+                sequences[pick][item_count - 2] for pick, item_count in zip(picks[row], items[row])
+            ))
+            self._start(idx)
+            # Engine seats can finish a round before any learned seat moves; it has no step to report, so deal another
+            while self._advance(idx) is not None:
+                self._start(idx)
+
+    def _start(self, idx: int):
+        board = BuckshotRoulette(self.configs[idx], self.player_count, rng=self._rngs[idx])
+        self.boards[idx] = board
+        self.shotguns[idx] = ShellSequence.shuffled(board.live, board.total, board.rng)
+        for player in self.players[idx]:
+            player.on_reload(board)
+
+    def _apply(self, idx: int, move: int | str, ad_target: int | None):
+        board = self.boards[idx]
+        actor = board.current_turn
+        res_private, res_public, shotgun = board.make_move(move, self.shotguns[idx], ad_target, allow_reload=False)
+        if type(move) is int:
+            move = self.actions[move][1]
+        for seat, player in enumerate(self.players[idx]):
+            if seat == actor:
+                player.on_own_move(move, res_private)
+            else:
+                player.on_opponent_move(move, res_public)
+        if len(shotgun) == 0:
+            board.next_sequence()
+            shotgun = ShellSequence.shuffled(board.live, board.total, board.rng)
+            for player in self.players[idx]:
+                player.on_reload(board)
+        self.shotguns[idx] = shotgun
+
+    def _advance(self, idx: int) -> int | None:
+        # Plays engine seats until a learned seat is to move; the winner if the round ends first
+        board = self.boards[idx]
+        while (winner := board.winner()) is None:
+            seat = board.current_turn
+            if self.learned[seat]:
+                return None
+            move, ad_target = self.players[idx][seat].choice(board)
+            self._apply(idx, move, ad_target)
+        return winner
+
+    def _observe(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        agents = []
+        beliefs = []
+        legal = []
+        for idx, board in enumerate(self.boards):
+            seat = board.current_turn
+            belief = self.players[idx][seat].belief
+            belief.sync(board.total, board.live)
+            agents.append(seat)
+            beliefs.append(belief)
+            legal.append(board.legal_action_mask())
+        # Every table's mask bits unpacked in one go
+        np.not_equal((np.array(legal, dtype=np.uint64)[:, None] >> self._bits) & np.uint64(1), 0, out=self.masks)
+        self.agents[:] = agents
+        encode_observations(self.boards, agents, self.observations, beliefs)
+        return self.observations, self.masks, self.agents
@@ -1,35 +1,59 @@
 from enum import Enum
+import inspect
 import random
-from dataclasses import dataclass, astuple
-import copy
 from typing import Literal
-from collections import Counter
-@dataclass(init=True)
+from collections import Counter, OrderedDict
+from functools import cache
+from itertools import compress
+from weakref import WeakValueDictionary
+from buckshot_roulette.shells import ShellSequence, live_odds, consistent_chamber
+from buckshot_roulette.rng import RandomStreams, ZobristTable, RELOAD, ENGINE, ROUND, TIEBREAK
+from buckshot_roulette.events import Turn, Move, Reload, ItemDrop, Winner
+POSSIBLE_ITEMS = ['saw', 'magnifying_glass', 'jammer', 'cigarettes', 'beer', 'burner_phone', 'adrenaline', 'inverter', 'remote']
+ITEM_INDEX = {item: idx for idx, item in enumerate(POSSIBLE_ITEMS)}
+
 class Items():
-    saw: int = 0
-    magnifying_glass: int = 0
-    jammer: int = 0
-    cigarettes: int = 0
-    beer: int = 0
-    burner_phone: int = 0
-    adrenaline: int = 0
-    inverter: int = 0
-    remote: int = 0
+    """Per-player item counts, stored as a fixed-width list indexed by `POSSIBLE_ITEMS`.
+    
+    Items are still readable by attribute (`items.beer`) and by key (`items['beer']`),
+    but hot paths should index `counts` directly.
+    """
+    __slots__ = ('counts',)
+    
+    def __init__(self, saw=0, magnifying_glass=0, jammer=0, cigarettes=0, beer=0, burner_phone=0, adrenaline=0, inverter=0, remote=0):
+        self.counts = [saw, magnifying_glass, jammer, cigarettes, beer, burner_phone, adrenaline, inverter, remote]
+    
+    @classmethod
+    def from_counts(cls, counts: list):
+        items = cls.__new__(cls)
+        items.counts = counts
+        return items
+    
+    def copy(self):
+        return Items.from_counts(self.counts[:])
     
     def item_count(self):
-        return self.jammer + self.magnifying_glass + self.beer + self.saw + self.cigarettes + self.inverter + self.burner_phone + self.adrenaline + self.remote
+        return sum(self.counts)
     
     def __getitem__(self, key):
-        return self.__getattribute__(key)
+        return self.counts[ITEM_INDEX[key]]
 
     def __setitem__(self, key, value):
-        self.__setattr__(key, value)
+        self.counts[ITEM_INDEX[key]] = value
 
     def __delitem__(self, key):
-        self.__setattr__(key, 0)
+        self.counts[ITEM_INDEX[key]] = 0
     
     def __iter__(self):
-        return ItemIterable(self)
+        """The items held, once each"""
+        return compress(POSSIBLE_ITEMS, self.counts)
+    
+    def __eq__(self, other):
+        if not isinstance(other, Items):
+            return NotImplemented
+        return self.counts == other.counts
+    
+    __hash__ = None
 
     def __str__(self):
         items = ', '.join(f'{key}={self[key]}' for key in self if self[key] > 0)
@@ -41,46 +65,34 @@ class Items():
     def __add__(self, other):
         if not isinstance(other, Items):
             raise ValueError("Can only add Items objects.")
-        return Items(**{key: self[key] + other[key] for key in self})
+        return Items.from_counts([a + b for a, b in zip(self.counts, other.counts)])
     
     def __iadd__(self, other):
         if not isinstance(other, Items):
             raise ValueError("Can only add Items objects.")
-        for key in self:
-            self[key] += other[key]
+        self.counts[:] = [a + b for a, b in zip(self.counts, other.counts)]
         return self
 
     def __mul__(self, factor):
         if not isinstance(factor, (int, float)):
             raise ValueError("Can only multiply by a scalar (int or float).")
-        return Items(**{key: int(self[key] * factor) for key in self})
+        return Items.from_counts([int(count * factor) for count in self.counts])
 
     def __imul__(self, factor):
         if not isinstance(factor, (int, float)):
             raise ValueError("Can only multiply by a scalar (int or float).")
-        for key in self:
-            self[key] = int(self[key] * factor)
+        self.counts[:] = [int(count * factor) for count in self.counts]
         return self
-class ItemIterable():
-    def __init__(self, data: Items):
-        self.data: Items = data
-        self.index = 0
 
-    def __iter__(self):
-        return self
+def _count_property(idx):
+    def getter(self):
+        return self.counts[idx]
+    def setter(self, value):
+        self.counts[idx] = value
+    return property(getter, setter)
 
-    def __next__(self):
-        if self.index < len(BuckshotRoulette.POSSIBLE_ITEMS):
-            while self.index < len(BuckshotRoulette.POSSIBLE_ITEMS) and self.data[BuckshotRoulette.POSSIBLE_ITEMS[self.index]] < 1:
-                self.index += 1                
-            if self.index >= len(BuckshotRoulette.POSSIBLE_ITEMS):
-                raise StopIteration
-            
-            item = BuckshotRoulette.POSSIBLE_ITEMS[self.index]
-            self.index += 1
-            return item
-        else:
-            raise StopIteration
+for _idx, _item in enumerate(POSSIBLE_ITEMS):
+    setattr(Items, _item, _count_property(_idx))
 
 class GameStatus(Enum):
     JAMMED_0 = 0
@@ -91,71 +103,250 @@ class GameStatus(Enum):
     INVERTER_UNCERTAINTY = 5
     SAWED_OFF = 6
 
+# Zobrist keys: one random 64-bit number per (field, value), xor'd together into BuckshotRoulette.key()
+_zobrist = random.Random(0xB0C5)
+def _zobrist_table():
+    return ZobristTable(RandomStreams.from_key(_zobrist.getrandbits(64)))
+_Z_PLAYERS = _zobrist_table()
+_Z_CHARGES = [_zobrist_table() for _ in range(4)]
+_Z_ITEMS = [[_zobrist_table() for _ in ITEM_INDEX] for _ in range(4)]
+_Z_STATUSES = [_zobrist.getrandbits(64) for _ in GameStatus]
+# The xor of _Z_STATUSES over the bits of every status mask
+_Z_STATUS_MASKS = [0]
+for _z in _Z_STATUSES:
+    _Z_STATUS_MASKS += [key ^ _z for key in _Z_STATUS_MASKS]
+_Z_TURN = _zobrist_table()
+_Z_REVERSED = _zobrist.getrandbits(64)
+# Also keyed at sequence index -1, before the first deal
+_Z_SEQUENCE = _zobrist_table()
+_Z_TOTAL = _zobrist_table()
+_Z_LIVE = _zobrist_table()
+
+# What the undo trail records: an op and the two values that take a change back (see BuckshotRoulette.push)
+_U_CHARGE, _U_ITEM, _U_STATUSES, _U_SHELLS, _U_TURN, _U_REVERSED, _U_SEQUENCE = range(7)
+
+# Integer moves. Every move is a kind and an argument: the offset shot or jammed, or the index of the item used.
+SHOOT, USE, JAM = range(3)
+SAW, MAGNIFYING_GLASS, JAMMER, CIGARETTES, BEER, BURNER_PHONE, ADRENALINE, INVERTER, REMOTE = range(9)
+MOVE_CODES = {f'shoot_{offset}': (SHOOT, offset) for offset in range(4)}
+MOVE_CODES |= {item: (USE, idx) for item, idx in ITEM_INDEX.items() if item != 'jammer'}
+MOVE_CODES |= {f'jammer_{offset}': (JAM, offset) for offset in range(4)}
+# The items that can be handed out, for every mask of items that can't; the second table also leaves out the saw
+# Patch 1.2.1
+# TODO: Double check behavior with source code when someone rips it
+_CHOICES = [
+    [tuple(item for item in range(len(POSSIBLE_ITEMS)) if not (blocked | never) >> item & 1) for blocked in range(1 << len(POSSIBLE_ITEMS))]
+    for never in (0, 1 << SAW)
+]
+
+# Status bits of BuckshotRoulette.statuses, by GameStatus value
+_JAMMED = [1 << seat for seat in range(4)]
+_ADRENALINE_ACTIVE = 1 << GameStatus.ADRENALINE_ACTIVE.value
+_INVERTER_UNCERTAINTY = 1 << GameStatus.INVERTER_UNCERTAINTY.value
+_SAWED_OFF = 1 << GameStatus.SAWED_OFF.value
+
+@cache
+def action_table(player_count: int) -> list[tuple[int, str]]:
+    """Every action at a table of `player_count`, as `(owner offset, move)` in action order.
+
+    Action `owner * (2 * player_count + 7) + move` uses the item of the seat `owner` places after the player to move
+    (0 for their own, the victim while adrenaline is active); moves are `shoot_0`..., the items in POSSIBLE_ITEMS order
+    except the jammer, then `jammer_1`...
+    """
+    moves = [f'shoot_{offset}' for offset in range(player_count)]
+    moves += [item for item in POSSIBLE_ITEMS if item != 'jammer']
+    moves += [f'jammer_{offset}' for offset in range(1, player_count)]
+    return [(owner, move) for owner in range(player_count) for move in moves]
+
+@cache
+def action_index(player_count: int) -> dict[tuple[int, str], int]:
+    return {action: idx for idx, action in enumerate(action_table(player_count))}
+
+@cache
+def _action_codes(player_count: int) -> list[tuple[int, int, int]]:
+    # Each action as (owner offset, kind, argument)
+    return [(owner, *MOVE_CODES[move]) for owner, move in action_table(player_count)]
+
+@cache
+def _action_bits(player_count: int) -> tuple[list[int], list[list[int]], list[list[int]]]:
+    # The mask bit of shooting each offset, and by owner offset of using each item and of jamming each offset
+    index = action_index(player_count)
+    shoot = [1 << index[(0, f'shoot_{offset}')] for offset in range(player_count)]
+    use = [[0 if item == 'jammer' else 1 << index[(owner, item)] for item in POSSIBLE_ITEMS] for owner in range(player_count)]
+    jam = [[0] + [1 << index[(owner, f'jammer_{offset}')] for offset in range(1, player_count)] for owner in range(player_count)]
+    return shoot, use, jam
+
+@cache
+def _move_order(player_count: int, turn: int, stealing: bool) -> list[tuple[int, int, str]]:
+    # Every move of `turn` as (mask bit, owner, move) in the order moves() lists them: seats in table order, each
+    # seat's items in POSSIBLE_ITEMS order with the jammer's targets in its place. Engines that take the first move
+    # that fits, like the Dealer, depend on this order.
+    index = action_index(player_count)
+    offsets = [(seat - turn) % player_count for seat in range(player_count)]
+    order = []
+    if stealing:
+        for owner in range(player_count):
+            if owner == turn:
+                continue
+            for item in POSSIBLE_ITEMS:
+                if item == 'adrenaline':
+                    continue
+                moves = [f'jammer_{offset}' for offset in offsets if offset] if item == 'jammer' else [item]
+                order += [(index[(offsets[owner], move)], owner, move) for move in moves]
+    else:
+        order += [(index[(0, f'shoot_{offset}')], turn, f'shoot_{offset}') for offset in offsets]
+        for item in POSSIBLE_ITEMS:
+            moves = [f'jammer_{offset}' for offset in offsets if offset] if item == 'jammer' else [item]
+            order += [(index[(0, move)], turn, move) for move in moves]
+    return order
+
 valid_sequences = {
     2: [(1, 2), (2, 1), (2, 2), (3, 2), (1, 1), (2, 3), (3, 3), (3, 1), (4, 2)],
     3: [(2, 3), (3, 2), (3, 3), (4, 3), (2, 2), (3, 4), (4, 4), (4, 2), (3, 1), (1, 1)],
     4: [(3, 4), (3, 2), (3, 3), (4, 3), (2, 2), (3, 4), (4, 4), (4, 2), (3, 1), (2, 1)],
 }
 
+def _intern(cls, key: tuple, build):
+    # The config of `key`, made by `build(key)` if there isn't one. The last INTERN_SIZE configs asked for are held
+    # strongly, so a sweep reuses them after the games that used them end; the weak table keeps any older one that is
+    # still in use, so equal configs are always the same object.
+    recent = cls._recent
+    config = recent.get(key)
+    if config is not None:
+        recent.move_to_end(key)
+        return config
+    config = cls._interned.get(key)
+    if config is None:
+        config = build(key)
+        cls._interned[key] = config
+        cls.created += 1
+    recent[key] = config
+    if len(recent) > cls.INTERN_SIZE:
+        recent.popitem(last=False)
+    return config
+
 class SequenceConfig:
-    live: int = 0
-    blank: int = 0
-    item_count: int = 0
+    """One load of the shotgun and the items dealt with it. Immutable and interned: equal configs are the same object.
+
+    Configs used to count fired shells down with `fire`; they are shared now, so the board keeps those counts instead.
+    """
+    __slots__ = ('live', 'blank', 'item_count', '__weakref__')
+    INTERN_SIZE = 4096
+    _recent: OrderedDict[tuple[int, int, int], 'SequenceConfig'] = OrderedDict()
+    _interned: WeakValueDictionary[tuple[int, int, int], 'SequenceConfig'] = WeakValueDictionary()
+    # Configs built so far, as opposed to found in the intern tables
+    created = 0
     
-    def __init__(self, counts: tuple[int, int] | None = None, item_count: int | None = None, player_count: Literal[2, 3, 4] | None = None):
+    def __new__(cls, counts: tuple[int, int] | None = None, item_count: int | None = None, player_count: Literal[2, 3, 4] | None = None, rng = None):
+        rng = random if rng is None else rng
         if counts == None:
             if player_count == None:
                 raise ValueError("Must provide the amount of players if shotgun counts are not provided!")
-            counts = random.choice(valid_sequences[player_count])
-        self.live = counts[0]
-        self.blank = counts[1]
-        
+            counts = rng.choice(valid_sequences[player_count])
         if item_count == None:
-            self.item_count = random.randint(2, 5)
-        else:
-            self.item_count = item_count      
+            item_count = rng.randint(2, 5)
+        return _intern(cls, (counts[0], counts[1], item_count), cls._build)
+    
+    @classmethod
+    def _build(cls, key):
+        config = object.__new__(cls)
+        for name, value in zip(cls.__slots__, key):
+            object.__setattr__(config, name, value)
+        return config
+    
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+    
+    __delattr__ = __setattr__
+    
+    def __reduce__(self):
+        # Unpickling goes back through __new__, so configs sent to other processes are interned there too
+        return SequenceConfig, ((self.live, self.blank), self.item_count)
+    
+    def __repr__(self):
+        return f"SequenceConfig(({self.live}, {self.blank}), {self.item_count})"
 
-    def fire(self, live: bool):
-        if live:
-            self.live -= 1
-        else:
-            self.blank -= 1
+class _ItemsAlias:
+    # The Items attributes configs had before their caps became tuples, read-only: a fresh Items of a config's tuple,
+    # or of the default on the class
+    def __init__(self, field: str):
+        self.field = field
+    
+    def __get__(self, config, owner):
+        if config is None:
+            return Items.from_counts(list(getattr(owner, 'DEFAULT_' + self.field.upper())))
+        return Items.from_counts(list(getattr(config, self.field)))
 
 class RoundConfig:
-    sequences: list[SequenceConfig | None] = [None] * 4
-    start_charges: int = 4
-    ITEM_CAPS = Items(saw=2, magnifying_glass=2, jammer=1, cigarettes=1, beer=8, burner_phone=8, inverter=4, adrenaline=4, remote=1)
-    GLOBAL_ITEM_CAPS = Items(saw=32, magnifying_glass=32, jammer=1, cigarettes=32, beer=32, burner_phone=32, inverter=32, adrenaline=32, remote=2)
-    ENABLED_ITEMS = Items(saw=1, magnifying_glass=1, jammer=1, cigarettes=1, beer=1, burner_phone=1, inverter=1, adrenaline=1, remote=1)
+    """The rules of one round. Immutable and interned: equal configs are the same object, and so are their derived tables.
     
-    def __init__(
-        self,
+    Item caps and enabled flags are tuples in POSSIBLE_ITEMS order. `ITEM_CAPS`, `GLOBAL_ITEM_CAPS` and `ENABLED_ITEMS`
+    still read them as Items, as copies. Enabled flags are recorded but, as they always have been, don't change what is
+    dealt: only caps do.
+    """
+    __slots__ = ('start_charges', 'sequences', 'item_caps', 'global_item_caps', 'enabled_items', '_capped', '_exhausted', '_choices', '__weakref__')
+    DEFAULT_ITEM_CAPS = (2, 2, 1, 1, 8, 8, 4, 4, 1)
+    DEFAULT_GLOBAL_ITEM_CAPS = (32, 32, 1, 32, 32, 32, 32, 32, 2)
+    DEFAULT_ENABLED_ITEMS = (1,) * len(POSSIBLE_ITEMS)
+    ITEM_CAPS = _ItemsAlias('item_caps')
+    GLOBAL_ITEM_CAPS = _ItemsAlias('global_item_caps')
+    ENABLED_ITEMS = _ItemsAlias('enabled_items')
+    INTERN_SIZE = 4096
+    _recent: OrderedDict[tuple, 'RoundConfig'] = OrderedDict()
+    _interned: WeakValueDictionary[tuple, 'RoundConfig'] = WeakValueDictionary()
+    # Configs built so far, as opposed to found in the intern tables
+    created = 0
+    
+    def __new__(
+        cls,
         start_charges: int | None = None, 
         sequences: list[SequenceConfig | None] | None = None, 
-        item_caps: Items | None = None,
-        global_item_caps: Items | None = None,
-        enabled_items: Items | None = None,
-        player_count: int | None = None
+        item_caps: Items | tuple[int, ...] | None = None,
+        global_item_caps: Items | tuple[int, ...] | None = None,
+        enabled_items: Items | tuple[int, ...] | None = None,
+        player_count: int | None = None,
+        rng = None
     ):
-        self.start_charges = start_charges if start_charges != None else random.randint(3, 5)
-        self.sequences = sequences if sequences != None else [None] * 4
-        for i in range(len(self.sequences)):
-            if self.sequences[i] == None:
+        rng = random if rng is None else rng
+        start_charges = start_charges if start_charges != None else rng.randint(3, 5)
+        sequences = list(sequences) if sequences != None else [None] * 4
+        for i in range(len(sequences)):
+            if sequences[i] == None:
                 if player_count == None:
                     raise ValueError("Player count may not be None if randomized sequence is passed.")
-                self.sequences[i] = SequenceConfig(player_count=player_count)
+                sequences[i] = SequenceConfig(player_count=player_count, rng=rng)
         
-        if item_caps != None:
-            self.ITEM_CAPS = item_caps
-        if global_item_caps != None:
-            self.GLOBAL_ITEM_CAPS = global_item_caps
-        if enabled_items != None:
-            for item in enabled_items:
-                if enabled_items[item] > 1:
-                    enabled_items[item] = 1
-                elif enabled_items[item] == 0:
-                    self.GLOBAL_ITEM_CAPS[item] = 0
-            self.ENABLED_ITEMS = enabled_items
+        item_caps = cls.DEFAULT_ITEM_CAPS if item_caps is None else _counts(item_caps)
+        global_item_caps = cls.DEFAULT_GLOBAL_ITEM_CAPS if global_item_caps is None else _counts(global_item_caps)
+        enabled_items = cls.DEFAULT_ENABLED_ITEMS if enabled_items is None else tuple(min(flag, 1) for flag in _counts(enabled_items))
+        return _intern(cls, (start_charges, tuple(sequences), item_caps, global_item_caps, enabled_items), cls._build)
+    
+    @classmethod
+    def _build(cls, key):
+        config = object.__new__(cls)
+        for name, value in zip(RoundConfig.__slots__, key):
+            object.__setattr__(config, name, value)
+        start_charges, _, item_caps, global_item_caps, _ = key
+        # What a board starts from: the items nobody can be handed, by player cap and by global cap, and the
+        # eligible items for every mask of blocked ones (Patch 1.2.1 leaves out the saw with 2 charges or fewer)
+        object.__setattr__(config, '_capped', sum(1 << item for item, cap in enumerate(item_caps) if cap <= 0))
+        object.__setattr__(config, '_exhausted', sum(1 << item for item, cap in enumerate(global_item_caps) if cap <= 0))
+        object.__setattr__(config, '_choices', _CHOICES[start_charges <= 2])
+        return config
+    
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+    
+    __delattr__ = __setattr__
+    
+    def __reduce__(self):
+        return RoundConfig, (self.start_charges, list(self.sequences), self.item_caps, self.global_item_caps, self.enabled_items)
+    
+    def __repr__(self):
+        return f"RoundConfig({self.start_charges}, {list(self.sequences)})"
+
+def _counts(items: Items | tuple[int, ...]) -> tuple[int, ...]:
+    return tuple(items.counts if isinstance(items, Items) else items)
 
 class GameConfig:
     rounds = list[RoundConfig]    
@@ -164,61 +355,179 @@ class GameConfig:
         self.rounds = rounds
 
 class BuckshotGame:
-    def __init__(self, players: list, config: GameConfig = None):
+    def __init__(self, players: list, config: GameConfig = None, seed: int | RandomStreams | None = None, recorder = None):
+        """
+        Args:
+            players (list[AbstractEngine]): One engine per seat
+            config (GameConfig | None): The rounds to play; rounds left as None are randomized when they start
+            seed (int | RandomStreams | None): Plays the game on substreams of this seed instead of the global `random` module.
+                Each round's config, each reload within a round, each engine and the final tiebreak draw from separate streams.
+            recorder (TrajectoryRecorder | None): Records every move played (see buckshot_roulette.recorder)
+        """
         from buckshot_roulette.multiplayer.ai import AbstractEngine
         self.player_count = len(players)
         self.players: list[AbstractEngine] = players
+        self.streams = seed if seed is None or isinstance(seed, RandomStreams) else RandomStreams(seed)
         
         if config == None:
-            self.config = [RoundConfig(player_count=self.player_count) for _ in range(self.player_count)]
+            self.config = GameConfig([RoundConfig(player_count=self.player_count, rng=self._rng(ROUND, idx)) for idx in range(self.player_count)])
         else:
             self.config = config
         
         self.round_idx = 0
+        self.recorder = recorder
+        # The round in progress and the rounds won so far, kept by begin()/to_move()
+        self.board: BuckshotRoulette | None = None
+        self.shotgun: ShellSequence | None = None
+        self.winners: dict[int, int] = {}
+        # Awaitables returned by coroutine engine callbacks, awaited by an async driver
+        self.pending: list = []
+        # Called with every event; nothing is built for them while this is empty
+        self.listeners: list = []
+    
+    def _rng(self, *counters):
+        return random if self.streams is None else self.streams.rng(*counters)
     
     def play_round(self):
-        if self.config.rounds[self.round_idx] == None:
-            self.config.rounds[self.round_idx] = RoundConfig(player_count=self.player_count)
-        game: BuckshotRoulette = BuckshotRoulette(self.config.rounds[self.round_idx], self.player_count)
-        shotgun = ([True] * game.live) + ([False] * (game.total - game.live))
-        random.shuffle(shotgun)
-        while game.winner() == None:
-            player = self.players[game.current_turn]
-            player_idx = game.current_turn
-            
-            move, ad_target = player.choice(game)
-            res_private, res_public, new_shotgun = game.make_move(move, shotgun, ad_target)
-            #print(f"[{player_idx}]: {move} -- {res_private} / {res_public} -- {new_shotgun}")
-            
-            # Update Shotgun- if length is 0 generate a new sequence
-            if len(new_shotgun) == 0:
-                shotgun = ([True] * game.live) + ([False] * (game.total - game.live))
-                random.shuffle(shotgun)
-                for i in range(self.player_count):
-                    self.players[i].on_reload(game)
-            else:
-                shotgun = new_shotgun
-            
-            # Update all players as to the game state
-            for i in range(self.player_count):
-                if i == player_idx:
-                    player.on_own_move(move, res_private)
-                else:
-                    self.players[i].on_opponent_move(move, res_public)
-        victor = game.winner()
-        self.round_idx += 1
-        return victor
+        self._start_round()
+        while self.board.winner() == None:
+            player = self.players[self.board.current_turn]
+            if self.listeners:
+                self._emit(Turn(self.board.current_turn))
+            self.apply(player.choice(self.board))
+            self._check_sync()
+        return self._finish_round()
 
     def play(self):
-        winners = {}
-        while self.round_idx < len(self.config.rounds):
-            winner = self.play_round()
-            if winner in winners:
-                winners[winner] += 1
+        self.begin()
+        while (turn := self.to_move()) is not None:
+            player, board = turn
+            if self.listeners:
+                self._emit(Turn(board.current_turn))
+            self.apply(player.choice(board))
+            self._check_sync()
+        winner = self.result()
+        if self.listeners:
+            self._emit(Winner(winner))
+        return winner
+
+    def events(self):
+        """Plays the game out like `play`, yielding its events (see buckshot_roulette.events) as they happen"""
+        queue = []
+        self.subscribe(queue.append)
+        try:
+            self.begin()
+            while (turn := self.to_move()) is not None:
+                yield from queue
+                queue.clear()
+                player, board = turn
+                yield Turn(board.current_turn)
+                self.apply(player.choice(board))
+                self._check_sync()
+            yield from queue
+            yield Winner(self.result())
+        finally:
+            self.unsubscribe(queue.append)
+
+    def subscribe(self, listener):
+        """Calls `listener(event)` with every event of the rounds played from now on"""
+        self.listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        self.listeners.remove(listener)
+
+    def _emit(self, event):
+        for listener in self.listeners:
+            listener(event)
+
+    def _emit_deal(self, held: list[list[int]]):
+        # The shells just loaded and the items each seat was handed on top of `held`
+        game = self.board
+        self._emit(Reload(game.live, game.total))
+        for idx, items in enumerate(game.items):
+            self._emit(ItemDrop(idx, [
+                item for item, before, count in zip(POSSIBLE_ITEMS, held[idx], items.counts) for _ in range(count - before)
+            ]))
+
+    # play() in steps, so a driver can interleave many games (see buckshot_roulette.lockstep)
+
+    def begin(self):
+        if self.streams is not None:
+            for seat, player in enumerate(self.players):
+                player.rng = self.streams.rng(ENGINE, seat)
+        self.winners = {}
+        if self.recorder is not None:
+            self.recorder.begin_game()
+
+    def to_move(self):
+        """The `(engine, board)` whose choice is needed next, or None once every round has been played"""
+        while True:
+            if self.board is None:
+                if self.round_idx >= len(self.config.rounds):
+                    return None
+                self._start_round()
+            if self.board.winner() == None:
+                return self.players[self.board.current_turn], self.board
+            winner = self._finish_round()
+            if winner in self.winners:
+                self.winners[winner] += 1
             else:
-                winners[winner] = 1
+                self.winners[winner] = 1
 
+    def apply(self, choice: tuple[str, int | None]):
+        """Plays the `(move, adrenaline target)` choice of the engine returned by `to_move`; the move may be an action index"""
+        action, ad_target = choice
+        game = self.board
+        player_idx = game.current_turn
+        player = self.players[player_idx]
+        move = action
+        if type(action) is int:
+            # Engines, the recorder and listeners are told the move by name
+            owner, move = action_table(self.player_count)[action]
+            if owner and ad_target is None:
+                ad_target = game.offset_to_idx(owner)
+        recorder = self.recorder
+        if recorder is not None:
+            recorder.record_state(game, self.shotgun)
+        res_private, res_public, new_shotgun = game.make_move(action, self.shotgun, ad_target, allow_reload=False)
+        if recorder is not None:
+            recorder.record_move(move, res_private, res_public, ad_target)
+        listeners = self.listeners
+        if listeners:
+            self._emit(Move(player_idx, move, res_private, res_public, ad_target))
+            winner = game.winner()
+            if winner is not None:
+                self._emit(Winner(winner, self.round_idx))
+        
+        # Update Shotgun- if length is 0 generate a new sequence
+        if len(new_shotgun) == 0:
+            # Each reload deals, shuffles and draws everything up to the next one from its own stream,
+            # so a deal doesn't depend on how many rolls came before it
+            self._reloads += 1
+            if self.streams is not None:
+                game.rng = self.streams.rng(ROUND, self.round_idx, RELOAD, self._reloads)
+            if listeners and game.winner() is None:
+                held = [items.counts[:] for items in game.items]
+                game.next_sequence()
+                self._emit_deal(held)
+            else:
+                game.next_sequence()
+            self.shotgun = ShellSequence.shuffled(game.live, game.total, game.rng)
+            for i in range(self.player_count):
+                self._defer(self.players[i].on_reload(game))
+        else:
+            self.shotgun = new_shotgun
+        
+        # Update all players as to the game state
+        for i in range(self.player_count):
+            if i == player_idx:
+                self._defer(player.on_own_move(move, res_private))
+            else:
+                self._defer(self.players[i].on_opponent_move(move, res_public))
+
+    def result(self) -> int:
         # Find all winners that have the highest occurrence count
+        winners = self.winners
         modes = [winner for winner, count in winners.items() if count == max(winners.values())]
         
         # Select a winner of the overall game
@@ -228,13 +537,52 @@ class BuckshotGame:
             # This branch occurs in the unlikely event that no player has gotten a plurality of wins
             # Strictly speaking ties are probably broken based on time taken
             # But animation times aren't implemented and realistically this is a very unlikely scenario
-            return random.choice(modes)      
+            return self._rng(TIEBREAK).choice(modes)      
+
+    def _defer(self, result):
+        # Coroutine engine callbacks hand back awaitables; buckshot_roulette.aio awaits them before the game goes on
+        if result is not None and inspect.isawaitable(result):
+            self.pending.append(result)
+
+    def _check_sync(self):
+        if self.pending:
+            for awaitable in self.pending:
+                getattr(awaitable, 'close', lambda: None)()
+            raise TypeError("Engine callbacks returned coroutines; play coroutine engines with buckshot_roulette.aio")
+
+    def _start_round(self):
+        round_idx = self.round_idx
+        if self.config.rounds[round_idx] == None:
+            self.config.rounds[round_idx] = RoundConfig(player_count=self.player_count, rng=self._rng(ROUND, round_idx))
+        self._reloads = 0
+        game = BuckshotRoulette(self.config.rounds[round_idx], self.player_count, rng=self._rng(ROUND, round_idx, RELOAD, 0))
+        self.board = game
+        self.shotgun = ShellSequence.shuffled(game.live, game.total, game.rng)
+        # The first load counts as a reload, so engines reused across rounds and games start each one fresh
+        for player in self.players:
+            self._defer(player.on_reload(game))
+        if self.listeners:
+            self._emit_deal([[0] * len(POSSIBLE_ITEMS) for _ in game.items])
+
+    def _finish_round(self) -> int:
+        victor = self.board.winner()
+        if self.recorder is not None:
+            self.recorder.end_episode(victor)
+        self.board = None
+        self.round_idx += 1
+        return victor
 
 class BuckshotRoulette:
-    POSSIBLE_ITEMS = ['saw', 'magnifying_glass', 'jammer', 'cigarettes', 'beer', 'burner_phone', 'adrenaline', 'inverter', 'remote']
+    __slots__ = (
+        'config', 'rng', 'player_count', 'charges', 'current_turn', 'turn_inc', 'items', 'statuses', 'sequence_idx', 'total', 'live',
+        'held', 'inventory', '_capped', '_exhausted', '_caps', '_global_caps', '_choices', '_key', '_undo', '_frames'
+    )
+    POSSIBLE_ITEMS = POSSIBLE_ITEMS
     
-    def __init__(self, config: RoundConfig, player_count: int = 4):
+    def __init__(self, config: RoundConfig, player_count: int = 4, rng = None):
         self.config = config        
+        # Any random.Random-compatible generator; the global random module by default
+        self.rng = random if rng is None else rng
         
         self.player_count = player_count
         
@@ -245,45 +593,56 @@ class BuckshotRoulette:
         self.turn_inc = 1
         
         self.items: list[Items] = [Items() for _ in range(player_count)]
+        # Kept up to date by _add_item: items held by each player, and of each item across all players
+        self.held = [0] * player_count
+        self.inventory = [0] * len(POSSIBLE_ITEMS)
+        # Bits of the items each player holds up to their cap, and of those at the global cap across the table
+        self._caps = config.item_caps
+        self._global_caps = config.global_item_caps
+        self._capped = [config._capped] * player_count
+        self._exhausted = config._exhausted
+        self._choices = config._choices
         
-        self.statuses: set[GameStatus] = set()
+        # Bit `1 << status.value` of every GameStatus in effect
+        self.statuses: int = 0
         
         # Will be incremented to 0 in first call of reload()
         self.sequence_idx = -1
+        self.total = 0
+        self.live = 0
+        self._undo = []
+        self._frames = []
+        self._key = self._compute_key()
         self.next_sequence()
     
     # Key is player count, Value is a list of tuples in format (live, blank)
     # From mp_main.tscn    
     
     def next_sequence(self, drop_items = True):
-        self.statuses = set()
-        self.sequence_idx = (self.sequence_idx + 1) % len(self.config.sequences)
+        if self._frames:
+            self._undo += (_U_STATUSES, self.statuses, None, _U_SEQUENCE, self.sequence_idx, None)
+        self._key ^= _Z_STATUS_MASKS[self.statuses]
+        self.statuses = 0
+        sequence_idx = (self.sequence_idx + 1) % len(self.config.sequences)
+        self._key ^= _Z_SEQUENCE[self.sequence_idx] ^ _Z_SEQUENCE[sequence_idx]
+        self.sequence_idx = sequence_idx
         new_sequence = self.config.sequences[self.sequence_idx]
-        self.total = new_sequence.live + new_sequence.blank
-        self.live = new_sequence.live
+        self._set_shells(new_sequence.live + new_sequence.blank, new_sequence.live)
         if drop_items:
             self.give_items(new_sequence.item_count)
     
     def give_items(self, item_count):
-        global_count = Items()
-        for player in self.items:
-            for i in self.POSSIBLE_ITEMS:
-                global_count[i] += player[i]
-        for player in self.items:
-            if player.item_count() == 8:
+        # Global caps are checked against the table as it was before anyone is handed anything
+        exhausted = self._exhausted
+        for player_idx in range(self.player_count):
+            held = self.held[player_idx]
+            if held == 8:
                 # unfortunate.
                 break
-            choices = [i for i in self.POSSIBLE_ITEMS if player[i] < self.config.ITEM_CAPS[i] and global_count[i] < self.config.GLOBAL_ITEM_CAPS[i]]
-            
-            # Patch 1.2.1
-            # TODO: Double check behavior with source code when someone rips it
-            if self.config.start_charges <= 2 and 'saw' in choices:
-                choices.remove('saw')
-             
-            if len(choices) > 0:
-                items = random.choices(choices, k=min(item_count, 8 - player.item_count()))
-                for item in items:
-                    player[item] += 1
+            choices = self._choices[self._capped[player_idx] | exhausted]
+            if choices:
+                for item in self.rng.choices(choices, k=min(item_count, 8 - held)):
+                    self._add_item(player_idx, item, 1)
     
     def switch_turn(self):
         # Check for a winner- if so this doesn't matter
@@ -294,11 +653,14 @@ class BuckshotRoulette:
         # We limit by player count to prevent infinite looping
         for _ in range(self.player_count * 2):
             n = (n + self.turn_inc) % self.player_count
-            if GameStatus(n) in self.statuses:
+            if self.statuses & _JAMMED[n]:
                 # Player jammed
-                self.statuses.remove(GameStatus(n))
+                self._remove_status(_JAMMED[n])
                 continue
             if self.charges[n] > 0:
+                if self._frames:
+                    self._undo += (_U_TURN, self.current_turn, None)
+                self._key ^= _Z_TURN[self.current_turn] ^ _Z_TURN[n]
                 self.current_turn = n
                 return n
         raise ValueError("No valid turns available.")
@@ -320,73 +682,107 @@ class BuckshotRoulette:
             return players[0]
         return None
     
-    def moves(self):
-        if GameStatus.ADRENALINE_ACTIVE in self.statuses:
-            moves = [] # Player MUST pick an opponent's item
-            opponents = self.living_players()
-            opponents.remove(self.current_turn)
-            for player in opponents:
-                if player == self.current_turn:
-                    continue
-                for item in self.items[player]:
-                    if item == 'adrenaline':
+    def legal_action_mask(self) -> int:
+        """The legal actions of `action_table(player_count)`, as bits of an int.
+
+        For a NumPy bool row: `(np.uint64(mask) >> np.arange(len(action_table(n)), dtype=np.uint64)) & 1 != 0`.
+        """
+        count = self.player_count
+        turn = self.current_turn
+        charges = self.charges
+        shoot, use, jam = _action_bits(count)
+        living = [offset for offset in range(count) if charges[(turn + offset) % count] > 0]
+        if self.statuses & _ADRENALINE_ACTIVE:
+            mask = 0 # Player MUST pick an opponent's item
+            for owner in living[1:]:
+                items = self.items[(turn + owner) % count].counts
+                bits = use[owner]
+                for item in range(len(items)):
+                    if items[item] < 1 or item == ADRENALINE:
                         continue
-                    if item == 'jammer':
-                        moves.extend([(player, f"{item}_{self.idx_to_offset(i)}") for i in opponents])
+                    if item == JAMMER:
+                        for target in living[1:]:
+                            mask |= jam[owner][target]
                     else:
-                        moves.append((player, item))
-        else:
-            moves = []
-            # Player may shoot any one of the currently living players
-            players = self.living_players(as_offset=True)
-            for player in players:
-                moves.append((0, f'shoot_{player}'))
-            # Item Uses
-            items = self.items[self.current_turn]
-            for item in items:
-                if item == 'jammer':
-                    moves.extend([(player, f"{item}_{i}") for i in players if i != 0])
-                else:
-                    moves.append((player, item))
-                
-        if len(moves) == 0:
+                        mask |= bits[item]
+            if mask:
+                return mask
             # Only possible if the previous move is adrenaline, and there are no valid items to take
             # Unfortunate.
-            self.statuses.remove(GameStatus.ADRENALINE_ACTIVE)
-            return self.moves()            
-        return moves
+            self._remove_status(_ADRENALINE_ACTIVE)
+        mask = 0
+        # Player may shoot any one of the currently living players
+        for offset in living:
+            mask |= shoot[offset]
+        # Item Uses
+        items = self.items[turn].counts
+        bits = use[0]
+        for item in range(len(items)):
+            if items[item] < 1:
+                continue
+            if item == JAMMER:
+                for target in living[1:]:
+                    mask |= jam[0][target]
+            else:
+                mask |= bits[item]
+        return mask
+
+    def legal_actions(self) -> list[int]:
+        """The legal actions of `action_table(player_count)`, in order"""
+        mask = self.legal_action_mask()
+        actions = []
+        while mask:
+            low = mask & -mask
+            actions.append(low.bit_length() - 1)
+            mask ^= low
+        return actions
+
+    def moves(self):
+        """The legal moves as `(owner, move)`, where owner is whose item is used while adrenaline is active.
+
+        Listed seat by seat in table order, each seat's items in POSSIBLE_ITEMS order; see `legal_actions` for action order.
+        """
+        mask = self.legal_action_mask()
+        order = _move_order(self.player_count, self.current_turn, bool(self.statuses & _ADRENALINE_ACTIVE))
+        return [(owner, move) for bit, owner, move in order if mask >> bit & 1]
     
     def make_move(
         self, 
-        move: Literal['shoot_0', 'shoot_1', 'shoot_2', 'shoot_3', 'saw', 'magnifying_glass', 'jammer_1', 'jammer_2', 'jammer_3', 'cigarettes', 'beer', 'burner_phone', 'adrenaline', 'inverter', 'remote'], 
-        shotgun: list[bool],
+        move: int | Literal['shoot_0', 'shoot_1', 'shoot_2', 'shoot_3', 'saw', 'magnifying_glass', 'jammer_1', 'jammer_2', 'jammer_3', 'cigarettes', 'beer', 'burner_phone', 'adrenaline', 'inverter', 'remote'], 
+        shotgun: ShellSequence | list[bool],
         adrenaline_target: int | None = None,
-        allow_reload: bool = True
+        allow_reload: bool = True,
+        roll: int | None = None
     ):
-        if GameStatus.ADRENALINE_ACTIVE in self.statuses:
+        """Plays a move against the given chamber, returning `(private result, public result, shotgun)`.
+        
+        `move` is a move string or an index into `action_table(player_count)`; an index names whose item is taken
+        while adrenaline is active, so `adrenaline_target` can be left out. `roll` forces the shell index revealed by
+        the burner phone instead of drawing it.
+        """
+        shotgun = ShellSequence.coerce(shotgun)
+        owner_offset, kind, arg = self._decode(move)
+        if self.statuses & _ADRENALINE_ACTIVE:
             if adrenaline_target == None:
-                raise ValueError('Must specify which player items are being taken from if adrenaline is active.')
-            target = adrenaline_target
-            items = self.items[target]
-            self.statuses.remove(GameStatus.ADRENALINE_ACTIVE)
+                if not owner_offset:
+                    raise ValueError('Must specify which player items are being taken from if adrenaline is active.')
+                adrenaline_target = self.offset_to_idx(owner_offset)
+            owner = adrenaline_target
+            self._remove_status(_ADRENALINE_ACTIVE)
         else:
-            items = self.items[self.current_turn]
+            owner = self.current_turn
 
         out_val = None, None, shotgun
 
-        if move.startswith('shoot'):
-            idx = int(move.split('_')[1])
-            is_live = shotgun[0]
-            shotgun = shotgun[1:]
-            target = self.offset_to_idx(idx)
+        if kind == SHOOT:
+            is_live = shotgun.pop()
+            target = self.offset_to_idx(arg)
             damage = 1 if is_live else 0
-            self.total -= 1
-            if is_live:
-                self.live -= 1
-            if GameStatus.SAWED_OFF in self.statuses:
-                self.statuses.remove(GameStatus.SAWED_OFF)
+            self._set_shells(self.total - 1, self.live - 1 if is_live else self.live)
+            if self.statuses & _SAWED_OFF:
+                self._remove_status(_SAWED_OFF)
                 damage *= 2
-            self.charges[target] = max(0, self.charges[target] - damage)
+            self._set_charge(target, max(0, self.charges[target] - damage))
             if target == self.current_turn:
                 if is_live:
                     self.switch_turn()
@@ -396,56 +792,318 @@ class BuckshotRoulette:
             else:
                 self.switch_turn()
                 out_val = damage, damage, shotgun
-        elif move.startswith('jammer'):
-            items.jammer -= 1
-            idx = int(move.split('_')[1])
-            target = self.offset_to_idx(idx)
-            match target:
-                case 0:
-                    self.statuses.add(GameStatus.JAMMED_0)
-                case 1:
-                    self.statuses.add(GameStatus.JAMMED_1)
-                case 2:
-                    self.statuses.add(GameStatus.JAMMED_2)
-                case 3:
-                    self.statuses.add(GameStatus.JAMMED_3)
+        elif kind == JAM:
+            self._add_item(owner, JAMMER, -1)
+            target = self.offset_to_idx(arg)
+            self._add_status(_JAMMED[target])
             out_val = target, target, shotgun        
         else:
-            match move:
-                case 'saw':
-                    items.saw -= 1
-                    self.statuses.add(GameStatus.SAWED_OFF)
-                case 'magnifying_glass':
-                    items.magnifying_glass -= 1
-                    out_val = shotgun[0], None, shotgun
-                case 'cigarettes':
-                    items.cigarettes -= 1
-                    self.charges[self.current_turn] = min(self.charges[self.current_turn]+1, self.config.start_charges)
-                case 'beer':
-                    items.beer -= 1
-                    if len(shotgun) > 1:
-                        val = shotgun[0]
-                        shotgun = shotgun[1:]
-                        out_val = val, val, shotgun
-                    else:
-                        shotgun = []
-                        out_val = None, None, shotgun
-                case 'burner_phone':
-                    items.burner_phone -= 1
-                    if len(shotgun) > 2:
-                        idx = random.randint(2, len(shotgun)-1)
-                        out_val = (idx, shotgun[idx]), None, shotgun
-                case 'adrenaline':
-                    items.adrenaline -= 1
-                    self.statuses.add(GameStatus.ADRENALINE_ACTIVE)
-                case 'inverter':
-                    items.inverter -= 1
-                    shotgun[0] = not shotgun[0]
-                    self.statuses.add(GameStatus.INVERTER_UNCERTAINTY)
-                case 'remote':
-                    items.remote -= 1
-                    self.turn_inc *= -1
-                    out_val = self.turn_inc, self.turn_inc, shotgun
+            self._add_item(owner, arg, -1)
+            if arg == SAW:
+                self._add_status(_SAWED_OFF)
+            elif arg == MAGNIFYING_GLASS:
+                out_val = shotgun.peek(), None, shotgun
+            elif arg == CIGARETTES:
+                self._set_charge(self.current_turn, min(self.charges[self.current_turn]+1, self.config.start_charges))
+            elif arg == BEER:
+                if len(shotgun) > 1:
+                    val = shotgun.pop()
+                    out_val = val, val, shotgun
+                else:
+                    shotgun.clear()
+                    out_val = None, None, shotgun
+            elif arg == BURNER_PHONE:
+                if len(shotgun) > 2:
+                    idx = self.rng.randint(2, len(shotgun)-1) if roll is None else roll
+                    out_val = (idx, shotgun[idx]), None, shotgun
+            elif arg == ADRENALINE:
+                self._add_status(_ADRENALINE_ACTIVE)
+            elif arg == INVERTER:
+                shotgun.invert()
+                self._add_status(_INVERTER_UNCERTAINTY)
+            elif arg == REMOTE:
+                if self._frames:
+                    self._undo += (_U_REVERSED, None, None)
+                self.turn_inc *= -1
+                self._key ^= _Z_REVERSED
+                out_val = self.turn_inc, self.turn_inc, shotgun
         if allow_reload and len(shotgun) == 0:
             self.next_sequence()
-        return out_val
\ No newline at end of file
+        return out_val
+    
+    def _decode(self, move: int | str) -> tuple[int | None, int, int]:
+        # (owner offset, kind, argument) of an action index, or of a move string, which carries no owner
+        if type(move) is int:
+            return _action_codes(self.player_count)[move]
+        code = MOVE_CODES.get(move)
+        if code is None:
+            raise ValueError(f"Unknown move {move!r}")
+        return None, *code
+
+    # Every change to the board's state goes through these, so the Zobrist key stays current and, while a push is
+    # open, the undo trail gets the (op, a, b) that takes the change back
+    def _set_charge(self, player, value):
+        old = self.charges[player]
+        if old != value:
+            if self._frames:
+                self._undo += (_U_CHARGE, player, old)
+            self._key ^= _Z_CHARGES[player][old] ^ _Z_CHARGES[player][value]
+            self.charges[player] = value
+    
+    def _add_item(self, player, item, amount):
+        counts = self.items[player].counts
+        if self._frames:
+            self._undo += (_U_ITEM, player, item << 4 | counts[item])
+        count = counts[item] + amount
+        self._key ^= _Z_ITEMS[player][item][count - amount] ^ _Z_ITEMS[player][item][count]
+        counts[item] = count
+        self.held[player] += amount
+        total = self.inventory[item] + amount
+        self.inventory[item] = total
+        bit = 1 << item
+        if count >= self._caps[item]:
+            self._capped[player] |= bit
+        else:
+            self._capped[player] &= ~bit
+        if total >= self._global_caps[item]:
+            self._exhausted |= bit
+        else:
+            self._exhausted &= ~bit
+    
+    def _add_status(self, bit):
+        if not self.statuses & bit:
+            if self._frames:
+                self._undo += (_U_STATUSES, self.statuses, None)
+            self._key ^= _Z_STATUS_MASKS[bit]
+            self.statuses |= bit
+    
+    def _remove_status(self, bit):
+        if self.statuses & bit:
+            if self._frames:
+                self._undo += (_U_STATUSES, self.statuses, None)
+            self._key ^= _Z_STATUS_MASKS[bit]
+            self.statuses ^= bit
+    
+    def _set_shells(self, total, live):
+        if self._frames:
+            self._undo += (_U_SHELLS, self.total, self.live)
+        self._key ^= _Z_TOTAL[self.total] ^ _Z_TOTAL[total] ^ _Z_LIVE[self.live] ^ _Z_LIVE[live]
+        self.total = total
+        self.live = live
+    
+    def _compute_key(self) -> int:
+        key = _Z_PLAYERS[self.player_count] ^ _Z_TURN[self.current_turn] ^ _Z_SEQUENCE[self.sequence_idx] ^ _Z_TOTAL[self.total] ^ _Z_LIVE[self.live]
+        if self.turn_inc < 0:
+            key ^= _Z_REVERSED
+        key ^= _Z_STATUS_MASKS[self.statuses]
+        for player in range(self.player_count):
+            key ^= _Z_CHARGES[player][self.charges[player]]
+            for idx, count in enumerate(self.items[player].counts):
+                key ^= _Z_ITEMS[player][idx][count]
+        return key
+    
+    def has_status(self, status: GameStatus) -> bool:
+        return self.statuses >> status.value & 1 == 1
+    
+    def key(self) -> int:
+        """64-bit Zobrist key of the position, updated incrementally by every move. Equal boards have equal keys."""
+        return self._key
+    
+    def rehash(self):
+        """Recomputes `key()` and the inventory counters from scratch; only needed after editing the board's fields directly"""
+        self._key = self._compute_key()
+        counts = [player.counts for player in self.items]
+        self.held = [sum(held) for held in counts]
+        self.inventory = [sum(total) for total in zip(*counts)]
+        self._capped = [sum(1 << item for item, cap in enumerate(self._caps) if held[item] >= cap) for held in counts]
+        self._exhausted = sum(1 << item for item, cap in enumerate(self._global_caps) if self.inventory[item] >= cap)
+    
+    def __hash__(self):
+        return self._key
+    
+    def outcomes(
+        self,
+        move: int | str,
+        adrenaline_target: int | None = None,
+        known_shells: list[bool | None] | None = None,
+        live: int | None = None,
+        total: int | None = None
+    ):
+        """Every way a move can play out, as `(probability, successor, (private result, public result))` tuples.
+
+        Chance comes from the unknown shells (given the live/total counts and any known positions) and the burner phone's index.
+        Identical outcomes are merged. A move that empties the chamber is not reloaded; the next sequence is up to the caller.
+
+        Args:
+            move (str): The move to play
+            adrenaline_target (int | None): Whose item is taken if adrenaline is active
+            known_shells (list[bool | None] | None): Known shells by position in the chamber
+            live (int | None): Live shells left, defaulting to `self.live`
+            total (int | None): Shells left, defaulting to `self.total`
+        """
+        live = self.live if live is None else live
+        total = self.total if total is None else total
+        known = list(known_shells[:total]) if known_shells else []
+        known += [None] * (total - len(known))
+        
+        outcomes = []
+        for p, fixed, roll in self._branches(move, known, live, total):
+            successor = self.copy()
+            private, public, _ = successor.make_move(move, consistent_chamber(fixed, known, live, total), adrenaline_target, allow_reload=False, roll=roll)
+            result = (private, public)
+            for i, (q, other, other_result) in enumerate(outcomes):
+                if other_result == result and other == successor:
+                    outcomes[i] = (q + p, other, other_result)
+                    break
+            else:
+                outcomes.append((p, successor, result))
+        return outcomes
+    
+    def _branches(self, move, known, live, total) -> list[tuple[float, dict[int, bool], int | None]]:
+        """The chance branches of a move as `(probability, fixed shells, roll)`; see `outcomes`"""
+        _, kind, arg = self._decode(move)
+        if kind == USE and arg == BURNER_PHONE and total > 2:
+            branches = []
+            for idx in range(2, total):
+                p_live = live_odds(idx, known, live, total)
+                for shell, p in ((True, p_live), (False, 1 - p_live)):
+                    if p > 0:
+                        branches.append((p / (total - 2), {idx: shell}, idx))
+            return branches
+        if total > 0 and (kind == SHOOT or (kind == USE and arg in (BEER, MAGNIFYING_GLASS))):
+            p_live = live_odds(0, known, live, total)
+            return [(p, {0: shell}, None) for shell, p in ((True, p_live), (False, 1 - p_live)) if p > 0]
+        return [(1.0, {}, None)]
+    
+    def clone(self):
+        """Copies the per-game state; the round config and the rng are shared"""
+        # Skip __init__ so no throwaway sequence is dealt for the new board
+        new_board = BuckshotRoulette.__new__(BuckshotRoulette)
+        new_board.config = self.config
+        new_board.rng = self.rng
+        new_board.player_count = self.player_count
+        new_board.charges = self.charges[:]
+        new_board.current_turn = self.current_turn
+        new_board.turn_inc = self.turn_inc
+        new_board.items = [player.copy() for player in self.items]
+        new_board.held = self.held[:]
+        new_board.inventory = self.inventory[:]
+        new_board._capped = self._capped[:]
+        new_board._exhausted = self._exhausted
+        new_board._caps = self._caps
+        new_board._global_caps = self._global_caps
+        new_board._choices = self._choices
+        new_board.statuses = self.statuses
+        new_board.sequence_idx = self.sequence_idx
+        new_board.total = self.total
+        new_board.live = self.live
+        new_board._key = self._key
+        new_board._undo = []
+        new_board._frames = []
+        return new_board
+    
+    copy = clone
+    
+    def snapshot(self) -> tuple:
+        """The per-game state as a flat tuple of ints, for `restore` to put back; the config is left out"""
+        state = (
+            self._key, self.current_turn, self.turn_inc, self.statuses, self.sequence_idx, self.total, self.live, self._exhausted,
+            *self.charges, *self.held, *self._capped, *self.inventory
+        )
+        for player in self.items:
+            state += tuple(player.counts)
+        return state
+    
+    def restore(self, state: tuple):
+        """Puts back the state of a `snapshot` of this board, or of a board of the same round"""
+        (self._key, self.current_turn, self.turn_inc, self.statuses, self.sequence_idx, self.total, self.live, self._exhausted) = state[:8]
+        count = self.player_count
+        width = len(POSSIBLE_ITEMS)
+        self.charges[:] = state[8:8 + count]
+        self.held[:] = state[8 + count:8 + 2 * count]
+        self._capped[:] = state[8 + 2 * count:8 + 3 * count]
+        pos = 8 + 3 * count
+        self.inventory[:] = state[pos:pos + width]
+        for player in self.items:
+            pos += width
+            player.counts[:] = state[pos:pos + width]
+    
+    def __eq__(self, other):
+        if not isinstance(other, BuckshotRoulette):
+            return NotImplemented
+        return (self.config is other.config and
+                self.player_count == other.player_count and
+                self.charges == other.charges and
+                self.current_turn == other.current_turn and
+                self.turn_inc == other.turn_inc and
+                self.items == other.items and
+                self.statuses == other.statuses and
+                self.sequence_idx == other.sequence_idx and
+                self.total == other.total and
+                self.live == other.live)
+    
+    def push(
+        self,
+        move: int | str,
+        shotgun: ShellSequence | list[bool],
+        adrenaline_target: int | None = None,
+        allow_reload: bool = True,
+        roll: int | None = None
+    ):
+        """Plays a move like `make_move`, but records the state it changes so `pop` can take it back.
+
+        Only the fields the move changes are recorded, as flat entries on a trail that is reused from node to node.
+        The chamber is updated in place, so pass the same ShellSequence to every push of a line of play.
+        """
+        shotgun = ShellSequence.coerce(shotgun)
+        self._frames.append(len(self._undo))
+        self._undo += (self._key, shotgun, shotgun.bits, shotgun.cursor, shotgun.live)
+        return self.make_move(move, shotgun, adrenaline_target, allow_reload, roll)
+    
+    def pop(self):
+        """Takes back the last move made with `push`, including its effect on the chamber"""
+        mark = self._frames.pop()
+        undo = self._undo
+        # Newest change first; each is (op, a, b) after the frame's key and chamber
+        for pos in range(len(undo) - 3, mark + 2, -3):
+            op = undo[pos]
+            a = undo[pos + 1]
+            b = undo[pos + 2]
+            if op == _U_ITEM:
+                # Back to the old count, and the inventory counters with it
+                item = b >> 4
+                old = b & 0xF
+                counts = self.items[a].counts
+                amount = counts[item] - old
+                counts[item] = old
+                self.held[a] -= amount
+                total = self.inventory[item] - amount
+                self.inventory[item] = total
+                bit = 1 << item
+                if old >= self._caps[item]:
+                    self._capped[a] |= bit
+                else:
+                    self._capped[a] &= ~bit
+                if total >= self._global_caps[item]:
+                    self._exhausted |= bit
+                else:
+                    self._exhausted &= ~bit
+            elif op == _U_STATUSES:
+                self.statuses = a
+            elif op == _U_SHELLS:
+                self.total = a
+                self.live = b
+            elif op == _U_TURN:
+                self.current_turn = a
+            elif op == _U_CHARGE:
+                self.charges[a] = b
+            elif op == _U_REVERSED:
+                self.turn_inc = -self.turn_inc
+            else:
+                self.sequence_idx = a
+        self._key = undo[mark]
+        shotgun = undo[mark + 1]
+        shotgun.bits = undo[mark + 2]
+        shotgun.cursor = undo[mark + 3]
+        shotgun.live = undo[mark + 4]
+        del undo[mark:]
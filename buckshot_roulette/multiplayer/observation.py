@@ -0,0 +1,94 @@
+"""Fixed-layout feature vectors of multiplayer boards, written straight into caller-supplied buffers.
+
+`encode_observation(board, player, out)` fills `OBSERVATION_SIZE` floats of any writable float buffer (a NumPy array,
+an `array.array`, a `memoryview`...) through a memoryview, so it allocates nothing. `encode_observations` fills one row
+per board of an (N, OBSERVATION_SIZE) array. Seats are counted from `player`, so seat 0 is always `player`, seat 1
+whoever sits after them and so on; seats past the board's player count are all zeros:
+
+    [CHARGES, +5)   charges of each seat, then the round's starting charges
+    [SEATED, +4)    1 for each seat at the table
+    [ITEMS, +36)    item counts of each seat in POSSIBLE_ITEMS order
+    [STATUSES, +7)  jammed for each seat, then adrenaline active, inverter uncertainty, sawed off
+    [TURN, +5)      1 for the seat whose turn it is, then 1 if turn order is reversed
+    [SHELLS, +2)    live shells, total shells
+    [KNOWN, +16)    for the first KNOWN_SHELLS positions: 1 in the first slot if known live, in the second if known blank
+
+Known shells come from `player`'s own knowledge, passed as a `ShellBelief` or a dict of position to shell.
+"""
+from array import array
+from buckshot_roulette.shells import float_view, write_known
+from buckshot_roulette.multiplayer.game import BuckshotRoulette, GameStatus
+
+SEATS = 4
+KNOWN_SHELLS = 8
+CHARGES = 0
+SEATED = CHARGES + SEATS + 1
+ITEMS = SEATED + SEATS
+STATUSES = ITEMS + SEATS * len(BuckshotRoulette.POSSIBLE_ITEMS)
+TURN = STATUSES + SEATS + 3
+SHELLS = TURN + SEATS + 1
+KNOWN = SHELLS + 2
+OBSERVATION_SIZE = KNOWN + 2 * KNOWN_SHELLS
+
+_FLAGS = [GameStatus.ADRENALINE_ACTIVE.value, GameStatus.INVERTER_UNCERTAINTY.value, GameStatus.SAWED_OFF.value]
+
+def _write(board: BuckshotRoulette, player: int, view: memoryview, base: int, known):
+    count = board.player_count
+    statuses = board.statuses
+    for seat in range(SEATS):
+        seated = seat < count
+        idx = (player + seat) % count
+        view[base + CHARGES + seat] = board.charges[idx] if seated else 0
+        view[base + SEATED + seat] = seated
+        pos = base + ITEMS + seat * len(BuckshotRoulette.POSSIBLE_ITEMS)
+        if seated:
+            for held in board.items[idx].counts:
+                view[pos] = held
+                pos += 1
+        else:
+            for _ in BuckshotRoulette.POSSIBLE_ITEMS:
+                view[pos] = 0
+                pos += 1
+        view[base + STATUSES + seat] = seated and statuses >> idx & 1
+        view[base + TURN + seat] = seated and board.current_turn == idx
+    view[base + CHARGES + SEATS] = board.config.start_charges
+    for offset, bit in enumerate(_FLAGS):
+        view[base + STATUSES + SEATS + offset] = statuses >> bit & 1
+    view[base + TURN + SEATS] = board.turn_inc < 0
+    view[base + SHELLS] = board.live
+    view[base + SHELLS + 1] = board.total
+    write_known(view, base + KNOWN, known, board.total, KNOWN_SHELLS)
+
+def encode_observation(board: BuckshotRoulette, player: int, out = None, known = None):
+    """Writes `player`'s view of `board` into `out`, returning `out`.
+
+    Args:
+        board (BuckshotRoulette): The board to encode
+        player (int): Whose seat to encode from
+        out (buffer | None): A writable float buffer of at least `OBSERVATION_SIZE` values; a new `array('d')` if None
+        known (ShellBelief | dict[int, bool] | None): The shells `player` has seen, by position from the front
+    """
+    if out is None:
+        out = array('d', bytes(8 * OBSERVATION_SIZE))
+    view = float_view(out)
+    if len(view) < OBSERVATION_SIZE:
+        raise ValueError(f"Observation buffers need {OBSERVATION_SIZE} values, got {len(view)}")
+    _write(board, player, view, 0, known)
+    return out
+
+def encode_observations(boards: list[BuckshotRoulette], players, out, known: list | None = None):
+    """Writes one observation per board into the rows of an (N, OBSERVATION_SIZE) float array, returning `out`.
+
+    Args:
+        boards (list[BuckshotRoulette]): The boards to encode
+        players (int | list[int]): The seat to encode from, for every board or per board
+        out: A C-contiguous float array with a row per board
+        known (list | None): Per-board known shells, as in `encode_observation`
+    """
+    view = float_view(out)
+    if len(view) < len(boards) * OBSERVATION_SIZE:
+        raise ValueError(f"{len(boards)} observations need {len(boards) * OBSERVATION_SIZE} values, got {len(view)}")
+    single = isinstance(players, int)
+    for row, board in enumerate(boards):
+        _write(board, players if single else players[row], view, row * OBSERVATION_SIZE, None if known is None else known[row])
+    return out
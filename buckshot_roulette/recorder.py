@@ -0,0 +1,360 @@
+"""Columnar recording of played moves, and a memory-mapped reader for sampling them.
+
+Requires numpy (`pip install buckshot-roulette[batch]`). Pass a `TrajectoryRecorder` to either mode's `BuckshotGame`
+as `recorder=` and every move it plays becomes one row:
+
+    with TrajectoryRecorder('selfplay/') as recorder:
+        game = BuckshotGame(Dealer(0), Dealer(1), seed=0, recorder=recorder)
+        for idx in range(10000):
+            game.play(celebrate=False, itemsused=False, game=idx)
+    data = TrajectoryDataset('selfplay/')
+    batch = data[data.sample(4096)]
+
+Columns, one value per row:
+
+    game      int64   the game's stream index when seeded (singleplayer), else a count of games this recorder saw
+    step      int32   moves into the game
+    player    int8    the seat that moved
+    state     int8    the board before the move, laid out as SINGLEPLAYER_FIELDS or MULTIPLAYER_FIELDS; chamber_public is
+                      0 unknown, 1 blank, 2 live and multiplayer statuses are bits by GameStatus value
+    chamber   uint8   the shells left before the move, as bits from the front (bit 0 is the next shell)
+    shells    uint8   how many shells were left before the move
+    mask      uint64  legal actions before the move, bit i for action i
+    action    int8    the move, as an index into the mode's action list (-1 for a move outside it)
+    private   int8 x2 the result the mover saw, as a pair (see below)
+    public    int8 x2 the result everyone else saw
+    winner    int8    who won the episode the move belongs to: the game in singleplayer, the round in multiplayer
+
+Results are stored as pairs: `(value, NONE)` for a number or bool, `(index, shell)` for a burner phone and
+`(NONE, NONE)` for no result. Singleplayer actions are the move codes of `buckshot_roulette.singleplayer.batch`;
+multiplayer actions index the 4-seat `action_table`, which covers smaller tables too.
+
+Rows are buffered and written in chunks, cut only between episodes so an episode never spans two chunks. Each chunk
+is one `.npy` file per column under a unique name, plus a JSON manifest written last, so several processes can
+append to the same directory at once and a reader never sees half a chunk. `TrajectoryDataset` memory-maps every
+finished chunk.
+"""
+import glob
+import json
+import os
+import uuid
+import numpy as np
+from buckshot_roulette.singleplayer.game import POSSIBLE_ITEMS, ADRENALINE
+from buckshot_roulette.singleplayer.batch import MOVES
+from buckshot_roulette.multiplayer.game import BuckshotRoulette as MultiplayerBoard, GameStatus, action_table, action_index
+
+NONE = -128
+
+SINGLEPLAYER_FIELDS = (
+    ['max_charges', 'charges_0', 'charges_1', 'starter', 'current_turn', 'total', 'live', 'skip_next', 'chamber_public']
+    + [f'items_0_{item}' for item in POSSIBLE_ITEMS]
+    + [f'items_1_{item}' for item in POSSIBLE_ITEMS]
+    # Active handcuffs count in halves, since they wear off half at a time
+    + [f'active_{item}' for item in POSSIBLE_ITEMS]
+)
+MULTIPLAYER_FIELDS = (
+    ['player_count', 'start_charges', 'current_turn', 'turn_inc', 'total', 'live', 'statuses', 'sequence_idx']
+    + [f'charges_{seat}' for seat in range(4)]
+    + [f'items_{seat}_{item}' for seat in range(4) for item in MultiplayerBoard.POSSIBLE_ITEMS]
+)
+MULTIPLAYER_ACTIONS = action_table(4)
+# Fields that can go negative, stored offset by 128. Multiplayer live/total counts drift from the chamber,
+# since beer doesn't update them and the inverter can make a blank live.
+_SINGLEPLAYER_SIGNED = {'charges_0', 'charges_1'}
+_MULTIPLAYER_SIGNED = {'turn_inc', 'total', 'live'}
+
+_COLUMNS = [
+    ('game', np.int64, 1), ('step', np.int32, 1), ('player', np.int8, 1), ('chamber', np.uint8, 1), ('shells', np.uint8, 1),
+    ('mask', np.uint64, 1), ('state', np.int8, None), ('action', np.int8, 1), ('private', np.int8, 2), ('public', np.int8, 2),
+    ('winner', np.int8, 1),
+]
+_SP_ACTIONS = {move: idx for idx, move in enumerate(MOVES)}
+_MP_ACTIONS = action_index(4)
+_MP_PADDING = [0] * (4 * len(MultiplayerBoard.POSSIBLE_ITEMS))
+_MP_ADRENALINE = 1 << GameStatus.ADRENALINE_ACTIVE.value
+
+def _result(result) -> tuple[int, int]:
+    # Offset by 128 to fit a byte, so no result (NONE) is stored as 0
+    if result is None or result.__class__ is str:
+        return 0, 0
+    if result.__class__ is tuple:
+        return result[0] + 128, result[1] + 128
+    return result + 128, 0
+
+def _singleplayer_masks(state: np.ndarray) -> np.ndarray:
+    """The legal actions of every state row, as `BuckshotRoulette.moves` gives them, in bits"""
+    field = SINGLEPLAYER_FIELDS.index
+    count = len(POSSIBLE_ITEMS)
+    first = state[:, field('current_turn')][:, None] == 0
+    items0 = state[:, field('items_0_handcuffs'):][:, :count]
+    items1 = state[:, field('items_1_handcuffs'):][:, :count]
+    free = state[:, field('active_handcuffs'):][:, :count] == 0
+    own = np.where(first, items0, items1) > 0
+    steal = (np.where(first, items1, items0) > 0) & free
+    stealing = ~free[:, ADRENALINE] & steal.any(axis=1)
+    # With nothing to steal, moves() drops adrenaline and offers the player's own moves
+    free[:, ADRENALINE] = True
+    usable = np.where(stealing[:, None], steal, own & free)
+    bits = (usable @ (1 << np.arange(2, 2 + count, dtype=np.int64))).astype(np.uint64)
+    return bits | np.where(stealing, 0, 0b11).astype(np.uint64)
+
+def _multiplayer_masks(state: np.ndarray) -> np.ndarray:
+    """The legal actions of every state row, as multiplayer `BuckshotRoulette.moves` gives them, in bits"""
+    field = MULTIPLAYER_FIELDS.index
+    names = MultiplayerBoard.POSSIBLE_ITEMS
+    rows = np.arange(len(state))
+    players = state[:, field('player_count')].astype(np.int64)
+    turn = state[:, field('current_turn')].astype(np.int64)
+    charges = state[:, field('charges_0'):][:, :4]
+    items = state[:, field(f'items_0_{names[0]}'):][:, :4 * len(names)].reshape(len(state), 4, len(names))
+    # Seats by offset from the player to move
+    seats = [(turn + offset) % players for offset in range(4)]
+    living = [(offset < players) & (charges[rows, seats[offset]] > 0) for offset in range(4)]
+    held = [items[rows, seats[offset]] > 0 for offset in range(4)]
+
+    def bit(owner, move):
+        return np.uint64(1) << np.uint64(_MP_ACTIONS[(owner, move)])
+
+    def zero():
+        return np.zeros(len(state), dtype=np.uint64)
+
+    normal = zero()
+    for offset in range(4):
+        normal |= np.where(living[offset], bit(0, f'shoot_{offset}'), 0).astype(np.uint64)
+    for j, item in enumerate(names):
+        if item == 'jammer':
+            for target in range(1, 4):
+                normal |= np.where(held[0][:, j] & living[target], bit(0, f'jammer_{target}'), 0).astype(np.uint64)
+        else:
+            normal |= np.where(held[0][:, j], bit(0, item), 0).astype(np.uint64)
+    steal = zero()
+    for owner in range(1, 4):
+        for j, item in enumerate(names):
+            if item == 'adrenaline':
+                continue
+            has = living[owner] & held[owner][:, j]
+            if item == 'jammer':
+                for target in range(1, 4):
+                    steal |= np.where(has & living[target], bit(owner, f'jammer_{target}'), 0).astype(np.uint64)
+            else:
+                steal |= np.where(has, bit(owner, item), 0).astype(np.uint64)
+    # With nothing to steal, moves() drops adrenaline and offers the player's own moves
+    stealing = (state[:, field('statuses')].astype(np.int64) & _MP_ADRENALINE != 0) & (steal != 0)
+    return np.where(stealing, steal, normal)
+
+class TrajectoryRecorder:
+    def __init__(self, directory: str, multiplayer: bool = False, chunk_size: int = 1 << 16):
+        """
+        Args:
+            directory (str): Where chunks are written; created if missing, and shared safely with other recorders
+            multiplayer (bool): Record multiplayer games instead of singleplayer ones
+            chunk_size (int): Rows per chunk, give or take the episode that crosses it
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.multiplayer = multiplayer
+        self.fields = MULTIPLAYER_FIELDS if multiplayer else SINGLEPLAYER_FIELDS
+        self.chunk_size = chunk_size
+        self.name = f"{os.getpid()}-{uuid.uuid4().hex[:12]}"
+        self.chunks = 0
+        # A move is one row of bytes: chamber, shells, the state, action, private and public results. Everything
+        # else (game, step, player, mask, winner) follows from these and the episode bookkeeping, so it is worked
+        # out with numpy when a chunk is written rather than move by move.
+        self._width = 2 + len(self.fields) + 5
+        self._data = bytearray()
+        # (first row, game) of each game begun, and (rows so far, winner) at the end of each finished episode
+        self._games: list[tuple[int, int]] = []
+        self._episodes: list[tuple[int, int]] = []
+        self._count = 0
+        self._stealing = False
+        self._board = None
+        # Action and result bytes by (move, private, public), led by the owner's offset for a multiplayer steal
+        self._tails: dict[tuple, bytes] = {}
+
+    @property
+    def rows(self) -> int:
+        return len(self._data) // self._width
+
+    def begin_game(self, game: int | None = None):
+        """Starts a new game, numbered `game` or else by how many this recorder has seen; called by `BuckshotGame.begin`"""
+        self._games.append((self.rows, self._count if game is None else game))
+        self._count += 1
+
+    def record_state(self, board, shotgun):
+        """Opens a row with the position a move is about to be played from"""
+        charges = board.charges
+        if self.multiplayer:
+            count = board.player_count
+            row = [
+                shotgun.bits >> shotgun.cursor, shotgun.length - shotgun.cursor,
+                count, board.config.start_charges, board.current_turn, board.turn_inc + 128, board.total + 128, board.live + 128,
+                board.statuses, board.sequence_idx,
+            ]
+            row += charges
+            row += _MP_PADDING[:4 - count]
+            for held in board.items:
+                row += held.counts
+            row += _MP_PADDING[:(4 - count) * len(MultiplayerBoard.POSSIBLE_ITEMS)]
+            self._stealing = board.statuses & _MP_ADRENALINE
+            self._board = board
+        else:
+            active = board._active_items.counts
+            chamber = board.chamber_public
+            row = [
+                shotgun.bits >> shotgun.cursor, shotgun.length - shotgun.cursor,
+                board.max_charges, charges[0] + 128, charges[1] + 128, board.starter, board.current_turn, board.total, board.live,
+                board._skip_next, 0 if chamber is None else 1 + chamber,
+            ]
+            row += board.items[0].counts
+            row += board.items[1].counts
+            row.append(int(2 * active[0]))
+            row += active[1:]
+        self._data += bytes(row)
+
+    def record_move(self, move: str, private, public, ad_target: int | None = None):
+        """Closes the open row with the move played and what it revealed"""
+        key = (move, private, public)
+        if self._stealing and ad_target is not None:
+            key = (self._board.idx_to_offset(ad_target), *key)
+        tail = self._tails.get(key)
+        if tail is None:
+            tail = self._tails[key] = self._tail(key)
+        self._data += tail
+
+    def _tail(self, key: tuple) -> bytes:
+        # The action and result bytes of a move, the same every time the move and its results repeat
+        if self.multiplayer:
+            offset, move, private, public = key if len(key) == 4 else (0, *key)
+            action = _MP_ACTIONS.get((offset, move), 255)
+        else:
+            move, private, public = key
+            action = _SP_ACTIONS.get(move, 255)
+        return bytes((action, *_result(private), *_result(public)))
+
+    def end_episode(self, winner: int):
+        """Marks every row since the last episode ended as won by `winner`, and writes a chunk once there are enough rows"""
+        rows = self.rows
+        self._episodes.append((rows, winner))
+        if rows >= self.chunk_size:
+            self.flush()
+
+    def _columns(self, rows: int) -> dict[str, np.ndarray]:
+        data = np.frombuffer(self._data, dtype=np.uint8, count=rows * self._width).reshape(rows, self._width)
+        width = len(self.fields)
+        signed = _MULTIPLAYER_SIGNED if self.multiplayer else _SINGLEPLAYER_SIGNED
+        offsets = np.array([128 if name in signed else 0 for name in self.fields], dtype=np.int16)
+        state = (data[:, 2:2 + width].astype(np.int16) - offsets).astype(np.int8)
+        results = (data[:, 3 + width:].astype(np.int16) - 128).astype(np.int8)
+        starts = [start for start, _ in self._games if start < rows]
+        first = np.searchsorted(starts, np.arange(rows), side='right') - 1
+        starts = np.array(starts, dtype=np.int64)
+        ends = [end for end, _ in self._episodes]
+        return {
+            'game': np.array([game for start, game in self._games if start < rows], dtype=np.int64)[first],
+            'step': (np.arange(rows) - starts[first]).astype(np.int32),
+            'player': state[:, self.fields.index('current_turn')].copy(),
+            'chamber': data[:, 0].copy(),
+            'shells': data[:, 1].copy(),
+            'mask': _multiplayer_masks(state) if self.multiplayer else _singleplayer_masks(state),
+            'state': state,
+            'action': data[:, 2 + width].view(np.int8).copy(),
+            'private': results[:, :2].copy(),
+            'public': results[:, 2:].copy(),
+            'winner': np.repeat(np.array([winner for _, winner in self._episodes], dtype=np.int8), np.diff(ends, prepend=0)),
+        }
+
+    def flush(self):
+        """Writes every finished episode as a chunk"""
+        if not self._episodes:
+            return
+        rows = self._episodes[-1][0]
+        columns = self._columns(rows)
+        prefix = os.path.join(self.directory, f"{self.name}-{self.chunks:06d}")
+        for name, column in columns.items():
+            np.save(f"{prefix}.{name}.tmp.npy", column)
+            os.replace(f"{prefix}.{name}.tmp.npy", f"{prefix}.{name}.npy")
+        manifest = {
+            'rows': rows, 'multiplayer': self.multiplayer, 'fields': self.fields,
+            'actions': [list(action) for action in MULTIPLAYER_ACTIONS] if self.multiplayer else MOVES,
+            'columns': [name for name, _, _ in _COLUMNS],
+        }
+        # The manifest goes last: a chunk without one is still being written
+        with open(prefix + '.tmp', 'w') as f:
+            json.dump(manifest, f)
+        os.replace(prefix + '.tmp', prefix + '.json')
+        self.chunks += 1
+        # Carry the episode in progress over, along with the game it belongs to
+        del self._data[:rows * self._width]
+        keep = 0
+        for idx, (start, _) in enumerate(self._games):
+            if start <= rows:
+                keep = idx
+        self._games = [(start - rows, game) for start, game in self._games[keep:]]
+        self._episodes = []
+
+    def close(self):
+        """Writes what's left of the finished episodes; an episode in progress is dropped"""
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class TrajectoryDataset:
+    def __init__(self, directory: str):
+        """Every finished chunk in `directory`, memory-mapped read-only. Chunks written later are picked up by `refresh`."""
+        self.directory = directory
+        self.refresh()
+
+    def refresh(self):
+        self.chunks: list[dict[str, np.ndarray]] = []
+        self.manifest = None
+        for path in sorted(glob.glob(os.path.join(glob.escape(self.directory), '*.json'))):
+            with open(path) as f:
+                manifest = json.load(f)
+            if self.manifest is None:
+                self.manifest = manifest
+            elif (manifest['multiplayer'], manifest['fields']) != (self.manifest['multiplayer'], self.manifest['fields']):
+                raise ValueError(f"{path} holds a different mode or state layout than the rest of {self.directory}")
+            prefix = path[:-len('.json')]
+            self.chunks.append({name: np.load(f"{prefix}.{name}.npy", mmap_mode='r') for name in manifest['columns']})
+        lengths = [len(chunk['game']) for chunk in self.chunks]
+        self.offsets = np.concatenate(([0], np.cumsum(lengths, dtype=np.int64)))
+
+    @property
+    def fields(self) -> list[str]:
+        return [] if self.manifest is None else self.manifest['fields']
+
+    def __len__(self):
+        return int(self.offsets[-1])
+
+    def column(self, name: str) -> np.ndarray:
+        """A whole column, concatenated across chunks (a copy; index the dataset to read only some rows)"""
+        return np.concatenate([chunk[name] for chunk in self.chunks])
+
+    def sample(self, n: int, rng: np.random.Generator | None = None) -> np.ndarray:
+        """`n` row indices drawn uniformly with replacement"""
+        rng = np.random.default_rng() if rng is None else rng
+        return rng.integers(0, len(self), size=n)
+
+    def __getitem__(self, rows) -> dict[str, np.ndarray]:
+        """The given rows of every column, reading only the pages they are on"""
+        rows = np.asarray(rows, dtype=np.int64)
+        chunk_ids = np.searchsorted(self.offsets, rows, side='right') - 1
+        out = {}
+        for name, dtype, size in _COLUMNS:
+            shape = rows.shape if size == 1 else rows.shape + ((size or len(self.fields)),)
+            out[name] = np.empty(shape, dtype=dtype)
+        for chunk_id in np.unique(chunk_ids):
+            hits = chunk_ids == chunk_id
+            local = rows[hits] - self.offsets[chunk_id]
+            for name, column in self.chunks[chunk_id].items():
+                out[name][hits] = column[local]
+        return out
+
+    @staticmethod
+    def masks(mask: np.ndarray, actions: int) -> np.ndarray:
+        """Unpacks a `mask` column into booleans, shape (rows, actions)"""
+        return (mask[..., None] >> np.arange(actions, dtype=np.uint64)) & 1 == 1
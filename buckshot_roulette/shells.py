@@ -0,0 +1,319 @@
+import random
+
+class ShellSequence:
+    """A shotgun chamber stored as an integer bitmask of live shells.
+
+    Bit `cursor + i` holds the i-th shell still in the chamber, so firing only advances the cursor:
+    popping, peeking and inverting are O(1) and never reallocate the chamber. `live` is taken by popcount
+    when the chamber is built and kept up to date from then on.
+    It behaves like the list of bools it replaces (`len`, indexing, iteration and `==` against lists).
+    """
+    __slots__ = ('bits', 'length', 'cursor', 'live')
+
+    def __init__(self, shells = ()):
+        bits = 0
+        length = 0
+        for shell in shells:
+            if shell:
+                bits |= 1 << length
+            length += 1
+        self.bits = bits
+        self.length = length
+        self.cursor = 0
+        self.live = bits.bit_count()
+
+    @classmethod
+    def from_bits(cls, bits: int, length: int, cursor: int = 0):
+        seq = cls.__new__(cls)
+        seq.bits = bits
+        seq.length = length
+        seq.cursor = cursor
+        seq.live = (bits >> cursor).bit_count()
+        return seq
+
+    @classmethod
+    def shuffled(cls, live: int, total: int, rng = random):
+        """A randomly ordered chamber with `live` live shells out of `total`"""
+        seq = cls.__new__(cls)
+        seq.length = total
+        seq.cursor = 0
+        seq.live = live
+        # Selection sampling: each position is live with probability (live left) / (positions left)
+        bits = 0
+        rand = rng.random
+        for idx in range(total):
+            if rand() * (total - idx) < live:
+                bits |= 1 << idx
+                live -= 1
+        seq.bits = bits
+        return seq
+
+    @classmethod
+    def coerce(cls, shotgun):
+        """Accepts either a ShellSequence or a plain list of bools"""
+        if isinstance(shotgun, ShellSequence):
+            return shotgun
+        return cls(shotgun)
+
+    def peek(self) -> bool:
+        if self.cursor >= self.length:
+            raise IndexError("peek at empty chamber")
+        return (self.bits >> self.cursor) & 1 == 1
+
+    def pop(self) -> bool:
+        cursor = self.cursor
+        if cursor >= self.length:
+            raise IndexError("pop from empty chamber")
+        self.cursor = cursor + 1
+        if (self.bits >> cursor) & 1:
+            self.live -= 1
+            return True
+        return False
+
+    def invert(self) -> None:
+        cursor = self.cursor
+        if cursor >= self.length:
+            raise IndexError("invert on empty chamber")
+        self.bits ^= 1 << cursor
+        self.live += 1 if (self.bits >> cursor) & 1 else -1
+
+    def clear(self) -> None:
+        self.cursor = self.length
+        self.live = 0
+
+    def copy(self):
+        seq = ShellSequence.__new__(ShellSequence)
+        seq.bits = self.bits
+        seq.length = self.length
+        seq.cursor = self.cursor
+        seq.live = self.live
+        return seq
+
+    def _position(self, idx: int) -> int:
+        remaining = self.length - self.cursor
+        if idx < 0:
+            idx += remaining
+        if idx < 0 or idx >= remaining:
+            raise IndexError("shell index out of range")
+        return self.cursor + idx
+
+    def __len__(self):
+        return self.length - self.cursor
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return list(self)[idx]
+        return (self.bits >> self._position(idx)) & 1 == 1
+
+    def __setitem__(self, idx, value):
+        pos = self._position(idx)
+        was_live = (self.bits >> pos) & 1
+        if value:
+            self.bits |= 1 << pos
+        else:
+            self.bits &= ~(1 << pos)
+        self.live += ((self.bits >> pos) & 1) - was_live
+
+    def __iter__(self):
+        bits = self.bits
+        return ((bits >> pos) & 1 == 1 for pos in range(self.cursor, self.length))
+
+    def __eq__(self, other):
+        if isinstance(other, ShellSequence):
+            return len(self) == len(other) and (self.bits >> self.cursor) == (other.bits >> other.cursor)
+        if isinstance(other, list):
+            return list(self) == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"ShellSequence({list(self)})"
+
+def live_odds(idx: int, known_shells, live: int, total: int) -> float:
+    """Probability that the shell at `idx` is live, given the live/total counts and any known positions"""
+    known = known_shells[idx] if idx < len(known_shells) else None
+    if known is not None:
+        return 1.0 if known else 0.0
+    unknown_live = live
+    unknown = total
+    for shell in known_shells:
+        if shell is not None:
+            unknown -= 1
+            unknown_live -= shell
+    if unknown <= 0 or unknown_live <= 0:
+        return 0.0
+    return min(unknown_live / unknown, 1.0)
+
+def consistent_chamber(fixed: dict[int, bool], known_shells, live: int, total: int) -> ShellSequence:
+    """A chamber of `total` shells that agrees with `known_shells` and the `fixed` positions, with unknown shells filled up to `live` live"""
+    bits = 0
+    unknown = []
+    for idx in range(total):
+        shell = fixed.get(idx)
+        if shell is None and idx < len(known_shells):
+            shell = known_shells[idx]
+        if shell is None:
+            unknown.append(idx)
+        elif shell:
+            bits |= 1 << idx
+            live -= 1
+    for idx in unknown[:max(live, 0)]:
+        bits |= 1 << idx
+    return ShellSequence.from_bits(bits, total)
+
+class ShellBelief:
+    """What one player knows about the chamber, kept up to date move by move instead of rescanned.
+
+    Holds the known shell (or None) at each position still in the chamber, how many of those are known live or blank,
+    and the public live/total counts from the last `sync`. Position queries are O(1). Fired shells are dropped from
+    the front by advancing an offset, so the backing list is only rebuilt on `reset`.
+    """
+    __slots__ = ('shells', 'start', 'live', 'total', 'known_live', 'known_blank')
+
+    def __init__(self, total: int = 0, live: int = 0):
+        self.reset(total, live)
+
+    def reset(self, total: int, live: int) -> None:
+        """Forgets everything; used when the shotgun is reloaded"""
+        self.shells: list[bool | None] = [None] * total
+        self.start = 0
+        self.live = live
+        self.total = total
+        self.known_live = 0
+        self.known_blank = 0
+
+    def sync(self, total: int, live: int) -> None:
+        """Takes the public counts from the board, dropping shells from the front until as many are left as the board has"""
+        while len(self) > total:
+            self.advance()
+        if len(self) < total:
+            self.shells.extend([None] * (total - len(self)))
+        self.live = live
+        self.total = total
+
+    def advance(self) -> None:
+        """Drops the shell at the front of the chamber, once it has been fired or ejected"""
+        if self.start >= len(self.shells):
+            return
+        shell = self.shells[self.start]
+        if shell is not None:
+            if shell:
+                self.known_live -= 1
+            else:
+                self.known_blank -= 1
+        self.start += 1
+
+    def _position(self, idx: int) -> int:
+        if idx < 0:
+            idx += len(self)
+        if idx < 0 or idx >= len(self):
+            raise IndexError("shell index out of range")
+        return self.start + idx
+
+    def set(self, idx: int, shell: bool | None) -> None:
+        """Records the shell seen at `idx` (None forgets it)"""
+        pos = self._position(idx)
+        old = self.shells[pos]
+        if old is not None:
+            if old:
+                self.known_live -= 1
+            else:
+                self.known_blank -= 1
+        if shell is not None:
+            shell = bool(shell)
+            if shell:
+                self.known_live += 1
+            else:
+                self.known_blank += 1
+        self.shells[pos] = shell
+
+    def invert(self, idx: int = 0) -> None:
+        """Flips the shell at `idx` if it is known"""
+        shell = self.known(idx)
+        if shell is not None:
+            self.set(idx, not shell)
+
+    def known(self, idx: int) -> bool | None:
+        """The shell seen at `idx`, or None if it hasn't been seen"""
+        if idx >= len(self):
+            return None
+        return self.shells[self._position(idx)]
+
+    def certain(self, idx: int) -> bool | None:
+        """The shell at `idx` if it is seen or forced by the counts (every unseen shell live, or every unseen shell blank), otherwise None"""
+        shell = self.known(idx)
+        if shell is not None:
+            return shell
+        if self.live - self.known_live == 0:
+            return False
+        if self.total - self.live - self.known_blank == 0:
+            return True
+        return None
+
+    def live_odds(self, idx: int) -> float:
+        """Probability that the shell at `idx` is live; the same as `live_odds` over this belief's shells"""
+        shell = self.known(idx)
+        if shell is not None:
+            return 1.0 if shell else 0.0
+        unknown_live = self.live - self.known_live
+        unknown = self.total - self.known_live - self.known_blank
+        if unknown <= 0 or unknown_live <= 0:
+            return 0.0
+        return min(unknown_live / unknown, 1.0)
+
+    def __len__(self):
+        return len(self.shells) - self.start
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return list(self)[idx]
+        return self.shells[self._position(idx)]
+
+    def __iter__(self):
+        return iter(self.shells[self.start:])
+
+    def __repr__(self):
+        return f"ShellBelief({list(self)}, live={self.live}, total={self.total})"
+
+def float_view(out) -> memoryview:
+    """A flat memoryview of a writable float buffer (a NumPy array, an `array.array`, a `memoryview`...), for the observation encoders"""
+    view = out if isinstance(out, memoryview) else memoryview(out)
+    if view.ndim != 1:
+        view = view.cast('B').cast(view.format)
+    if view.format not in ('d', 'f'):
+        raise TypeError(f"Observation buffers hold floats, not {view.format!r}")
+    return view
+
+def write_known(view: memoryview, pos: int, known, total: int, count: int):
+    """Writes two slots for each of the first `count` shells into `view` from `pos`: 1 in the first if known live, in the second if known blank.
+
+    Args:
+        view (memoryview): A flat float view, as from `float_view`
+        pos (int): The first slot to write
+        known (ShellBelief | dict[int, bool] | None): The shells seen, by position from the front
+        total (int): Shells left in the chamber; positions past it are written as unknown
+        count (int): Shells to write
+    """
+    seen = 0
+    if isinstance(known, ShellBelief):
+        # Straight from the belief's backing list rather than a known() call per position
+        shells = known.shells
+        start = known.start
+        seen = max(0, min(len(shells) - start, total, count))
+        for idx in range(start, start + seen):
+            shell = shells[idx]
+            view[pos] = shell is True
+            view[pos + 1] = shell is False
+            pos += 2
+    elif known is not None:
+        seen = min(total, count)
+        for idx in range(seen):
+            shell = known.get(idx)
+            view[pos] = shell is True
+            view[pos + 1] = shell is False
+            pos += 2
+    for _ in range(seen, count):
+        view[pos] = 0
+        view[pos + 1] = 0
+        pos += 2
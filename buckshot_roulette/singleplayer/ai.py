@@ -1,11 +1,17 @@
 from buckshot_roulette.singleplayer.game import BuckshotRoulette
+from buckshot_roulette.shells import ShellBelief, consistent_chamber
 from typing import Literal
 from dataclasses import asdict
+from collections import OrderedDict
 import random
+import time
 import abc
 import typing
 
 class AbstractEngine(abc.ABC):
+    # Any random.Random-compatible generator; BuckshotGame replaces it with a per-game stream when seeded
+    rng = random
+
     def __init__(self, playing_as: Literal[0, 1]):
         self.me = playing_as
     
@@ -18,6 +24,19 @@ class AbstractEngine(abc.ABC):
         """
         pass
     
+    @classmethod
+    def choice_batch(cls, engines: list['AbstractEngine'], boards: list[BuckshotRoulette]) -> list:
+        """Chooses moves for many games at once, one per `(engine, board)`; see buckshot_roulette.lockstep
+
+        Each game keeps its own engine instance, so per-game knowledge stays on the instances. The lockstep driver gathers the pending
+        decisions of every instance of a class into one call. Override this to evaluate the boards in bulk; by default it calls `choice` on each.
+
+        Args:
+            engines (list[AbstractEngine]): The instances to choose for, all of this class
+            boards (list[BuckshotRoulette]): The board each instance is choosing on
+        """
+        return [engine.choice(board) for engine, board in zip(engines, boards)]
+    
     @abc.abstractmethod
     def post(self, last_move, result):
         """Any post-processing steps that the model needs to make after a move has been made. Typically used to store results of the magnifying glass and burner phone.
@@ -28,7 +47,7 @@ class AbstractEngine(abc.ABC):
         """
         pass
     
-    @abc.abstractsmethod
+    @abc.abstractmethod
     def on_reload(self, board:BuckshotRoulette):
         """Any internal steps to perform on a reload (like resetting knowledge)
         
@@ -37,48 +56,23 @@ class AbstractEngine(abc.ABC):
         """
 
 class Dealer(AbstractEngine):
-    def __init__(self, playing_as: Literal[0, 1]):   
+    def __init__(self, playing_as: Literal[0, 1], rng = None):   
         self.me = playing_as     
-        self.known_shells: list[bool] = None
+        self.rng = random if rng is None else rng
+        self.belief: ShellBelief = None
         self.last_shell = None
     
     def shell_at(self, idx, board: BuckshotRoulette) -> Literal[True, False, None]:
-        if self.known_shells[idx] != None:
-            return self.known_shells[idx]
-        else:
-            live = board.live
-            blank = board.total - board.live
-            
-            if live == 0:
-                return False
-            elif blank == 0:
-                return True
-            
-            for i in range(len(self.known_shells)):
-                if self.known_shells[i] != None:
-                    if self.known_shells[i]:
-                        live -= 1
-                    else:
-                        blank -= 1
-            
-            if live == 0:
-                return False
-            elif blank == 0:
-                return True
-            
-            return None
+        return self.belief.certain(idx)
     
     def choice(self, board: BuckshotRoulette):
-        if self.known_shells == None:
-            self.known_shells = [None] * board.total     
+        if self.belief == None:
+            self.belief = ShellBelief(board.total, board.live)
             # The dealer always knows the last shell
-            self.known_shells[-1] = self.last_shell    
+            self.belief.set(-1, self.last_shell)
             if board.total == 1:
-                self.known_shells[0] = board.live > 0
-        while len(self.known_shells) > board.total:
-            self.known_shells = self.known_shells[1:]
-        while len(self.known_shells) < board.total:
-            self.known_shells.append(None)
+                self.belief.set(0, board.live > 0)
+        self.belief.sync(board.total, board.live)
         
         moves = board.moves()
         own_moves = moves.copy()
@@ -91,7 +85,7 @@ class Dealer(AbstractEngine):
         using_medicine = False
         
         for item in moves:
-            if item == 'magnifying_glass' and not self.known_shells[0] and board.total != 1:
+            if item == 'magnifying_glass' and not self.belief.known(0) and board.total != 1:
                 wants_to_use = item
                 break
             if item == 'cigarettes' and board.charges[self.me] < board.max_charges:
@@ -124,7 +118,7 @@ class Dealer(AbstractEngine):
                 else:
                     return 'self'
             else:
-                return 'op' if random.random() > 0.5 else 'self'
+                return 'op' if self.rng.random() > 0.5 else 'self'
         else:
             if wants_to_use in own_moves:
                 return wants_to_use
@@ -136,26 +130,26 @@ class Dealer(AbstractEngine):
     
     def post(self, last_move, move_result):        
         match last_move:
-            case 'op', 'self':
-                self.known_shells = self.known_shells[1:] if len(self.known_shells) > 0 else []
-                pass
+            case 'op' | 'self' | 'beer':
+                self.belief.advance()
             case 'magnifying_glass':
-                self.known_shells[0] = move_result
+                self.belief.set(0, move_result)
             case 'burner_phone':
-                self.known_shells[move_result[0]] = move_result[1]
+                if move_result != None:
+                    self.belief.set(move_result[0], move_result[1])
     
     def on_reload(self, board: BuckshotRoulette):
         self.last_shell = None
-        self.known_shells = None
+        self.belief = None
             
             
         
 class Random(AbstractEngine):
-    def __init__(self, playing_as):
-        pass
+    def __init__(self, playing_as, rng = None):
+        self.rng = random if rng is None else rng
     
     def choice(self, board: BuckshotRoulette):
-        return random.choice(board.moves())
+        return self.rng.choice(board.moves())
 
     def post(self, last_move, res):
         pass
@@ -166,44 +160,21 @@ class Random(AbstractEngine):
 class Human(AbstractEngine):
     def __init__(self, playing_as, knowledge = True):
         self.knowledge = knowledge
-        self.known_shells: list[bool] = None
+        self.belief: ShellBelief = None
     
-    def shell_at(self, idx, board: BuckshotRoulette) -> Literal[True, False, None]:
-        if self.known_shells == None:
-            self.known_shells = [None] * board.total
+    def _sync(self, board: BuckshotRoulette):
+        if self.belief == None:
+            self.belief = ShellBelief(board.total, board.live)
             if board.total == 1:
-                self.known_shells[0] = board.live > 0
-        while len(self.known_shells) > board.total:
-            self.known_shells = self.known_shells[1:]
-        while len(self.known_shells) < board.total:
-            self.known_shells.append(None)
-        
-        if self.known_shells[idx] != None:
-            return self.known_shells[idx]
-        else:
-            live = board.live
-            blank = board.total - board.live
-            
-            if live == 0:
-                return False
-            elif blank == 0:
-                return True
-            
-            for i in range(len(self.known_shells)):
-                if self.known_shells[i] != None:
-                    if self.known_shells[i]:
-                        live -= 1
-                    else:
-                        blank -= 1
-            
-            if live == 0:
-                return False
-            elif blank == 0:
-                return True
-            
-            return None
+                self.belief.set(0, board.live > 0)
+        self.belief.sync(board.total, board.live)
+    
+    def shell_at(self, idx, board: BuckshotRoulette) -> Literal[True, False, None]:
+        self._sync(board)
+        return self.belief.certain(idx)
     
     def choice(self, board: BuckshotRoulette):
+        self._sync(board)
         selfhealth = board.charges[board.current_turn]
         opphealth = board.charges[1-board.current_turn]
         moves = board.moves()
@@ -227,7 +198,7 @@ active items:
 ''')
         if self.knowledge:
             print(f"{board.live} live. {board.total-board.live} blank")
-            shells = [self.shell_at(i, board) for i in range(board.total)]
+            shells = [self.belief.certain(i) for i in range(board.total)]
             shells = [{True: "L", False: "B", None: "?"}[x] for x in shells]
             print("".join(shells))
         print(f"moves:\n{moves}")
@@ -240,12 +211,184 @@ active items:
     def post(self, last_move, move_result):
         #print(f"result: {move_result}")
         match last_move:
-            case 'op', 'self':
-                self.known_shells = self.known_shells[1:] if len(self.known_shells) > 0 else []
+            case 'op' | 'self' | 'beer':
+                self.belief.advance()
+            case 'magnifying_glass':
+                self.belief.set(0, move_result)
+            case 'burner_phone':
+                if move_result != None:
+                    self.belief.set(move_result[0], move_result[1])
+    
+    def on_reload(self, board: BuckshotRoulette):
+        self.belief = None
+
+
+class TranspositionTable:
+    """LRU cache of solved positions. One table can be shared by any number of engines, and outlives games."""
+    def __init__(self, max_size: int = 1_000_000):
+        self.max_size = max_size
+        self.entries: OrderedDict = OrderedDict()
+        self.lookups = 0
+        self.hits = 0
+    
+    def get(self, key):
+        self.lookups += 1
+        value = self.entries.get(key)
+        if value is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+        return value
+    
+    def put(self, key, value):
+        self.entries[key] = value
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+    
+    def clear(self):
+        self.entries.clear()
+        self.lookups = 0
+        self.hits = 0
+    
+    def __len__(self):
+        return len(self.entries)
+
+class Expectiminimax(AbstractEngine):
+    """Searches the current shell sequence to the end, averaging over the same chance branches as `board.outcomes`.
+
+    Both players are assumed to see the public state plus this engine's known shells, and to share whatever either of
+    them learns further down the tree; the opponent minimizes the same value. A sequence ends in a win (+1), a loss (-1)
+    or a reload, scored by `evaluate`. Knowledge of a shell flipped by the inverter is only kept when the shell was
+    already known. Values are for player 0 whichever seat searches, so engines in either seat can share a table.
+
+    Searches are exact unless `max_nodes` is set; past that many new nodes in one decision, unexplored positions are
+    scored by `evaluate` and nothing more is written to the table for that decision.
+    """
+    def __init__(self, playing_as: Literal[0, 1], table: TranspositionTable | None = None, table_size: int = 1_000_000, max_nodes: int | None = None):
+        """
+        Args:
+            playing_as (Literal[0, 1]): The engine's seat
+            table (TranspositionTable | None): A table to share with other engines; a new one of `table_size` entries if None.
+                Either way it is kept for the engine's lifetime, so positions carry over between its games.
+            table_size (int): Size of the engine's own table; ignored when `table` is given
+            max_nodes (int | None): New nodes searched per decision before falling back to `evaluate`
+        """
+        self.me = playing_as
+        self.max_nodes = max_nodes
+        self._budget = None
+        self.table = TranspositionTable(table_size) if table is None else table
+        self.belief: ShellBelief = None
+        
+        self.decisions = 0
+        self.nodes = 0
+        self.lookups = 0
+        self.hits = 0
+        self.search_time = 0.0
+    
+    def evaluate(self, board: BuckshotRoulette) -> float:
+        """Score of a position at the end of a shell sequence, for player 0. Stays inside (-0.5, 0.5) so a won game always ranks higher."""
+        return (board.charges[0] - board.charges[1]) / (2 * board.max_charges)
+    
+    def _learn(self, known: tuple, move: str, result) -> tuple:
+        match move:
+            case 'op' | 'self' | 'beer':
+                return known[1:]
+            case 'magnifying_glass':
+                return (result,) + known[1:]
+            case 'burner_phone':
+                if result is not None:
+                    idx, shell = result
+                    return known[:idx] + (shell,) + known[idx + 1:]
+            case 'inverter':
+                if known and known[0] is not None:
+                    return (not known[0],) + known[1:]
+        return known
+    
+    def _value(self, board: BuckshotRoulette, known: tuple) -> float:
+        winner = board.winner()
+        if winner != None:
+            return 1.0 if winner == 0 else -1.0
+        if board.total == 0:
+            return self.evaluate(board)
+        
+        key = (board.key(), known)
+        self.lookups += 1
+        value = self.table.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        if self._budget is not None:
+            if self._budget <= 0:
+                return self.evaluate(board)
+            self._budget -= 1
+        
+        self.nodes += 1
+        maximizing = board.current_turn == 0
+        value = None
+        for move in board.moves():
+            move_value = self._move_value(board, move, known)
+            if value is None or (move_value > value if maximizing else move_value < value):
+                value = move_value
+        if self._budget is None or self._budget > 0:
+            self.table.put(key, value)
+        return value
+    
+    def _move_value(self, board: BuckshotRoulette, move: str, known: tuple) -> float:
+        # Walks the outcomes of `move` in place with push/pop instead of building successor boards
+        live = board.live
+        total = board.total
+        chamber_known = board._known_chamber(known, total)
+        value = 0.0
+        for p, fixed, roll in board._branches(move, chamber_known, live, total):
+            result, _ = board.push(move, consistent_chamber(fixed, chamber_known, live, total), load_new=False, roll=roll)
+            value += p * self._value(board, self._learn(known, move, result))
+            board.pop()
+        return value
+    
+    def choice(self, board: BuckshotRoulette):
+        if self.belief == None:
+            self.belief = ShellBelief(board.total, board.live)
+            if board.total == 1:
+                self.belief.set(0, board.live > 0)
+        self.belief.sync(board.total, board.live)
+        
+        start = time.perf_counter()
+        self._budget = self.max_nodes
+        known = tuple(self.belief)
+        sign = 1 if self.me == 0 else -1
+        best_move = None
+        best_value = None
+        for move in board.moves():
+            value = sign * self._move_value(board, move, known)
+            if best_value is None or value > best_value:
+                best_move = move
+                best_value = value
+        self._budget = None
+        self.search_time += time.perf_counter() - start
+        self.decisions += 1
+        return best_move
+    
+    def stats(self) -> dict:
+        """Search totals since this engine was created"""
+        decisions = max(self.decisions, 1)
+        return {
+            "decisions": self.decisions,
+            "nodes": self.nodes,
+            "nodes_per_decision": self.nodes / decisions,
+            "cache_hit_rate": self.hits / max(self.lookups, 1),
+            "time_per_decision": self.search_time / decisions,
+        }
+    
+    def post(self, last_move, move_result):
+        match last_move:
+            case 'op' | 'self' | 'beer':
+                self.belief.advance()
             case 'magnifying_glass':
-                self.known_shells[0] = move_result
+                self.belief.set(0, move_result)
             case 'burner_phone':
-                self.known_shells[move_result[0]] = move_result[1]
+                if move_result != None:
+                    self.belief.set(move_result[0], move_result[1])
+            case 'inverter':
+                self.belief.invert(0)
     
     def on_reload(self, board: BuckshotRoulette):
-        self.known_shells = None
\ No newline at end of file
+        self.belief = None
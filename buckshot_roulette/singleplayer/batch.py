@@ -0,0 +1,412 @@
+"""Singleplayer games simulated in bulk: N games stored as NumPy arrays and advanced one move per step.
+
+Requires numpy (`pip install buckshot-roulette[batch]`). Rules follow `BuckshotRoulette.make_move` move for move,
+quirks included (handcuffs only wear off once per game, a saw stays on after a blank at yourself, and so on).
+"""
+import abc
+import numpy as np
+from buckshot_roulette.singleplayer.game import (
+    BuckshotRoulette, POSSIBLE_ITEMS,
+    HANDCUFFS, MAGNIFYING_GLASS, BEER, CIGARETTES, SAW, INVERTER, BURNER_PHONE, MEDS, ADRENALINE
+)
+
+# Move codes: the two shots, then item i as 2 + i
+OP, SELF = 0, 1
+MOVES = ['op', 'self'] + POSSIBLE_ITEMS
+ITEM_CAPS = np.array(BuckshotRoulette.ITEM_CAPS.counts, dtype=np.int8)[:, None]
+# Chambers hold at most 8 shells, so they fit in a uint8
+_POPCOUNT = np.array([bin(bits).count('1') for bits in range(256)], dtype=np.int8)
+_ITEM_ROWS = np.arange(len(POSSIBLE_ITEMS), dtype=np.int8)[:, None]
+# Every arrangement of a freshly loaded chamber (total // 2 live out of total), grouped by total; a uniform pick
+# from a group is the same as shuffling the chamber
+_CHAMBERS = np.array([bits for total in range(9) for bits in range(1 << total) if bin(bits).count('1') == total // 2], dtype=np.uint8)
+_CHAMBER_COUNTS = np.array([sum(1 for bits in range(1 << total) if bin(bits).count('1') == total // 2) for total in range(9)])
+_CHAMBER_OFFSETS = np.concatenate(([0], _CHAMBER_COUNTS.cumsum()[:-1]))
+
+def _row_sum(rows):
+    # Sums an item-major array a row at a time, which beats numpy's reduction along the short axis
+    total = rows[0].astype(np.int8)
+    for row in rows[1:]:
+        total += row
+    return total
+
+def _select(cond, a, b):
+    # np.where(cond, a, b) for integers; branch-free arithmetic is several times faster than np.where on random masks
+    return b + (a - b) * cond
+
+class AbstractBatchEngine(abc.ABC):
+    @abc.abstractmethod
+    def reset(self, game: 'BatchGame', lanes: np.ndarray):
+        """Forgets what the engine knew about the games that just started
+
+        Args:
+            game (BatchGame): The batch
+            lanes (np.ndarray): Indices of the lanes that were reset
+        """
+        pass
+
+    @abc.abstractmethod
+    def choose(self, game: 'BatchGame', mine: np.ndarray, legal: np.ndarray) -> np.ndarray:
+        """Picks a move code for every lane. Only the lanes in `mine` are waiting on this engine; the rest are ignored.
+
+        Args:
+            game (BatchGame): The batch
+            mine (np.ndarray): Mask of the lanes to move in
+            legal (np.ndarray): (11, size) mask of legal move codes, as listed by `board.moves()`
+        """
+        pass
+
+    @abc.abstractmethod
+    def observe(self, game: 'BatchGame', stepped: np.ndarray, moves: np.ndarray, actors: np.ndarray):
+        """Post-processing after a step, like `post` on the scalar engines but for every lane and both players' moves
+
+        Args:
+            game (BatchGame): The batch, after the step
+            stepped (np.ndarray): Mask of the lanes that moved
+            moves (np.ndarray): The move code played in each lane, -1 where nothing moved
+            actors (np.ndarray): The player that moved in each lane
+        """
+        pass
+
+class BatchGame:
+    """Struct-of-arrays counterpart of `BuckshotGame`: every field is an array with one entry per game (lane).
+
+    Per-item fields are item-major (`items[player, item, lane]`, `active[item, lane]`) so that work across items
+    is done a row at a time. Active items are stored doubled, since handcuffs wear off in halves. `chamber` holds the
+    shells left as bits, front shell in bit 0; `live` is the public count, which like the board's isn't updated by
+    the inverter. `chamber_public` is the board's `chamber_public` as -1 (None), 0 (blank) or 1 (live).
+    """
+    def __init__(self, engine0: AbstractBatchEngine, engine1: AbstractBatchEngine, size: int, charges: int | None = None, starter: int = 0, seed = None):
+        self.engines = (engine0, engine1)
+        self.size = size
+        self.start_charges = charges
+        self.start_turn = starter
+        self.rng = np.random.default_rng(seed)
+
+        self.max_charges = np.zeros(size, np.int8)
+        self.charges = np.zeros((2, size), np.int8)
+        self.starter = np.zeros(size, np.int8)
+        self.turn = np.zeros(size, np.int8)
+        self.total = np.zeros(size, np.int8)
+        self.live = np.zeros(size, np.int8)
+        self.chamber = np.zeros(size, np.uint8)
+        self.chamber_public = np.full(size, -1, np.int8)
+        self.items = np.zeros((2, len(POSSIBLE_ITEMS), size), np.int8)
+        self.active = np.zeros((len(POSSIBLE_ITEMS), size), np.int8)
+        self.skip = np.zeros(size, bool)
+        self.winner = np.full(size, -1, np.int8)
+        self.running = np.zeros(size, bool)
+
+        # What happened on the last step, for the engines' observe()
+        self.fired = np.zeros(size, bool)
+        self.reloaded = np.zeros(size, bool)
+        self.reveal = np.full(size, -1, np.int8)
+
+    def reset(self, mask: np.ndarray):
+        """Starts a new game in every lane where `mask` is set"""
+        lanes = np.flatnonzero(mask)
+        if len(lanes) == 0:
+            return
+        if self.start_charges:
+            max_charges = np.full(len(lanes), self.start_charges, np.int8)
+        else:
+            max_charges = self.rng.integers(2, 5, len(lanes)).astype(np.int8)
+        self.max_charges[lanes] = max_charges
+        self.charges[:, lanes] = max_charges
+        self.starter[lanes] = self.start_turn
+        self.turn[lanes] = self.start_turn
+        self.items[:, :, lanes] = 0
+        self.active[:, lanes] = 0
+        self.skip[lanes] = False
+        self.chamber_public[lanes] = -1
+        self.winner[lanes] = -1
+        self.running[lanes] = True
+        self._load(lanes)
+        for engine in self.engines:
+            engine.reset(self, lanes)
+
+    def _load(self, lanes: np.ndarray):
+        # new_rounds(): a fresh, shuffled chamber and an item drop
+        count = len(lanes)
+        total = self.rng.integers(2, 9, count).astype(np.int8)
+        live = total // 2
+        self.total[lanes] = total
+        self.live[lanes] = live
+
+        pick = (self.rng.random(count) * _CHAMBER_COUNTS[total]).astype(np.int64)
+        self.chamber[lanes] = _CHAMBERS[_CHAMBER_OFFSETS[total] + pick]
+
+        self._give_items(lanes, self.rng.integers(2, 6, count))
+
+    def _give_items(self, lanes: np.ndarray, item_count: np.ndarray):
+        count = len(lanes)
+        items = self.items[:, :, lanes]
+        dropping = np.ones(count, bool)
+        for player in range(2):
+            counts = items[player]
+            held = _row_sum(counts)
+            # A full inventory ends the drop, even for the players after it
+            dropping &= held != 8
+            allowed = counts < ITEM_CAPS
+            allowed[SAW] &= self.max_charges[lanes] > 2
+            draws = np.where(dropping, np.minimum(item_count, 8 - held), 0)
+            # Each allowed item's position among the allowed items; -1 for the rest
+            rank = np.empty(allowed.shape, np.int8)
+            options = np.zeros(count, np.int8)
+            for idx in range(len(POSSIBLE_ITEMS)):
+                rank[idx] = _select(allowed[idx], options, np.int8(-1))
+                options += allowed[idx]
+            # Like random.choices, the allowed items are fixed before drawing, so a drop can go over a cap
+            for draw in range(item_count.max()):
+                pick = (self.rng.random(count) * options).astype(np.int8)
+                counts += rank == _select(draw < draws, pick, np.int8(-2))
+        self.items[:, :, lanes] = items
+
+    def legal_moves(self) -> np.ndarray:
+        """(11, size) mask of the moves `board.moves()` would list. Like `moves()`, this drops an adrenaline with nothing to take."""
+        first = self.turn == 0
+        own = _select(first, self.items[0], self.items[1])
+        opponent = self.items[0] + self.items[1] - own
+        unused = self.active == 0
+        stealing = self.active[ADRENALINE] > 0
+        usable = (_select(stealing, opponent, own) > 0) & unused
+        stuck = stealing & ~usable.any(0)
+        if stuck.any():
+            self.active[ADRENALINE] *= ~stuck
+            stealing &= ~stuck
+            # The player's own adrenaline is usable again once the stuck one is cleared
+            unused[ADRENALINE] |= stuck
+            usable = (usable & ~stuck) | ((own > 0) & unused & stuck)
+        legal = np.empty((len(MOVES), self.size), bool)
+        legal[OP] = ~stealing
+        legal[SELF] = ~stealing
+        legal[2:] = usable
+        return legal
+
+    def step(self, mask: np.ndarray | None = None):
+        """Plays one move in every running game, or only in those where `mask` is set"""
+        stepped = self.running.copy() if mask is None else self.running & mask
+        legal = self.legal_moves()
+        actors = self.turn.copy()
+        # Lanes that aren't running play move -1, which matches none of the updates
+        moves = np.full(self.size, -1, np.int8)
+        for player, engine in enumerate(self.engines):
+            mine = stepped & (actors == player)
+            if mine.any():
+                moves = _select(mine, engine.choose(self, mine, legal).astype(np.int8), moves)
+        self._apply(moves, stepped)
+        for engine in self.engines:
+            engine.observe(self, stepped, moves, actors)
+
+    def _apply(self, moves: np.ndarray, stepped: np.ndarray):
+        active = self.active
+        first = self.turn == 0
+
+        # Items come out of the opponent's inventory when taken with adrenaline
+        from_first = first != (active[ADRENALINE] > 0)
+        used = (moves - 2) == _ITEM_ROWS
+        self.items[0] -= used & from_first
+        self.items[1] -= used & ~from_first
+        active[ADRENALINE] *= ~stepped
+
+        # Shots, as in BuckshotRoulette.fire
+        at_op = moves == OP
+        shot = at_op | (moves == SELF)
+        hit = shot & ((self.chamber & 1) == 1)
+        damage = hit.view(np.int8) + (hit & (active[SAW] > 0)).view(np.int8)
+        hits_first = first != at_op
+        self.charges[0] -= damage * hits_first
+        self.charges[1] -= damage * ~hits_first
+        # A hit, or a miss at the opponent, passes the turn unless the opponent is cuffed
+        switch = hit | at_op
+        active[SAW] *= ~switch
+        cuffed = switch & (active[HANDCUFFS] > 1)
+        active[HANDCUFFS] -= cuffed
+        skip = self.skip | cuffed
+        self.turn ^= (switch & ~skip).view(np.int8)
+        self.skip = skip & ~switch
+
+        # The magnifying glass shows the front shell to both players until the next shot; a beer or a reload doesn't hide it
+        looking = moves == 2 + MAGNIFYING_GLASS
+        self.chamber_public = _select(shot, np.int8(-1), _select(looking, (self.chamber & 1).view(np.int8), self.chamber_public))
+
+        # The beer ejects the front shell; on the last shell that empties the chamber just the same
+        fired = shot | (moves == 2 + BEER)
+        self.chamber >>= fired.view(np.uint8)
+        self.total -= fired.view(np.int8)
+
+        cuffing = moves == 2 + HANDCUFFS
+        active[HANDCUFFS] += cuffing.view(np.int8) * 2
+        self.skip |= cuffing
+        active[SAW] += (moves == 2 + SAW).view(np.int8) * 2
+        active[ADRENALINE] += (moves == 2 + ADRENALINE).view(np.int8) * 2
+        self.chamber ^= (moves == 2 + INVERTER).view(np.uint8)
+
+        smoking = moves == 2 + CIGARETTES
+        medicated = moves == 2 + MEDS
+        if smoking.any() or medicated.any():
+            healed = self.rng.random(self.size) > 0.5
+            change = smoking.view(np.int8) + medicated.view(np.int8) * (healed.view(np.int8) * 3 - 1)
+            charges = _select(first, self.charges[0], self.charges[1]) + change
+            charges = _select(change > 0, np.minimum(charges, self.max_charges), charges)
+            self.charges[0] = _select(first, charges, self.charges[0])
+            self.charges[1] = _select(first, self.charges[1], charges)
+
+        self.reveal.fill(-1)
+        calling = (moves == 2 + BURNER_PHONE) & (self.total > 1)
+        if calling.any():
+            self.reveal[calling] = self.rng.integers(1, self.total[calling])
+
+        # An empty chamber hands the turn back to the starter and reloads
+        empty = stepped & (self.total == 0)
+        if empty.any():
+            self.turn = _select(empty, self.starter, self.turn)
+            self._load(np.flatnonzero(empty))
+        counted = stepped & ~empty & (moves != 2 + INVERTER)
+        self.live = _select(counted, _POPCOUNT[self.chamber], self.live)
+
+        first_dead = self.charges[0] < 1
+        second_dead = (self.charges[1] < 1) & ~first_dead
+        self.winner = first_dead.view(np.int8) * 2 + second_dead.view(np.int8) - 1
+        self.running &= self.winner == -1
+        self.fired = fired
+        self.reloaded = empty
+
+    def play(self, games: int) -> np.ndarray:
+        """Plays `games` games and returns the number won by each player.
+
+        Finished lanes are reset with new games until `games` have been started; every started game is played out,
+        so short games aren't overrepresented.
+        """
+        wins = np.zeros(2, np.int64)
+        started = min(games, self.size)
+        self.running[:] = False
+        self.reset(np.arange(self.size) < started)
+        while self.running.any():
+            before = self.running.copy()
+            self.step()
+            finished = before & ~self.running
+            if finished.any():
+                wins += np.bincount(self.winner[finished], minlength=2)
+                refill = min(games - started, int(finished.sum()))
+                if refill > 0:
+                    lanes = np.zeros(self.size, bool)
+                    lanes[np.flatnonzero(finished)[:refill]] = True
+                    self.reset(lanes)
+                    started += refill
+        return wins
+
+class BatchRandom(AbstractBatchEngine):
+    def __init__(self, playing_as):
+        pass
+
+    def reset(self, game, lanes):
+        pass
+
+    def choose(self, game, mine, legal):
+        # The pick-th legal move, counting up through the move codes
+        pick = (game.rng.random(game.size) * _row_sum(legal)).astype(np.int8)
+        move = np.zeros(game.size, np.int8)
+        seen = np.zeros(game.size, np.int8)
+        for code in range(len(MOVES)):
+            row = legal[code]
+            move += (row & (seen == pick)).view(np.int8) * code
+            seen += row
+        return move
+
+    def observe(self, game, stepped, moves, actors):
+        pass
+
+class BatchDealer(AbstractBatchEngine):
+    """`Dealer`, for every lane at once. What it knows about the chamber is a pair of bitmasks aligned with
+    `BatchGame.chamber`: the shells it has seen, and which of those are live.
+
+    Unlike a scalar `Dealer` reused across games, knowledge never carries over from one game to the next.
+    """
+    def __init__(self, playing_as):
+        self.me = playing_as
+        self.seen = None
+        self.seen_live = None
+        self.started = None
+
+    def reset(self, game, lanes):
+        if self.seen is None or len(self.seen) != game.size:
+            self.seen = np.zeros(game.size, np.uint8)
+            self.seen_live = np.zeros(game.size, np.uint8)
+            self.started = np.zeros(game.size, bool)
+        self.seen[lanes] = 0
+        self.seen_live[lanes] = 0
+        self.started[lanes] = False
+
+    def choose(self, game, mine, legal):
+        me = self.me
+        # First look at a chamber: the dealer knows the last shell, and a lone shell from the live count
+        fresh = np.flatnonzero(mine & ~self.started)
+        if len(fresh):
+            last = np.uint8(1) << (game.total[fresh] - 1).astype(np.uint8)
+            self.seen[fresh] = last
+            self.seen_live[fresh] = game.chamber[fresh] & last
+            single = fresh[game.total[fresh] == 1]
+            self.seen_live[single] = game.live[single] > 0
+            self.started[fresh] = True
+
+        seen = self.seen
+        seen_live = self.seen_live
+        total = game.total
+        live = game.live
+        front_seen = (seen & 1) == 1
+        front_live = (seen_live & 1) == 1
+        # shell_at(0), from the front shell if it was seen, otherwise from the unseen shells' counts
+        no_live_left = live - _POPCOUNT[seen_live] <= 0
+        no_blank_left = total - live - _POPCOUNT[seen & ~seen_live] <= 0
+        certain_live = (front_seen & front_live) | (~front_seen & ~no_live_left & no_blank_left)
+        certain_blank = (front_seen & ~front_live) | (~front_seen & no_live_left)
+
+        max_charges = game.max_charges
+        own = legal[2:]
+        # With adrenaline in hand the dealer also considers the opponent's items, after its own
+        extra = own[ADRENALINE] & (game.items[1 - me] > 0) & ~own
+        wants = np.zeros(own.shape, bool)
+        wants[MAGNIFYING_GLASS] = ~(front_seen & front_live) & (total != 1)
+        wants[CIGARETTES] = game.charges[me] < max_charges
+        wants[MEDS] = (game.charges[1 - me] < max_charges) & ~(own[CIGARETTES] | extra[CIGARETTES])
+        wants[BEER] = ~certain_live & (total != 1)
+        wants[HANDCUFFS] = total != 1
+        wants[SAW] = certain_live
+        wants[BURNER_PHONE] = total > 2
+        wants[INVERTER] = certain_blank
+
+        # The first wanted item of its own, in POSSIBLE_ITEMS order
+        own_wanted = own & wants
+        item = np.zeros(game.size, np.int8)
+        found = np.zeros(game.size, bool)
+        for idx in range(len(POSSIBLE_ITEMS)):
+            item += (own_wanted[idx] & ~found).view(np.int8) * idx
+            found |= own_wanted[idx]
+        # An item only the opponent holds is taken with adrenaline first
+        item_move = _select(found, item + 2, np.int8(2 + ADRENALINE))
+        using_item = found | (extra & wants).any(0)
+
+        # Otherwise shoot: at the opponent if the shell is live, at self if blank, a coin flip if unknown
+        decided = (total == 1) | certain_live | certain_blank
+        coin = game.rng.random(game.size) > 0.5
+        shot = SELF - ((decided & certain_live) | (~decided & coin)).view(np.int8)
+        return _select(using_item, item_move, shot)
+
+    def observe(self, game, stepped, moves, actors):
+        looked = ((actors == self.me) & (moves == 2 + MAGNIFYING_GLASS)).view(np.uint8)
+        self.seen |= looked
+        self.seen_live = (self.seen_live & ~looked) | (game.chamber & looked)
+        called = (actors == self.me) & (game.reveal >= 0)
+        if called.any():
+            bit = np.uint8(1) << game.reveal[called].astype(np.uint8)
+            self.seen[called] |= bit
+            self.seen_live[called] = (self.seen_live[called] & ~bit) | (game.chamber[called] & bit)
+        fired = game.fired.view(np.uint8)
+        self.seen >>= fired
+        self.seen_live >>= fired
+        reloaded = game.reloaded
+        if reloaded.any():
+            self.seen[reloaded] = 0
+            self.seen_live[reloaded] = 0
+            self.started[reloaded] = False
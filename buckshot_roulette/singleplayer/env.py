@@ -0,0 +1,266 @@
+"""A vectorized training environment: N singleplayer games against an in-process engine, stepped together.
+
+Requires numpy (`pip install buckshot-roulette[batch]`), but not gym. The learner always sits in `seat`; the
+opponent's turns are played out inside `step`, so every step is one decision of the learner in every game.
+
+    env = VectorEnv(256, opponent=Dealer, seed=0)
+    observations, masks = env.reset()
+    while training:
+        observations, masks, rewards, dones = env.step(policy(observations, masks))
+
+Actions are the move codes of `buckshot_roulette.singleplayer.batch`: 0 shoots the opponent, 1 shoots yourself and
+2 + i uses item i of POSSIBLE_ITEMS (steals it, while adrenaline is active). Observations are the rows of
+`buckshot_roulette.singleplayer.observation`, with the shells the learner has seen. A game that ends is dealt again
+straight away: its reward (1 for a win, -1 for a loss) and done flag come with the first observation of the next game.
+The returned arrays are reused by every call, so copy them to keep them past the next step.
+
+Opponents the batch simulator has a counterpart for (`Dealer`, `Random`, or any `AbstractBatchEngine` passed
+directly) are played in one `BatchGame`, so a step is a few NumPy operations over every game at once. Any other
+engine is played one `BuckshotGame` per slot.
+"""
+import numpy as np
+from buckshot_roulette.rng import RandomStreams
+from buckshot_roulette.shells import ShellBelief
+from buckshot_roulette.singleplayer.game import BuckshotGame, BuckshotRoulette, POSSIBLE_ITEMS, MAGNIFYING_GLASS, INVERTER
+from buckshot_roulette.singleplayer.ai import AbstractEngine, Dealer, Random
+from buckshot_roulette.singleplayer.batch import MOVES, AbstractBatchEngine, BatchGame, BatchDealer, BatchRandom
+from buckshot_roulette.singleplayer.observation import (
+    OBSERVATION_SIZE, CHARGES, ITEMS, ACTIVE, TURN, SHELLS, CHAMBER, KNOWN, KNOWN_SHELLS, encode_observations
+)
+
+ACTION_INDEX = {move: idx for idx, move in enumerate(MOVES)}
+# Engines stepped through BatchGame instead of a BuckshotGame per slot
+BATCH_ENGINES = {Dealer: BatchDealer, Random: BatchRandom}
+_KNOWN_BITS = np.uint8(1) << np.arange(KNOWN_SHELLS, dtype=np.uint8)
+
+class _Learner(AbstractEngine):
+    # Stands in for the learner's seat so BuckshotGame can deal, reload and notify it; it never chooses
+    def __init__(self, playing_as):
+        self.me = playing_as
+        self.belief = ShellBelief()
+
+    def choice(self, board: BuckshotRoulette):
+        raise RuntimeError("The learner's moves come from VectorEnv.step")
+
+    def post(self, last_move, move_result):
+        match last_move:
+            case 'op' | 'self' | 'beer':
+                self.belief.advance()
+            case 'magnifying_glass':
+                self.belief.set(0, move_result)
+            case 'burner_phone':
+                if move_result != None:
+                    self.belief.set(move_result[0], move_result[1])
+            case 'inverter':
+                self.belief.invert(0)
+
+    def on_reload(self, board: BuckshotRoulette):
+        self.belief.reset(board.total, board.live)
+
+class _BatchLearner(AbstractBatchEngine):
+    # The learner's seat in a BatchGame: plays the actions handed to step, and keeps what _Learner's belief would
+    # as a pair of bitmasks aligned with BatchGame.chamber, like BatchDealer
+    def __init__(self, playing_as):
+        self.me = playing_as
+        self.actions = None
+        self.seen = None
+        self.seen_live = None
+
+    def reset(self, game, lanes):
+        if self.seen is None:
+            self.seen = np.zeros(game.size, np.uint8)
+            self.seen_live = np.zeros(game.size, np.uint8)
+        self.seen[lanes] = 0
+        self.seen_live[lanes] = 0
+
+    def choose(self, game, mine, legal):
+        return self.actions
+
+    def observe(self, game, stepped, moves, actors):
+        mine = actors == self.me
+        looked = (mine & (moves == 2 + MAGNIFYING_GLASS)).view(np.uint8)
+        self.seen |= looked
+        self.seen_live = (self.seen_live & ~looked) | (game.chamber & looked)
+        called = mine & (game.reveal >= 0)
+        if called.any():
+            bit = np.uint8(1) << game.reveal[called].astype(np.uint8)
+            self.seen[called] |= bit
+            self.seen_live[called] = (self.seen_live[called] & ~bit) | (game.chamber[called] & bit)
+        # Only its own inverter flips a shell it has seen
+        self.seen_live ^= (mine & (moves == 2 + INVERTER)).view(np.uint8) & self.seen
+        fired = game.fired.view(np.uint8)
+        self.seen >>= fired
+        self.seen_live >>= fired
+        reloaded = game.reloaded
+        if reloaded.any():
+            self.seen[reloaded] = 0
+            self.seen_live[reloaded] = 0
+
+class VectorEnv:
+    def __init__(self, num_envs: int, opponent = Dealer, seat: int = 0, starter: int = 0, charges: int = 4,
+                 seed: int | RandomStreams | None = None, dtype = np.float32):
+        """
+        Args:
+            num_envs (int): Games stepped together
+            opponent: The engine class in the other seat, built once per game slot as `opponent(1 - seat)`, or once
+                for every slot if it is in BATCH_ENGINES or an AbstractBatchEngine
+            seat (int): The learner's seat
+            starter (int): The seat that moves first in every game
+            charges (int): Starting charges of every game
+            seed (int | RandomStreams | None): Plays slot i on substream i of this seed, game after game, instead of the global `random` module;
+                batch opponents draw everything from one NumPy generator seeded from it
+            dtype: Observation dtype; float32 or float64
+        """
+        streams = seed if seed is None or isinstance(seed, RandomStreams) else RandomStreams(seed)
+        self.num_envs = num_envs
+        self.seat = seat
+        self.starter = starter
+        self.charges = charges
+        self.learners: list[_Learner] = []
+        self.games: list[BuckshotGame] = []
+        self.batch: BatchGame | None = None
+        if isinstance(opponent, type) and issubclass(opponent, AbstractBatchEngine):
+            batch_opponent = opponent
+        else:
+            batch_opponent = BATCH_ENGINES.get(opponent)
+        if batch_opponent is not None:
+            self._learner = _BatchLearner(seat)
+            engines = (self._learner, batch_opponent(1 - seat)) if seat == 0 else (batch_opponent(1 - seat), self._learner)
+            self.batch = BatchGame(*engines, num_envs, charges, starter, seed=None if streams is None else streams.key)
+        else:
+            self.learners = [_Learner(seat) for _ in range(num_envs)]
+            for idx, learner in enumerate(self.learners):
+                engines = (learner, opponent(1 - seat)) if seat == 0 else (opponent(1 - seat), learner)
+                self.games.append(BuckshotGame(*engines, seed=None if streams is None else streams.child(idx)))
+        self.observations = np.zeros((num_envs, OBSERVATION_SIZE), dtype=dtype)
+        self.masks = np.zeros((num_envs, len(MOVES)), dtype=bool)
+        self.rewards = np.zeros(num_envs, dtype=np.float32)
+        self.dones = np.zeros(num_envs, dtype=bool)
+
+    def reset(self) -> tuple[np.ndarray, np.ndarray]:
+        """Deals a new game in every slot, returning `(observations, masks)`"""
+        self.rewards[:] = 0
+        self.dones[:] = False
+        if self.batch is not None:
+            self.batch.running[:] = False
+            self._deal_batch(np.ones(self.num_envs, bool))
+            return self._observe_batch()
+        for idx in range(self.num_envs):
+            self._deal(idx)
+        return self._observe()
+
+    def step(self, actions) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Plays one learner move in every game, then the opponent's replies, returning `(observations, masks, rewards, dones)`.
+
+        Args:
+            actions: A move code per game, legal under the last returned masks
+        """
+        if self.batch is not None:
+            return self._step_batch(actions)
+        masks = self.masks
+        rewards = self.rewards
+        dones = self.dones
+        for idx, action in enumerate(actions.tolist() if isinstance(actions, np.ndarray) else actions):
+            if not masks[idx, action]:
+                raise ValueError(f"Action {action} ({MOVES[action]}) is not legal in game {idx}")
+            game = self.games[idx]
+            game.apply(MOVES[action])
+            winner = self._advance(game)
+            if winner is None:
+                rewards[idx] = 0
+                dones[idx] = False
+            else:
+                rewards[idx] = 1 if winner == self.seat else -1
+                dones[idx] = True
+                self._deal(idx)
+        return (*self._observe(), rewards, dones)
+
+    def _deal(self, idx: int):
+        game = self.games[idx]
+        # The opponent can win before the learner gets a move; such a game has no step to report, so deal another
+        game.begin(self.starter, self.charges)
+        while self._advance(game) is not None:
+            game.begin(self.starter, self.charges)
+
+    def _advance(self, game: BuckshotGame) -> int | None:
+        # Plays the opponent until it is the learner's turn; the winner if the game ends first
+        while (turn := game.to_move()) is not None:
+            engine, board = turn
+            if board.current_turn == self.seat:
+                return None
+            game.apply(engine.choice(board))
+        return game.result()
+
+    def _observe(self) -> tuple[np.ndarray, np.ndarray]:
+        boards = []
+        beliefs = []
+        masks = self.masks
+        masks[:] = False
+        for idx, game in enumerate(self.games):
+            board = game.board
+            belief = self.learners[idx].belief
+            belief.sync(board.total, board.live)
+            boards.append(board)
+            beliefs.append(belief)
+            for move in board.moves():
+                masks[idx, ACTION_INDEX[move]] = True
+        encode_observations(boards, self.seat, self.observations, beliefs)
+        return self.observations, masks
+
+    def _step_batch(self, actions) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        game = self.batch
+        actions = np.asarray(actions).astype(np.int8)
+        illegal = ~self.masks[np.arange(self.num_envs), actions]
+        if illegal.any():
+            idx = int(np.flatnonzero(illegal)[0])
+            raise ValueError(f"Action {actions[idx]} ({MOVES[actions[idx]]}) is not legal in game {idx}")
+        # Every game is waiting on the learner, so this is one learner move per game
+        self._learner.actions = actions
+        game.step()
+        self._advance_batch()
+        ended = ~game.running
+        self.rewards[:] = (game.winner == self.seat) * 2.0 - 1.0
+        self.rewards *= ended
+        self.dones[:] = ended
+        if ended.any():
+            self._deal_batch(ended)
+        return (*self._observe_batch(), self.rewards, self.dones)
+
+    def _deal_batch(self, lanes: np.ndarray):
+        # As in _deal: a game the opponent wins before the learner's first move is dealt again
+        game = self.batch
+        while lanes.any():
+            game.reset(lanes)
+            self._advance_batch()
+            lanes = ~game.running
+
+    def _advance_batch(self):
+        # Plays the opponent in every game until it is the learner's turn or the game is over
+        game = self.batch
+        while (waiting := game.running & (game.turn != self.seat)).any():
+            game.step(waiting)
+
+    def _observe_batch(self) -> tuple[np.ndarray, np.ndarray]:
+        game = self.batch
+        seat = self.seat
+        out = self.observations
+        out[:, CHARGES] = game.charges[seat]
+        out[:, CHARGES + 1] = game.charges[1 - seat]
+        out[:, CHARGES + 2] = game.max_charges
+        out[:, ITEMS:ITEMS + len(POSSIBLE_ITEMS)] = game.items[seat].T
+        out[:, ITEMS + len(POSSIBLE_ITEMS):ACTIVE] = game.items[1 - seat].T
+        out[:, ACTIVE:TURN] = game.active.T
+        out[:, ACTIVE:TURN] /= 2
+        out[:, TURN] = game.turn == seat
+        out[:, TURN + 1] = game.skip
+        out[:, TURN + 2] = game.starter == seat
+        out[:, SHELLS] = game.live
+        out[:, SHELLS + 1] = game.total
+        out[:, CHAMBER] = game.chamber_public == 1
+        out[:, CHAMBER + 1] = game.chamber_public == 0
+        seen = (self._learner.seen[:, None] & _KNOWN_BITS) != 0
+        live = (self._learner.seen_live[:, None] & _KNOWN_BITS) != 0
+        out[:, KNOWN::2] = seen & live
+        out[:, KNOWN + 1::2] = seen & ~live
+        self.masks[:] = game.legal_moves().T
+        return out, self.masks
@@ -1,33 +1,52 @@
+import inspect
 import random
-from dataclasses import dataclass, astuple
-import copy
-from buckshot_roulette.singleplayer.ai import Dealer
-@dataclass(init=True)
+from buckshot_roulette.shells import ShellSequence, live_odds, consistent_chamber
+from buckshot_roulette.rng import RandomStreams, ZobristTable, RELOAD, ENGINE
+from buckshot_roulette.events import Turn, Move, Reload, ItemDrop, Winner, ConsoleRenderer
+POSSIBLE_ITEMS = ['handcuffs', 'magnifying_glass', 'beer', 'cigarettes', 'saw', 'inverter', 'burner_phone', 'meds', 'adrenaline']
+ITEM_INDEX = {item: idx for idx, item in enumerate(POSSIBLE_ITEMS)}
+
 class Items():
-    handcuffs: int = 0
-    magnifying_glass: int = 0
-    beer: int = 0
-    saw: int = 0
-    cigarettes: int = 0
-    inverter: int = 0
-    burner_phone: int = 0
-    meds: int = 0
-    adrenaline: int = 0
+    """Per-player item counts, stored as a fixed-width list indexed by `POSSIBLE_ITEMS`.
+    
+    Items are still readable by attribute (`items.beer`) and by key (`items['beer']`),
+    but hot paths should index `counts` directly.
+    """
+    __slots__ = ('counts',)
+    
+    def __init__(self, handcuffs=0, magnifying_glass=0, beer=0, saw=0, cigarettes=0, inverter=0, burner_phone=0, meds=0, adrenaline=0):
+        self.counts = [handcuffs, magnifying_glass, beer, cigarettes, saw, inverter, burner_phone, meds, adrenaline]
+    
+    @classmethod
+    def from_counts(cls, counts: list):
+        items = cls.__new__(cls)
+        items.counts = counts
+        return items
+    
+    def copy(self):
+        return Items.from_counts(self.counts[:])
     
     def item_count(self):
-        return self.handcuffs + self.magnifying_glass + self.beer + self.saw + self.cigarettes + self.inverter + self.burner_phone + self.meds + self.adrenaline
+        return sum(self.counts)
     
     def __getitem__(self, key):
-        return self.__getattribute__(key)
+        return self.counts[ITEM_INDEX[key]]
 
     def __setitem__(self, key, value):
-        self.__setattr__(key, value)
+        self.counts[ITEM_INDEX[key]] = value
 
     def __delitem__(self, key):
-        self.__setattr__(key, 0)
+        self.counts[ITEM_INDEX[key]] = 0
     
     def __iter__(self):
-        return ItemIterable(self)
+        return (POSSIBLE_ITEMS[idx] for idx, count in enumerate(self.counts) if count >= 1)
+    
+    def __eq__(self, other):
+        if not isinstance(other, Items):
+            return NotImplemented
+        return self.counts == other.counts
+    
+    __hash__ = None
 
     def __str__(self):
         items = ', '.join(f'{key}={self[key]}' for key in self if self[key] > 0)
@@ -35,73 +54,233 @@ class Items():
 
     def __repr__(self):
         return self.__str__()
-class ItemIterable():
-    def __init__(self, data: Items):
-        self.data: Items = data
-        self.index = 0
 
-    def __iter__(self):
-        return self
-
-    def __next__(self):
-        if self.index < len(BuckshotRoulette.POSSIBLE_ITEMS):
-            while self.index < len(BuckshotRoulette.POSSIBLE_ITEMS) and self.data[BuckshotRoulette.POSSIBLE_ITEMS[self.index]] < 1:
-                self.index += 1                
-            if self.index >= len(BuckshotRoulette.POSSIBLE_ITEMS):
-                raise StopIteration
-            
-            item = BuckshotRoulette.POSSIBLE_ITEMS[self.index]
-            self.index += 1
-            return item
-        else:
-            raise StopIteration
+def _count_property(idx):
+    def getter(self):
+        return self.counts[idx]
+    def setter(self, value):
+        self.counts[idx] = value
+    return property(getter, setter)
+
+for _idx, _item in enumerate(POSSIBLE_ITEMS):
+    setattr(Items, _item, _count_property(_idx))
+
+HANDCUFFS, MAGNIFYING_GLASS, BEER, CIGARETTES, SAW, INVERTER, BURNER_PHONE, MEDS, ADRENALINE = range(len(POSSIBLE_ITEMS))
+
+# Zobrist keys: one random 64-bit number per (field, value), xor'd together into BuckshotRoulette.key()
+_zobrist = random.Random(0xB0C5)
+def _zobrist_table():
+    return ZobristTable(RandomStreams.from_key(_zobrist.getrandbits(64)))
+_Z_MAX_CHARGES = _zobrist_table()
+# Charges can dip below zero from a sawed-off shot or bad meds, which the tables key like any other value
+_Z_CHARGES = [_zobrist_table(), _zobrist_table()]
+_Z_ITEMS = [[_zobrist_table() for _ in POSSIBLE_ITEMS] for _ in range(2)]
+# Indexed by twice the count, since handcuffs wear off in halves
+_Z_ACTIVE = [_zobrist_table() for _ in POSSIBLE_ITEMS]
+_Z_TOTAL = _zobrist_table()
+_Z_LIVE = _zobrist_table()
+_Z_CHAMBER = {None: 0, False: _zobrist.getrandbits(64), True: _zobrist.getrandbits(64)}
+_Z_TURN = _zobrist.getrandbits(64)
+_Z_SKIP = _zobrist.getrandbits(64)
+_Z_STARTER = _zobrist.getrandbits(64)
+
+# What the undo trail records: an op and the two values that take a change back (see BuckshotRoulette.push)
+_U_CHARGE, _U_ITEM, _U_ACTIVE, _U_SKIP, _U_CHAMBER, _U_SHELLS, _U_TURN = range(7)
+
+async def _set_last_shell(dealer, shell: bool):
+    dealer.last_shell = shell
 
 class BuckshotGame:
-    def __init__(self, engine0, engine1):
+    def __init__(self, engine0, engine1, seed: int | RandomStreams | None = None, recorder = None):
+        """
+        Args:
+            engine0: The engine playing as player 0
+            engine1: The engine playing as player 1
+            seed (int | RandomStreams | None): Plays every game on its own substream of this seed instead of the global `random` module.
+                Game n, each of its reloads and each engine draw from separate streams, so any game can be replayed alone with `play(game=n)`.
+            recorder (TrajectoryRecorder | None): Records every move played (see buckshot_roulette.recorder)
+        """
         self.engine0 = engine0
         self.engine1 = engine1
+        self.streams = seed if seed is None or isinstance(seed, RandomStreams) else RandomStreams(seed)
+        self.games_played = 0
+        self.recorder = recorder
+        # The game in progress, set by begin()
+        self.board: BuckshotRoulette | None = None
+        self.shotgun: ShellSequence | None = None
+        # Awaitables returned by coroutine engine callbacks, awaited by an async driver
+        self.pending: list = []
+        # Called with every event; nothing is built for them while this is empty
+        self.listeners: list = []
 
-    def play(self, starter = 0, charges=4, celebrate = True, itemsused = True):
-        board = BuckshotRoulette(starter, charge_count=charges)
-        shotgun = ([True] * board.live) + ([False] * (board.total - board.live))
-        random.shuffle(shotgun)
-        while board.winner() == None:
-            if len(shotgun) == 0:
-                self.engine0.on_reload(board)
-                self.engine1.on_reload(board)
-                shotgun = ([True] * board.live) + ([False] * (board.total - board.live))
-                random.shuffle(shotgun)
-            player = self.engine0 if board.current_turn == 0 else self.engine1
-            if isinstance(player, Dealer):
-                player.last_shell = shotgun[-1]
-            if itemsused:
-                print("\n\n------------------------------------------------------------")
-                print(f"player {board.current_turn}")
-            move = player.choice(board)
-            if type(move) == str:
-                move = move.split(" ")
-            for mov in move:
-                res, shotgun = board.make_move(mov, shotgun)
-                if res == "INVALID_MOVE":
-                    break
-                if itemsused:
-                    print(f"{move} : {res}")
-                player.post(mov, res)
-        
-        if celebrate:
-            print("player", board.winner(), "wins!")
-        return board.winner()
+    def play(self, starter = 0, charges=4, celebrate = True, itemsused = True, game: int | None = None):
+        """Plays a game out, returning the winner.
+
+        `itemsused` prints every turn and move and `celebrate` the winner, through a `ConsoleRenderer` subscribed for
+        this game only; subscribe your own listeners to see events without printing.
+        """
+        renderer = ConsoleRenderer(moves=itemsused, winner=celebrate) if itemsused or celebrate else None
+        if renderer is not None:
+            self.subscribe(renderer)
+        try:
+            self.begin(starter, charges, game)
+            while (turn := self.to_move()) is not None:
+                player, board = turn
+                if self.listeners:
+                    self._emit(Turn(board.current_turn))
+                self.apply(player.choice(board))
+                self._check_sync()
+        finally:
+            if renderer is not None:
+                self.unsubscribe(renderer)
+        return self.result()
+
+    def events(self, starter = 0, charges = 4, game: int | None = None):
+        """Plays a game out like `play`, yielding its events (see buckshot_roulette.events) as they happen"""
+        queue = []
+        self.subscribe(queue.append)
+        try:
+            self.begin(starter, charges, game)
+            yield from queue
+            queue.clear()
+            while (turn := self.to_move()) is not None:
+                player, board = turn
+                yield Turn(board.current_turn)
+                self.apply(player.choice(board))
+                self._check_sync()
+                yield from queue
+                queue.clear()
+        finally:
+            self.unsubscribe(queue.append)
+
+    def subscribe(self, listener):
+        """Calls `listener(event)` with every event of the games played from now on"""
+        self.listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        self.listeners.remove(listener)
+
+    def _emit(self, event):
+        for listener in self.listeners:
+            listener(event)
+
+    def _emit_deal(self, held: list[list[int]]):
+        # The shells just loaded and the items each player was handed on top of `held`
+        board = self.board
+        self._emit(Reload(board.live, board.total))
+        for player, items in enumerate(board.items):
+            self._emit(ItemDrop(player, [
+                POSSIBLE_ITEMS[item] for item, count in enumerate(items.counts) for _ in range(count - held[player][item])
+            ]))
+
+    # play() in steps, so a driver can interleave many games (see buckshot_roulette.lockstep)
+
+    def begin(self, starter = 0, charges = 4, game: int | None = None):
+        """Deals a new game; `game` picks its stream when seeded, defaulting to the next one"""
+        streams = None
+        if self.streams is not None:
+            streams = self.streams.child(self.games_played if game is None else game)
+            self.engine0.rng = streams.rng(ENGINE, 0)
+            self.engine1.rng = streams.rng(ENGINE, 1)
+        self.games_played += 1
+        self._game_streams = streams
+        self._reloads = 0
+        if self.recorder is not None:
+            self.recorder.begin_game(self.games_played - 1 if game is None else game)
+        self.board = BuckshotRoulette(starter, charge_count=charges, rng=None if streams is None else streams.rng(RELOAD, 0))
+        self.shotgun = ShellSequence.shuffled(self.board.live, self.board.total, self.board.rng)
+        # The first load counts as a reload, so engines reused across games start each one fresh
+        self._defer(self.engine0.on_reload(self.board))
+        self._defer(self.engine1.on_reload(self.board))
+        if self.listeners:
+            self._emit_deal([[0] * len(POSSIBLE_ITEMS), [0] * len(POSSIBLE_ITEMS)])
+
+    def to_move(self):
+        """The `(engine, board)` whose choice is needed next, or None once the game is over"""
+        from buckshot_roulette.singleplayer.ai import Dealer
+        board = self.board
+        if board.winner() != None:
+            return None
+        if len(self.shotgun) == 0:
+            self._defer(self.engine0.on_reload(board))
+            self._defer(self.engine1.on_reload(board))
+            self.shotgun = ShellSequence.shuffled(board.live, board.total, board.rng)
+        player = self.engine0 if board.current_turn == 0 else self.engine1
+        if isinstance(player, Dealer):
+            if self.pending:
+                # A coroutine on_reload hasn't run yet and would clear it, so it's set once the driver has awaited that
+                self.pending.append(_set_last_shell(player, self.shotgun[-1]))
+            else:
+                player.last_shell = self.shotgun[-1]
+        return player, board
+
+    def apply(self, move):
+        """Plays the choice of the engine returned by `to_move`"""
+        board = self.board
+        actor = board.current_turn
+        player = self.engine0 if actor == 0 else self.engine1
+        if type(move) == str:
+            move = move.split(" ")
+        recorder = self.recorder
+        listeners = self.listeners
+        for mov in move:
+            if recorder is not None:
+                recorder.record_state(board, self.shotgun)
+            res, self.shotgun = board.make_move(mov, self.shotgun, load_new=False)
+            if recorder is not None:
+                # The burner phone is the only result the opponent doesn't see
+                recorder.record_move(mov, res, None if mov == 'burner_phone' else res)
+                winner = board.winner()
+                if winner is not None:
+                    recorder.end_episode(winner)
+            if listeners:
+                self._emit(Move(actor, mov, res, None if mov == 'burner_phone' else res))
+                winner = board.winner()
+                if winner is not None:
+                    self._emit(Winner(winner))
+            if len(self.shotgun) == 0:
+                # Each reload deals, shuffles and draws everything up to the next one from its own stream,
+                # so a deal doesn't depend on how many rolls came before it
+                self._reloads += 1
+                if self._game_streams is not None:
+                    board.rng = self._game_streams.rng(RELOAD, self._reloads)
+                if listeners and board.winner() is None:
+                    held = [items.counts[:] for items in board.items]
+                    board.reload()
+                    self._emit_deal(held)
+                else:
+                    board.reload()
+            if res == "INVALID_MOVE":
+                break
+            self._defer(player.post(mov, res))
+
+    def result(self) -> int | None:
+        return self.board.winner()
+
+    def _defer(self, result):
+        # Coroutine engine callbacks hand back awaitables; buckshot_roulette.aio awaits them before the game goes on
+        if result is not None and inspect.isawaitable(result):
+            self.pending.append(result)
+
+    def _check_sync(self):
+        if self.pending:
+            for awaitable in self.pending:
+                getattr(awaitable, 'close', lambda: None)()
+            raise TypeError("Engine callbacks returned coroutines; play coroutine engines with buckshot_roulette.aio")
     
 class BuckshotRoulette:
-    POSSIBLE_ITEMS = ['handcuffs', 'magnifying_glass', 'beer', 'cigarettes', 'saw', 'inverter', 'burner_phone', 'meds', 'adrenaline']
+    __slots__ = ('max_charges', 'charges', 'starter', 'current_turn', 'total', 'live', 'items', '_active_items', '_skip_next', 'chamber_public', '_undo', '_frames', '_key', 'rng')
+    POSSIBLE_ITEMS = POSSIBLE_ITEMS
     ITEM_CAPS = Items(handcuffs=1, magnifying_glass=3, beer=2, cigarettes=1, saw=3, inverter=8, burner_phone=1, meds=1, adrenaline=2)
-    def __init__(self, starter = 0, charge_count = None, total_rounds = None, live_rounds = None):
-        self.max_charges = charge_count if charge_count else random.randint(2, 4)
+    def __init__(self, starter = 0, charge_count = None, total_rounds = None, live_rounds = None, rng = None):
+        # Any random.Random-compatible generator; the global random module by default
+        self.rng = random if rng is None else rng
+        self.max_charges = charge_count if charge_count else self.rng.randint(2, 4)
         self.charges = [self.max_charges, self.max_charges]
         self.starter = starter
         self.current_turn = starter
         
-        self.total = total_rounds if total_rounds else random.randint(2, 8)
+        self.total = total_rounds if total_rounds else self.rng.randint(2, 8)
         self.live = self.total // 2 if live_rounds == None else live_rounds
         if self.live > self.total:
             raise ValueError("Live Rounds must be less than Total Rounds")
@@ -119,31 +298,43 @@ class BuckshotRoulette:
         self._skip_next = False
         
         self.chamber_public = None
-        self.give_items(random.randint(2, 5))
+        self._undo = []
+        self._frames = []
+        self._key = self._compute_key()
+        self.give_items(self.rng.randint(2, 5))
+
+    def reload(self, drop_items = True):
+        """Loads a new sequence once the chamber is empty, handing the turn back to the starter"""
+        if self.current_turn != self.starter:
+            self.switch_turn()
+        self.new_rounds(drop_items)
 
     def new_rounds(self, drop_items = True):
-        self.total = random.randint(2, 8)
-        self.live = self.total // 2
+        total = self.rng.randint(2, 8)
+        self._set_shells(total, total // 2)
         #self._shotgun = ([True] * self.live) + ([False] * (self.total - self.live))
         #random.shuffle(self._shotgun)
         if drop_items:
-            self.give_items(random.randint(2, 5))
+            self.give_items(self.rng.randint(2, 5))
     
     def give_items(self, item_count):
-        for player in self.items:
-            if player.item_count() == 8:
+        caps = self.ITEM_CAPS.counts
+        for player in range(2):
+            counts = self.items[player].counts
+            held = sum(counts)
+            if held == 8:
                 # unfortunate.
                 break
-            choices = [i for i in self.POSSIBLE_ITEMS if player[i] < self.ITEM_CAPS[i]]
+            choices = [POSSIBLE_ITEMS[i] for i in range(len(POSSIBLE_ITEMS)) if counts[i] < caps[i]]
             
             # Patch 1.2.1
             # TODO: Double check behavior with source code when someone rips it
             if self.max_charges <= 2 and 'saw' in choices:
                 choices.remove('saw')
                 
-            items = random.choices(choices, k=min(item_count, 8 - player.item_count()))
+            items = self.rng.choices(choices, k=min(item_count, 8 - held))
             for item in items:
-                player[item] += 1
+                self._add_item(player, ITEM_INDEX[item], 1)
     
 #    def shotgun_info(self):
 #        live = sum([1 if x else 0 for x in self._shotgun])
@@ -158,31 +349,31 @@ class BuckshotRoulette:
         else:
             return None        
         
-    def fire(self, shotgun, at_opponent=True) -> None:
+    def fire(self, shotgun: ShellSequence, at_opponent=True) -> None:
+        shotgun = ShellSequence.coerce(shotgun)
         target = (self.current_turn + at_opponent) % 2
-        is_hit = shotgun[0]
-        shotgun = shotgun[1:]
-        self.chamber_public = None
+        is_hit = shotgun.pop()
+        self._set_chamber_public(None)
         
         def switch():
-            self._active_items.saw = 0
+            self._set_active(SAW, 0)
             if self._active_items.handcuffs > 0.5:
                 if not at_opponent and not is_hit:
                     return
-                self._active_items.handcuffs -= 0.5
-                self._skip_next = True
+                self._set_active(HANDCUFFS, self._active_items.handcuffs - 0.5)
+                self._set_skip(True)
             
             if self._skip_next:
-                self._skip_next = False
+                self._set_skip(False)
             else:
                 self.switch_turn()
                         
         if is_hit:
             damage = 1
             if self._active_items.saw > 0:
-                self._active_items.saw = 0
+                self._set_active(SAW, 0)
                 damage = 2
-            self.charges[target] -= damage
+            self._set_charge(target, self.charges[target] - damage)
             switch()
             return damage, shotgun
         elif at_opponent: # Missed against opponent
@@ -194,11 +385,8 @@ class BuckshotRoulette:
     def legal_items(self) -> list[str]:
         """All items that could be used in the current board state, regardless of whether the player currently has them
         """
-        out_arr = []
-        for item in self.POSSIBLE_ITEMS:
-            if self._active_items[item] == 0:
-                out_arr.append(item)
-        return out_arr
+        active = self._active_items.counts
+        return [POSSIBLE_ITEMS[i] for i in range(len(POSSIBLE_ITEMS)) if active[i] == 0]
     
     def moves(self):
         if self._active_items.adrenaline > 0:
@@ -208,24 +396,37 @@ class BuckshotRoulette:
             moves = ['op', 'self']
             items = self.items[self.current_turn]
         
-        for item in self.POSSIBLE_ITEMS:            
-            if items[item] > 0 and self._active_items[item] == 0:
-                moves.append(item)
+        counts = items.counts
+        active = self._active_items.counts
+        for i in range(len(POSSIBLE_ITEMS)):
+            if counts[i] > 0 and active[i] == 0:
+                moves.append(POSSIBLE_ITEMS[i])
                 
         if len(moves) == 0:
             # Only possible if the previous move is adrenaline, and there are no valid items to take
             # Unfortunate.
-            self._active_items.adrenaline = 0
+            self._set_active(ADRENALINE, 0)
             return self.moves()            
         return moves
 
-    def make_move(self, move, shotgun, load_new = True):
+    def make_move(self, move, shotgun: ShellSequence | list[bool], load_new = True, roll = None):
+        """Plays a move against the given chamber
+
+        Args:
+            move (str): The move to play
+            shotgun (ShellSequence | list[bool]): The chamber, updated in place
+            load_new (bool): Roll a new sequence and drop items if this move empties the chamber
+            roll (int | bool | None): Forces the random part of the move instead of drawing it: the shell index revealed by the burner phone, or whether the meds heal
+        """
+        shotgun = ShellSequence.coerce(shotgun)
         out_val = None
         if self._active_items.adrenaline > 0:
-            items = self.items[self.opponent()]
-            self._active_items.adrenaline = 0
+            owner = self.opponent()
+            self._set_active(ADRENALINE, 0)
         else:
-            items = self.items[self.current_turn]
+            owner = self.current_turn
+        if move in ITEM_INDEX:
+            self._add_item(owner, ITEM_INDEX[move], -1)
         match move:
             case 'op':
                 out_val, shotgun = self.fire(shotgun, at_opponent=True)
@@ -233,79 +434,286 @@ class BuckshotRoulette:
                 out_val, shotgun = self.fire(shotgun, at_opponent=False)
                 out_val = -out_val
             case 'handcuffs':
-                items.handcuffs -= 1
-                self._active_items.handcuffs += 1
-                self._skip_next = True
+                self._set_active(HANDCUFFS, self._active_items.handcuffs + 1)
+                self._set_skip(True)
             case 'magnifying_glass':
-                items.magnifying_glass -= 1
-                out_val = shotgun[0]
-                self.chamber_public = shotgun[0]
+                out_val = shotgun.peek()
+                self._set_chamber_public(out_val)
             case 'beer':
-                items.beer -= 1
                 if len(shotgun) > 1:
-                    val = shotgun[0]
-                    shotgun = shotgun[1:]
-                    out_val = val
+                    out_val = shotgun.pop()
                 else:
-                    shotgun = []
+                    shotgun.clear()
             case 'cigarettes':
-                items.cigarettes -= 1
-                self.charges[self.current_turn] = min(self.charges[self.current_turn]+1, self.max_charges)
+                self._set_charge(self.current_turn, min(self.charges[self.current_turn]+1, self.max_charges))
             case 'saw':
-                items.saw -= 1
-                self._active_items.saw += 1
+                self._set_active(SAW, self._active_items.saw + 1)
             case 'inverter':
-                items.inverter -= 1
-                shotgun[0] = not shotgun[0]
+                shotgun.invert()
             case 'burner_phone':
-                items.burner_phone -= 1
                 if len(shotgun) > 1:
-                    idx = random.randint(1, len(shotgun)-1)
+                    idx = self.rng.randint(1, len(shotgun)-1) if roll is None else roll
                     out_val = (idx, shotgun[idx])
             case 'meds':
-                items.meds -= 1
-                if random.random() > 0.5:
-                    self.charges[self.current_turn] = min(self.charges[self.current_turn] + 2, self.max_charges)
+                if (self.rng.random() > 0.5) if roll is None else roll:
+                    self._set_charge(self.current_turn, min(self.charges[self.current_turn] + 2, self.max_charges))
                 else:
-                    self.charges[self.current_turn] -= 1
+                    self._set_charge(self.current_turn, self.charges[self.current_turn] - 1)
             case 'adrenaline':
-                items.adrenaline -= 1
-                self._active_items.adrenaline += 1
+                self._set_active(ADRENALINE, self._active_items.adrenaline + 1)
             case _:
                 out_val = "INVALID_MOVE"
                     
         
         if load_new and len(shotgun) == 0:
-            self.current_turn = self.starter
-            self.new_rounds()
+            self.reload()
             return out_val, shotgun
         
         if move != 'inverter':
-            self.total = len(shotgun)
-            self.live = sum(shotgun)
+            self._set_shells(len(shotgun), shotgun.live)
         return out_val, shotgun
     
+    def outcomes(self, move, known_shells = None, live = None, total = None):
+        """Every way a move can play out, as `(probability, successor, result)` tuples, where `result` is what `make_move` would return.
+
+        Chance comes from the unknown shells (given the public live/total counts and any known positions), the burner phone's
+        index and the meds coin flip. Identical outcomes are merged. A move that empties the chamber is not reloaded; the
+        successor is left with `total == 0` and the reload draw is up to the caller.
+
+        Args:
+            move (str): The move to play
+            known_shells (list[bool | None] | None): Known shells by position in the chamber, e.g. from an engine's memory
+            live (int | None): Live shells left, defaulting to `self.live`
+            total (int | None): Shells left, defaulting to `self.total`
+        """
+        live = self.live if live is None else live
+        total = self.total if total is None else total
+        known = self._known_chamber(known_shells, total)
+        outcomes = []
+        for p, fixed, roll in self._branches(move, known, live, total):
+            successor = self.copy()
+            result, _ = successor.make_move(move, consistent_chamber(fixed, known, live, total), load_new=False, roll=roll)
+            for i, (q, other, other_result) in enumerate(outcomes):
+                if other_result == result and other == successor:
+                    outcomes[i] = (q + p, other, other_result)
+                    break
+            else:
+                outcomes.append((p, successor, result))
+        return outcomes
+
+    def _known_chamber(self, known_shells, total) -> list:
+        known = list(known_shells[:total]) if known_shells else []
+        known += [None] * (total - len(known))
+        if total > 0 and known[0] is None and self.chamber_public is not None:
+            known[0] = self.chamber_public
+        return known
+
+    def _branches(self, move, known, live, total) -> list[tuple[float, dict[int, bool], int | bool | None]]:
+        """The chance branches of a move as `(probability, fixed shells, roll)`; see `outcomes`"""
+        if move == 'burner_phone' and total > 1:
+            branches = []
+            for idx in range(1, total):
+                p_live = live_odds(idx, known, live, total)
+                for shell, p in ((True, p_live), (False, 1 - p_live)):
+                    if p > 0:
+                        branches.append((p / (total - 1), {idx: shell}, idx))
+            return branches
+        if move == 'meds':
+            return [(0.5, {}, True), (0.5, {}, False)]
+        if total > 0 and move in ('op', 'self', 'beer', 'magnifying_glass'):
+            p_live = live_odds(0, known, live, total)
+            return [(p, {0: shell}, None) for shell, p in ((True, p_live), (False, 1 - p_live)) if p > 0]
+        return [(1.0, {}, None)]
+
+    def push(self, move, shotgun: ShellSequence | list[bool], load_new = True, roll = None):
+        """Plays a move like `make_move`, but records the state it changes so `pop` can take it back.
+
+        Only the fields the move changes are recorded, as flat entries on a trail that is reused from node to node.
+        The chamber is updated in place, so pass the same ShellSequence to every push of a line of play.
+        """
+        shotgun = ShellSequence.coerce(shotgun)
+        self._frames.append(len(self._undo))
+        self._undo += (self._key, shotgun, shotgun.bits, shotgun.cursor, shotgun.live)
+        return self.make_move(move, shotgun, load_new, roll)
+
+    def pop(self):
+        """Takes back the last move made with `push`, including its effect on the chamber"""
+        mark = self._frames.pop()
+        undo = self._undo
+        # Newest change first; each is (op, a, b) after the frame's key and chamber
+        for pos in range(len(undo) - 3, mark + 2, -3):
+            op = undo[pos]
+            a = undo[pos + 1]
+            b = undo[pos + 2]
+            if op == _U_ITEM:
+                self.items[a].counts[b >> 4] = b & 0xF
+            elif op == _U_CHARGE:
+                self.charges[a] = b
+            elif op == _U_TURN:
+                self.current_turn = a
+            elif op == _U_ACTIVE:
+                self._active_items.counts[a] = b
+            elif op == _U_SKIP:
+                self._skip_next = a
+            elif op == _U_CHAMBER:
+                self.chamber_public = a
+            else:
+                self.total = a
+                self.live = b
+        self._key = undo[mark]
+        shotgun = undo[mark + 1]
+        shotgun.bits = undo[mark + 2]
+        shotgun.cursor = undo[mark + 3]
+        shotgun.live = undo[mark + 4]
+        del undo[mark:]
+
+    # Every change to the board's state goes through these, so the Zobrist key stays current and, while a push is
+    # open, the undo trail gets the (op, a, b) that takes the change back
     def switch_turn(self):
         #self._active_items = {'handcuffs': 0, 'magnifying_glass': 0, 'beer': 0, 'cigarettes': 0, 'saw': 0}
+        if self._frames:
+            self._undo += (_U_TURN, self.current_turn, None)
         self.current_turn = 1 if self.current_turn == 0 else 0
+        self._key ^= _Z_TURN
+    
+    def _set_charge(self, player, value):
+        old = self.charges[player]
+        if self._frames:
+            self._undo += (_U_CHARGE, player, old)
+        self._key ^= _Z_CHARGES[player][old] ^ _Z_CHARGES[player][value]
+        self.charges[player] = value
+    
+    def _add_item(self, player, idx, amount):
+        counts = self.items[player].counts
+        old = counts[idx]
+        if self._frames:
+            self._undo += (_U_ITEM, player, idx << 4 | old)
+        self._key ^= _Z_ITEMS[player][idx][old] ^ _Z_ITEMS[player][idx][old + amount]
+        counts[idx] = old + amount
+    
+    def _set_active(self, idx, value):
+        active = self._active_items.counts
+        old = active[idx]
+        if old != value:
+            if self._frames:
+                self._undo += (_U_ACTIVE, idx, old)
+            self._key ^= _Z_ACTIVE[idx][int(old * 2)] ^ _Z_ACTIVE[idx][int(value * 2)]
+            active[idx] = value
+    
+    def _set_skip(self, value):
+        if value != self._skip_next:
+            if self._frames:
+                self._undo += (_U_SKIP, self._skip_next, None)
+            self._key ^= _Z_SKIP
+            self._skip_next = value
+    
+    def _set_chamber_public(self, value):
+        if value is not self.chamber_public:
+            if self._frames:
+                self._undo += (_U_CHAMBER, self.chamber_public, None)
+            self._key ^= _Z_CHAMBER[self.chamber_public] ^ _Z_CHAMBER[value]
+            self.chamber_public = value
+    
+    def _set_shells(self, total, live):
+        if total != self.total or live != self.live:
+            if self._frames:
+                self._undo += (_U_SHELLS, self.total, self.live)
+            self._key ^= _Z_TOTAL[self.total] ^ _Z_TOTAL[total] ^ _Z_LIVE[self.live] ^ _Z_LIVE[live]
+            self.total = total
+            self.live = live
+    
+    def _compute_key(self) -> int:
+        key = _Z_MAX_CHARGES[self.max_charges] ^ _Z_TOTAL[self.total] ^ _Z_LIVE[self.live] ^ _Z_CHAMBER[self.chamber_public]
+        for player in range(2):
+            key ^= _Z_CHARGES[player][self.charges[player]]
+            for idx, count in enumerate(self.items[player].counts):
+                key ^= _Z_ITEMS[player][idx][count]
+        for idx, count in enumerate(self._active_items.counts):
+            key ^= _Z_ACTIVE[idx][int(count * 2)]
+        if self.current_turn:
+            key ^= _Z_TURN
+        if self._skip_next:
+            key ^= _Z_SKIP
+        if self.starter:
+            key ^= _Z_STARTER
+        return key
+    
+    def key(self) -> int:
+        """64-bit Zobrist key of the position, updated incrementally by every move. Equal boards have equal keys."""
+        return self._key
+    
+    def rehash(self):
+        """Recomputes `key()` from scratch; only needed after editing the board's fields directly"""
+        self._key = self._compute_key()
         
     def opponent(self):
         return 1 if self.current_turn == 0 else 0
 
     def copy(self):
-        new_board = BuckshotRoulette(charge_count=0)  # Temporary charge count; will be overwritten
+        # Skip __init__ so no throwaway items are rolled for the new board
+        new_board = BuckshotRoulette.__new__(BuckshotRoulette)
         new_board.max_charges = self.max_charges
         new_board.charges = self.charges[:]
         new_board.starter = self.starter
         new_board.current_turn = self.current_turn
         new_board.total = self.total
         new_board.live = self.live
-        new_board.items = copy.deepcopy(self.items)        
-        new_board._active_items = copy.deepcopy(self._active_items)
+        new_board.items = [self.items[0].copy(), self.items[1].copy()]
+        new_board._active_items = self._active_items.copy()
         new_board._skip_next = self._skip_next
         new_board.chamber_public = self.chamber_public
+        new_board._undo = []
+        new_board._frames = []
+        new_board._key = self._key
+        new_board.rng = self.rng
         return new_board
-    
+
+    def pack(self) -> int:
+        """Packs the board into a single integer with 4 bits per field, for storing large numbers of positions.
+
+        Item counts and charges must stay below 16 (charges may dip to -2 from a sawed-off shot). Restore with `BuckshotRoulette.unpack`.
+        """
+        packed = 0
+        for count in self._active_items.counts:
+            # Active handcuffs wear off in halves
+            packed = (packed << 4) | int(count * 2)
+        for player in self.items:
+            for count in player.counts:
+                packed = (packed << 4) | count
+        flags = self.starter | (self.current_turn << 1) | (self._skip_next << 2)
+        chamber = 0 if self.chamber_public is None else 1 + self.chamber_public
+        for value in (self.max_charges, self.charges[0] + 2, self.charges[1] + 2, self.total, self.live, flags, chamber):
+            packed = (packed << 4) | value
+        return packed
+
+    @classmethod
+    def unpack(cls, packed: int):
+        """Rebuilds a board from the output of `pack`"""
+        fields = []
+        for _ in range(7 + 3 * len(POSSIBLE_ITEMS)):
+            fields.append(packed & 0xF)
+            packed >>= 4
+        fields.reverse()
+
+        board = cls.__new__(cls)
+        n = len(POSSIBLE_ITEMS)
+        board._active_items = Items.from_counts([count / 2 if count % 2 else count // 2 for count in fields[:n]])
+        board.items = [Items.from_counts(fields[n:2 * n]), Items.from_counts(fields[2 * n:3 * n])]
+        max_charges, charge0, charge1, total, live, flags, chamber = fields[3 * n:]
+        board.max_charges = max_charges
+        board.charges = [charge0 - 2, charge1 - 2]
+        board.total = total
+        board.live = live
+        board.starter = flags & 1
+        board.current_turn = (flags >> 1) & 1
+        board._skip_next = bool(flags & 4)
+        board.chamber_public = None if chamber == 0 else chamber == 2
+        board._undo = []
+        board._frames = []
+        board._key = board._compute_key()
+        board.rng = random
+        return board
+
     def __eq__(self, other):
         if not isinstance(other, BuckshotRoulette):
             return NotImplemented
@@ -313,6 +721,7 @@ class BuckshotRoulette:
         # Comparing all relevant attributes for equality
         return (self.max_charges == other.max_charges and
                 self.charges == other.charges and
+                self.starter == other.starter and
                 self.current_turn == other.current_turn and
                 self.total == other.total and
                 self.live == other.live and
@@ -322,15 +731,7 @@ class BuckshotRoulette:
                 self.chamber_public == other.chamber_public)
 
     def __hash__(self):
-        # Creating a hash based on a tuple of immutable representations of relevant attributes
-        return hash((self.max_charges, 
-                     tuple(self.charges), 
-                     self.current_turn, 
-                     tuple(self._shotgun), 
-                     tuple(astuple(player) for player in self.items), 
-                     astuple(self._active_items), 
-                     self._skip_next, 
-                     self.chamber_public))
+        return self._key
     def to_json(self):
         return {
             "max_charges": self.max_charges,
@@ -0,0 +1,88 @@
+"""Fixed-layout feature vectors of singleplayer boards, written straight into caller-supplied buffers.
+
+`encode_observation(board, player, out)` fills `OBSERVATION_SIZE` floats of any writable float buffer (a NumPy array,
+an `array.array`, a `memoryview`...) through a memoryview, so it allocates nothing. `encode_observations` fills one row
+per board of an (N, OBSERVATION_SIZE) array. Everything is from `player`'s side of the table:
+
+    [CHARGES, +3)   own charges, opponent's charges, max charges
+    [ITEMS, +18)    own item counts, then the opponent's, in POSSIBLE_ITEMS order
+    [ACTIVE, +9)    active items in POSSIBLE_ITEMS order (handcuffs wear off in halves)
+    [TURN, +3)      1 if it is `player`'s turn, 1 if the next turn is skipped, 1 if `player` started the round
+    [SHELLS, +2)    live shells, total shells
+    [CHAMBER, +2)   chamber_public: 1 in the first slot if known live, in the second if known blank
+    [KNOWN, +16)    for the first KNOWN_SHELLS positions: 1 in the first slot if known live, in the second if known blank
+
+Known shells come from `player`'s own knowledge, passed as a `ShellBelief` or a dict of position to shell.
+"""
+from array import array
+from buckshot_roulette.shells import float_view, write_known
+from buckshot_roulette.singleplayer.game import BuckshotRoulette, POSSIBLE_ITEMS
+
+KNOWN_SHELLS = 8
+CHARGES = 0
+ITEMS = CHARGES + 3
+ACTIVE = ITEMS + 2 * len(POSSIBLE_ITEMS)
+TURN = ACTIVE + len(POSSIBLE_ITEMS)
+SHELLS = TURN + 3
+CHAMBER = SHELLS + 2
+KNOWN = CHAMBER + 2
+OBSERVATION_SIZE = KNOWN + 2 * KNOWN_SHELLS
+
+def _write(board: BuckshotRoulette, player: int, view: memoryview, base: int, known):
+    opponent = 1 - player
+    view[base + CHARGES] = board.charges[player]
+    view[base + CHARGES + 1] = board.charges[opponent]
+    view[base + CHARGES + 2] = board.max_charges
+    pos = base + ITEMS
+    for count in board.items[player].counts:
+        view[pos] = count
+        pos += 1
+    for count in board.items[opponent].counts:
+        view[pos] = count
+        pos += 1
+    for count in board._active_items.counts:
+        view[pos] = count
+        pos += 1
+    view[base + TURN] = board.current_turn == player
+    view[base + TURN + 1] = board._skip_next
+    view[base + TURN + 2] = board.starter == player
+    view[base + SHELLS] = board.live
+    view[base + SHELLS + 1] = board.total
+    chamber = board.chamber_public
+    view[base + CHAMBER] = chamber is True
+    view[base + CHAMBER + 1] = chamber is False
+    write_known(view, base + KNOWN, known, board.total, KNOWN_SHELLS)
+
+def encode_observation(board: BuckshotRoulette, player: int, out = None, known = None):
+    """Writes `player`'s view of `board` into `out`, returning `out`.
+
+    Args:
+        board (BuckshotRoulette): The board to encode
+        player (int): Whose side of the table to encode from
+        out (buffer | None): A writable float buffer of at least `OBSERVATION_SIZE` values; a new `array('d')` if None
+        known (ShellBelief | dict[int, bool] | None): The shells `player` has seen, by position from the front
+    """
+    if out is None:
+        out = array('d', bytes(8 * OBSERVATION_SIZE))
+    view = float_view(out)
+    if len(view) < OBSERVATION_SIZE:
+        raise ValueError(f"Observation buffers need {OBSERVATION_SIZE} values, got {len(view)}")
+    _write(board, player, view, 0, known)
+    return out
+
+def encode_observations(boards: list[BuckshotRoulette], players, out, known: list | None = None):
+    """Writes one observation per board into the rows of an (N, OBSERVATION_SIZE) float array, returning `out`.
+
+    Args:
+        boards (list[BuckshotRoulette]): The boards to encode
+        players (int | list[int]): The side to encode from, for every board or per board
+        out: A C-contiguous float array with a row per board
+        known (list | None): Per-board known shells, as in `encode_observation`
+    """
+    view = float_view(out)
+    if len(view) < len(boards) * OBSERVATION_SIZE:
+        raise ValueError(f"{len(boards)} observations need {len(boards) * OBSERVATION_SIZE} values, got {len(view)}")
+    single = isinstance(players, int)
+    for row, board in enumerate(boards):
+        _write(board, players if single else players[row], view, row * OBSERVATION_SIZE, None if known is None else known[row])
+    return out
@@ -1,5 +1,5 @@
-from buckshot_roulette.game import BuckshotRoulette, BuckshotGame
-from buckshot_roulette.ai import *
+from buckshot_roulette.singleplayer.game import BuckshotRoulette, BuckshotGame
+from buckshot_roulette.singleplayer.ai import *
 
 
 